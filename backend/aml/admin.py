@@ -3,7 +3,16 @@ Django Admin configuration for AML models.
 Custom AdminSite with dashboard (counts, recent alerts); filters, actions, list display.
 """
 from django.contrib import admin
-from .models import Customer, Transaction, Alert, RiskScore, Rule, Report
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from .models import Customer, Transaction, Alert, RiskScore, Rule, Report, AuditLog
+from .rules.aml_rules import bump_rules_version
+from .services.alert_generator import invalidate_alert_aggregates
+from .utils import estimate_count, estimate_counts
+
+# Seconds the dashboard counts/recent alerts are cached for
+DASHBOARD_CACHE_TIMEOUT = 60
 
 
 # --- Custom AdminSite with dashboard (counts + recent alerts) ---
@@ -17,24 +26,97 @@ class AMLAdminSite(admin.AdminSite):
 
     def index(self, request, extra_context=None):
         extra_context = extra_context or {}
-        from .models import Customer, Transaction, Alert, Rule
-        extra_context['aml_customers_count'] = Customer.objects.count()
-        extra_context['aml_transactions_count'] = Transaction.objects.count()
-        extra_context['aml_alerts_open_count'] = Alert.objects.filter(status='OPEN').count()
-        extra_context['aml_rules_count'] = Rule.objects.count()
-        extra_context['aml_recent_alerts'] = Alert.objects.select_related(
-            'customer', 'transaction'
-        ).order_by('-created_at')[:10]
+        extra_context.update(
+            cache.get_or_set('aml:dash:ctx', self._dashboard_context, DASHBOARD_CACHE_TIMEOUT)
+        )
         return super().index(request, extra_context)
 
+    def _dashboard_context(self):
+        """Counts + recent alerts for the dashboard (cached; big tables use estimates)."""
+        customers, transactions, rules = estimate_counts(Customer, Transaction, Rule)
+        return {
+            'aml_customers_count': customers,
+            'aml_transactions_count': transactions,
+            'aml_alerts_open_count': Alert.objects.filter(status='OPEN').count(),
+            'aml_rules_count': rules,
+            # Plain dicts with only the columns the widget renders (aml_index.html)
+            'aml_recent_alerts': list(
+                Alert.objects.order_by('-created_at')
+                .values('id', 'alert_id', 'severity', 'status', 'created_at', 'customer__customer_id')[:10]
+            ),
+        }
+
 
 aml_admin_site = AMLAdminSite(name='aml_admin')
 
 
+# --- Paginator for very large tables ---
+
+class FasterAdminPaginator(Paginator):
+    """
+    Changelist paginator that skips COUNT(*) on unfiltered querysets.
+    Uses the PostgreSQL row estimate instead (see utils.estimate_count);
+    filtered/searched changelists still get an exact count.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            return estimate_count(self.object_list.model)
+        return super().count
+
+
+# --- List filters ---
+
+class CachedValuesListFilter(admin.SimpleListFilter):
+    """
+    Sidebar filter for plain (choice-less) fields. Same as Django's default
+    all-values filter, but the SELECT DISTINCT that builds the options is
+    cached instead of scanning the table on every changelist render.
+    """
+    field_name = None
+    cache_timeout = 600  # seconds
+
+    def lookups(self, request, model_admin):
+        model = model_admin.model
+        values = cache.get_or_set(
+            f'aml:admin:filter:{model._meta.label_lower}:{self.field_name}',
+            lambda: list(
+                model._default_manager.exclude(**{self.field_name: ''})
+                .order_by(self.field_name)
+                .values_list(self.field_name, flat=True)
+                .distinct()
+            ),
+            self.cache_timeout,
+        )
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.field_name: self.value()})
+        return queryset
+
+
+class CurrencyListFilter(CachedValuesListFilter):
+    title = 'currency'
+    parameter_name = 'currency'
+    field_name = 'currency'
+
+
+class CountryListFilter(CachedValuesListFilter):
+    title = 'country'
+    parameter_name = 'country'
+    field_name = 'country'
+
+
 # --- Admin actions ---
+# Each action is a single queryset.update(): one UPDATE statement, no rows are
+# loaded into Python (so narrowing with .only() would change nothing).
 
 def mark_alerts_resolved(modeladmin, request, queryset):
     updated = queryset.update(status='RESOLVED', reviewed_by=request.user.get_username())
+    invalidate_alert_aggregates()  # update() sends no post_save
     modeladmin.message_user(request, f'{updated} alert(s) marked as Resolved.')
 
 
@@ -43,6 +125,7 @@ mark_alerts_resolved.short_description = 'Mark selected as Resolved'
 
 def mark_alerts_false_positive(modeladmin, request, queryset):
     updated = queryset.update(status='FALSE_POSITIVE', reviewed_by=request.user.get_username())
+    invalidate_alert_aggregates()  # update() sends no post_save
     modeladmin.message_user(request, f'{updated} alert(s) marked as False Positive.')
 
 
@@ -51,6 +134,7 @@ mark_alerts_false_positive.short_description = 'Mark selected as False Positive'
 
 def escalate_alerts(modeladmin, request, queryset):
     updated = queryset.update(status='ESCALATED', reviewed_by=request.user.get_username())
+    invalidate_alert_aggregates()  # update() sends no post_save
     modeladmin.message_user(request, f'{updated} alert(s) escalated.')
 
 
@@ -75,6 +159,7 @@ set_customer_risk_critical.short_description = 'Set risk level to Critical'
 
 def activate_rules(modeladmin, request, queryset):
     updated = queryset.update(status='ACTIVE')
+    bump_rules_version()  # update() sends no post_save
     modeladmin.message_user(request, f'{updated} rule(s) activated.')
 
 
@@ -83,6 +168,7 @@ activate_rules.short_description = 'Activate selected rules'
 
 def deactivate_rules(modeladmin, request, queryset):
     updated = queryset.update(status='INACTIVE')
+    bump_rules_version()  # update() sends no post_save
     modeladmin.message_user(request, f'{updated} rule(s) deactivated.')
 
 
@@ -96,7 +182,7 @@ class CustomerAdmin(admin.ModelAdmin):
         'customer_id', 'first_name', 'last_name', 'email', 'current_risk_level',
         'risk_score', 'customer_type', 'registration_date', 'is_active'
     )
-    list_filter = ('customer_type', 'current_risk_level', 'is_active', 'country')
+    list_filter = ('customer_type', 'current_risk_level', 'is_active', CountryListFilter)
     search_fields = ('customer_id', 'first_name', 'last_name', 'email', 'national_id')
     readonly_fields = ('id', 'created_at', 'updated_at')
     ordering = ('-created_at',)
@@ -109,13 +195,20 @@ class TransactionAdmin(admin.ModelAdmin):
         'transaction_id', 'customer', 'transaction_type', 'amount', 'currency',
         'status', 'risk_score', 'is_suspicious', 'transaction_date'
     )
-    list_filter = ('transaction_type', 'status', 'is_suspicious', 'currency')
+    list_filter = ('transaction_type', 'status', 'is_suspicious', CurrencyListFilter)
     search_fields = ('transaction_id', 'customer__customer_id', 'sender_account', 'receiver_account')
     readonly_fields = ('id', 'created_at', 'updated_at')
+    raw_id_fields = ('customer',)
     ordering = ('-transaction_date',)
     date_hierarchy = 'transaction_date'
     list_per_page = 25
     list_select_related = ('customer',)
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # __str__ reads customer.customer_id (change form, delete confirmation, history)
+        return super().get_queryset(request).select_related('customer')
 
 
 class RuleAdmin(admin.ModelAdmin):
@@ -138,21 +231,30 @@ class AlertAdmin(admin.ModelAdmin):
     readonly_fields = ('id', 'created_at', 'updated_at')
     ordering = ('-created_at',)
     date_hierarchy = 'created_at'
+    # Customers/transactions are too many for <select> widgets; rules are few
+    raw_id_fields = ('customer', 'transaction')
     filter_horizontal = ('triggered_rules',)
     list_per_page = 25
     list_select_related = ('customer', 'transaction')
+    show_full_result_count = False
     actions = [mark_alerts_resolved, mark_alerts_false_positive, escalate_alerts]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('customer')
+
 
 class RiskScoreAdmin(admin.ModelAdmin):
     list_display = ('customer', 'transaction', 'score_type', 'score', 'calculated_at')
     list_filter = ('score_type', 'calculated_at')
     search_fields = ('customer__customer_id', 'transaction__transaction_id')
     readonly_fields = ('id', 'created_at')
+    raw_id_fields = ('customer', 'transaction')
     ordering = ('-calculated_at',)
     date_hierarchy = 'calculated_at'
     list_per_page = 25
     list_select_related = ('customer', 'transaction')
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
 
 
 class ReportAdmin(admin.ModelAdmin):
@@ -165,10 +267,31 @@ class ReportAdmin(admin.ModelAdmin):
     readonly_fields = ('id', 'created_at', 'updated_at')
     ordering = ('-created_at',)
     date_hierarchy = 'created_at'
-    filter_horizontal = ('related_alerts', 'related_transactions', 'related_customers')
+    raw_id_fields = ('related_alerts', 'related_transactions', 'related_customers')
     list_per_page = 25
 
 
+class AuditLogAdmin(admin.ModelAdmin):
+    """Read-only: entries are written by AuditTrailMiddleware."""
+    list_display = ('timestamp', 'method', 'path', 'status_code', 'user', 'ip_address')
+    list_filter = ('method', 'status_code')
+    search_fields = ('path', 'user', 'ip_address')
+    ordering = ('-timestamp',)
+    date_hierarchy = 'timestamp'
+    list_per_page = 50
+    paginator = FasterAdminPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # Register all models with the custom AML admin site
 aml_admin_site.register(Customer, CustomerAdmin)
 aml_admin_site.register(Transaction, TransactionAdmin)
@@ -176,3 +299,4 @@ aml_admin_site.register(Rule, RuleAdmin)
 aml_admin_site.register(Alert, AlertAdmin)
 aml_admin_site.register(RiskScore, RiskScoreAdmin)
 aml_admin_site.register(Report, ReportAdmin)
+aml_admin_site.register(AuditLog, AuditLogAdmin)
@@ -1,3 +1,5 @@
+import logging
+
 from django.apps import AppConfig
 
 
@@ -5,3 +7,7 @@ class AmlConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'aml'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .log_handlers import move_handlers_to_background
+        move_handlers_to_background(logging.getLogger('aml'))
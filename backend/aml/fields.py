@@ -0,0 +1,62 @@
+"""
+Custom model fields for AML models
+"""
+import json
+import os
+import time
+import uuid
+
+import orjson
+from django.db import models
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Time-ordered UUID (RFC 9562 version 7) for primary keys.
+
+    48-bit Unix millisecond timestamp followed by random bits, so new rows
+    land at the right edge of the primary key index instead of a random page.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = value & ~(0xF << 76) | 0x7 << 76  # version
+    value = value & ~(0x3 << 62) | 0x2 << 62  # RFC 4122 variant
+    return uuid.UUID(int=value)
+
+
+class OrjsonEncoder(json.JSONEncoder):
+    """JSON encoder whose encode() delegates to orjson (used via json.dumps(cls=...))"""
+
+    def encode(self, o):
+        return orjson.dumps(o, option=ORJSON_OPTIONS).decode()
+
+
+class OrjsonDecoder(json.JSONDecoder):
+    """JSON decoder whose decode() delegates to orjson (used via json.loads(cls=...))"""
+
+    def decode(self, s, *args, **kwargs):
+        return orjson.loads(s)
+
+
+class FastJSONField(models.JSONField):
+    """
+    JSONField that encodes/decodes with orjson.
+
+    Django routes JSONField values through json.dumps(cls=encoder) and
+    json.loads(cls=decoder) on every backend, so plugging orjson in as the
+    encoder/decoder keeps lookups, validation and PostgreSQL adaptation intact.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('encoder', OrjsonEncoder)
+        kwargs.setdefault('decoder', OrjsonDecoder)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('encoder') is OrjsonEncoder:
+            del kwargs['encoder']
+        if kwargs.get('decoder') is OrjsonDecoder:
+            del kwargs['decoder']
+        return name, path, args, kwargs
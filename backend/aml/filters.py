@@ -0,0 +1,16 @@
+"""
+FilterSets for the AML API
+"""
+from django_filters import rest_framework as filters
+
+from .models import Transaction
+
+
+class TransactionFilter(filters.FilterSet):
+    """Transaction list filters; date_from/date_to accept a date or an ISO 8601 datetime"""
+    date_from = filters.IsoDateTimeFilter(field_name='transaction_date', lookup_expr='gte')
+    date_to = filters.IsoDateTimeFilter(field_name='transaction_date', lookup_expr='lte')
+
+    class Meta:
+        model = Transaction
+        fields = ['transaction_type', 'status', 'is_suspicious', 'currency']
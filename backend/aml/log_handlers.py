@@ -0,0 +1,57 @@
+"""
+Logging handlers for the AML system.
+Moves log-file and console I/O off the request thread: the logger only
+enqueues records and a QueueListener thread runs the real handlers.
+"""
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Queue records for a background QueueListener that emits them to the wrapped handlers.
+
+    Records are queued as-is (the queue never leaves the process), so message
+    formatting -- including LazyJSON payloads -- also happens on the listener
+    thread. The listener starts lazily and again after a fork (prefork
+    Celery/gunicorn workers do not inherit the parent's thread).
+    """
+
+    def __init__(self, handlers):
+        super().__init__(queue.SimpleQueue())
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        super().enqueue(record)
+
+    def _ensure_listener(self):
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._listener_lock:
+            if self._listener_pid != pid:
+                self.listener.start()
+                self._listener_pid = pid
+
+    def close(self):
+        """Drain the queue into the wrapped handlers (logging.shutdown calls this at exit)"""
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                self.listener.stop()
+                self._listener_pid = None
+        super().close()
+
+
+def move_handlers_to_background(logger):
+    """Replace the logger's handlers with one BackgroundQueueHandler running them off-thread"""
+    if logger.handlers:
+        logger.handlers = [BackgroundQueueHandler(logger.handlers)]
@@ -0,0 +1,87 @@
+"""
+Management command to bulk-load JSONL audit entries into AuditLog.
+Used with AUDIT_LOG_SINK='jsonl'; run periodically (e.g. nightly cron).
+"""
+import csv
+import io
+import os
+from pathlib import Path
+
+import orjson
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from aml.models import AuditLog
+
+COLUMNS = ['timestamp', 'method', 'path', 'user', 'ip_address', 'status_code', 'user_agent', 'request_body']
+CHUNK_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = 'Load audit entries from the JSONL audit file into AuditLog (COPY on PostgreSQL)'
+
+    def handle(self, *args, **options):
+        source = Path(settings.AUDIT_LOG_JSONL_PATH)
+
+        # Rotate first: the middleware writer re-creates the file on its next flush
+        if source.exists():
+            os.replace(source, source.with_name(f"{source.name}.{os.getpid()}.loading"))
+
+        pending = sorted(source.parent.glob(f"{source.name}.*.loading"))
+        if not pending:
+            self.stdout.write('No audit entries to load.')
+            return
+
+        for path in pending:
+            loaded = 0
+            with transaction.atomic():
+                for chunk in self._read_chunks(path):
+                    self._load(chunk)
+                    loaded += len(chunk)
+            path.unlink()
+            self.stdout.write(self.style.SUCCESS(f'Loaded {loaded} audit entries from {path.name}'))
+
+    def _read_chunks(self, path):
+        chunk = []
+        with open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    chunk.append(orjson.loads(line))
+                if len(chunk) >= CHUNK_SIZE:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+
+    def _load(self, records):
+        if connection.vendor == 'postgresql':
+            self._copy(records)
+        else:
+            AuditLog.objects.bulk_create(
+                [
+                    AuditLog(**{**record, 'timestamp': parse_datetime(record['timestamp'])})
+                    for record in records
+                ],
+                batch_size=1000,
+            )
+
+    def _copy(self, records):
+        """COPY the chunk in as CSV (quoted empties become NULL only for nullable columns)."""
+        buf = io.StringIO()
+        writer = csv.writer(buf, quoting=csv.QUOTE_ALL)
+        for record in records:
+            writer.writerow([
+                record['timestamp'], record['method'], record['path'], record.get('user', ''),
+                record.get('ip_address'), record.get('status_code'), record.get('user_agent', ''),
+                orjson.dumps(record.get('request_body') or {}).decode(),
+            ])
+        buf.seek(0)
+        columns = ', '.join(connection.ops.quote_name(c) for c in COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {AuditLog._meta.db_table} ({columns}) FROM STDIN "
+                f"WITH (FORMAT csv, FORCE_NULL (ip_address, status_code))",
+                buf,
+            )
@@ -2,14 +2,119 @@
 Audit Trail Middleware
 Logs all API requests and important actions for audit purposes.
 Writes to both log file and AuditLog model for API access.
+AuditLog rows are queued and bulk-inserted by a background writer thread,
+so the DB write is off the request path (or, with AUDIT_LOG_SINK='jsonl',
+appended to a JSONL file and bulk-loaded by `manage.py load_audit_logs`).
 """
+import atexit
 import logging
-import json
+import queue
+import threading
+import time
+import orjson
+from django.conf import settings
+from django.db import close_old_connections
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
+from .utils import LazyJSON
+
 audit_logger = logging.getLogger('aml')
 
+# Paths never audited (static assets, admin UI, load-balancer probes)
+AUDIT_SKIP_PREFIXES = (
+    '/static/', '/media/', '/admin/', '/favicon.ico', '/api/health/', '/api/ready/',
+)
+
+# Request-body keys (lowercase) never written to the audit trail
+AUDIT_SENSITIVE_FIELDS = frozenset(('password', 'secret', 'token', 'api_key', 'authorization', 'cookie'))
+
+# Matches AuditLog.user_agent max_length; also applied to the log-file line
+AUDIT_USER_AGENT_MAX_LENGTH = 500
+
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 0.5  # seconds
+AUDIT_QUEUE_MAXSIZE = 10000
+
+_audit_queue = queue.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+_audit_writer = None
+_audit_writer_lock = threading.Lock()
+
+
+def _flush_audit_records(records):
+    """
+    Persist a batch of AuditLog field dicts.
+    AUDIT_LOG_SINK='db' (default) bulk-inserts them; 'jsonl' appends them to
+    AUDIT_LOG_JSONL_PATH for `manage.py load_audit_logs` to COPY in later.
+    """
+    try:
+        if getattr(settings, 'AUDIT_LOG_SINK', 'db') == 'jsonl':
+            with open(settings.AUDIT_LOG_JSONL_PATH, 'ab') as f:
+                f.write(b''.join(orjson.dumps(record) + b'\n' for record in records))
+            return
+        from .models import AuditLog
+        close_old_connections()
+        AuditLog.objects.bulk_create(
+            [AuditLog(**record) for record in records], batch_size=AUDIT_BATCH_SIZE
+        )
+    except Exception as e:
+        audit_logger.error("Failed to write %s audit log entries: %s", len(records), e)
+
+
+def _audit_writer_loop():
+    """Drain the queue: flush every AUDIT_FLUSH_INTERVAL or AUDIT_BATCH_SIZE records."""
+    while True:
+        batch = [_audit_queue.get()]
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL
+        while len(batch) < AUDIT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_audit_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _flush_audit_records(batch)
+
+
+def _drain_audit_queue():
+    """Flush whatever is still queued (process exit)."""
+    batch = []
+    while True:
+        try:
+            batch.append(_audit_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        _flush_audit_records(batch)
+
+
+atexit.register(_drain_audit_queue)
+
+
+def _ensure_audit_writer():
+    """Start the writer thread lazily (also restarts it in forked worker processes)."""
+    global _audit_writer
+    if _audit_writer is not None and _audit_writer.is_alive():
+        return
+    with _audit_writer_lock:
+        if _audit_writer is None or not _audit_writer.is_alive():
+            _audit_writer = threading.Thread(
+                target=_audit_writer_loop, name='aml-audit-writer', daemon=True
+            )
+            _audit_writer.start()
+
+
+def enqueue_audit_record(record):
+    """Queue AuditLog field values for the background writer; drop if the queue is full."""
+    _ensure_audit_writer()
+    try:
+        _audit_queue.put_nowait(record)
+    except queue.Full:
+        audit_logger.warning(
+            "Audit queue full; AuditLog entry dropped for %s %s", record.get('method'), record.get('path')
+        )
+
 
 def _get_client_ip(request):
     """Get client IP address from request"""
@@ -21,69 +126,80 @@ def _get_client_ip(request):
     return ip or None
 
 
+def _capture_request_context(request):
+    """Store client IP and (truncated) user agent on the request, computed once."""
+    request._audit_ip = _get_client_ip(request)
+    request._audit_ua = (request.META.get('HTTP_USER_AGENT') or '')[:AUDIT_USER_AGENT_MAX_LENGTH]
+
+
 class AuditTrailMiddleware(MiddlewareMixin):
     """
     Middleware to log all API requests for audit trail (file + DB).
     """
     
     def process_request(self, request):
-        """Capture request for audit; store sanitized body for process_response."""
-        if request.path.startswith('/static/') or request.path.startswith('/admin/'):
+        """Capture request for audit; store sanitized body, client IP and UA for process_response."""
+        request._audit_skip = request.path.startswith(AUDIT_SKIP_PREFIXES)
+        if request._audit_skip:
             return None
         
+        _capture_request_context(request)
         request._audit_request_body = {}
         if request.method in ['POST', 'PUT', 'PATCH'] and request.body:
             try:
-                body = json.loads(request.body.decode('utf-8'))
-                sensitive_fields = ['password', 'secret', 'token', 'api_key']
+                body = orjson.loads(request.body)
                 request._audit_request_body = {
                     k: v for k, v in body.items()
-                    if k.lower() not in sensitive_fields
+                    if k.lower() not in AUDIT_SENSITIVE_FIELDS
                 }
             except Exception:
                 pass
         
         audit_data = {
-            'timestamp': timezone.now().isoformat(),
+            'timestamp': timezone.now(),
             'method': request.method,
             'path': request.path,
-            'user': request.user.username if hasattr(request.user, 'username') else 'anonymous',
-            'ip_address': _get_client_ip(request),
-            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+            'user': getattr(request.user, 'username', 'anonymous'),
+            'ip_address': request._audit_ip,
+            'user_agent': request._audit_ua,
         }
         if request._audit_request_body:
             audit_data['request_body'] = request._audit_request_body
-        audit_logger.info(f"API Request: {json.dumps(audit_data, ensure_ascii=False)}")
+        audit_logger.info("API Request: %s", LazyJSON(audit_data))
         return None
     
     def process_response(self, request, response):
         """Log response to file and to AuditLog model (for audit log API)."""
-        if request.path.startswith('/static/') or request.path.startswith('/admin/'):
+        skip = getattr(request, '_audit_skip', None)
+        if skip is None:  # process_request was short-circuited by an earlier middleware
+            skip = request.path.startswith(AUDIT_SKIP_PREFIXES)
+            if not skip:
+                _capture_request_context(request)
+        if skip:
             return response
         
+        user = getattr(request.user, 'username', 'anonymous')
+        now = timezone.now()  # one timestamp for the log line and the AuditLog row
         audit_data = {
-            'timestamp': timezone.now().isoformat(),
+            'timestamp': now,
             'method': request.method,
             'path': request.path,
             'status_code': response.status_code,
-            'user': request.user.username if hasattr(request.user, 'username') else 'anonymous',
+            'user': user,
         }
-        audit_logger.info(f"API Response: {json.dumps(audit_data, ensure_ascii=False)}")
+        audit_logger.info("API Response: %s", LazyJSON(audit_data))
         
-        # Persist to DB for read-only audit log API
-        try:
-            from .models import AuditLog
-            AuditLog.objects.create(
-                method=request.method,
-                path=request.path,
-                user=request.user.username if hasattr(request.user, 'username') else 'anonymous',
-                ip_address=_get_client_ip(request),
-                status_code=response.status_code,
-                user_agent=(request.META.get('HTTP_USER_AGENT') or '')[:500],
-                request_body=getattr(request, '_audit_request_body', {}),
-            )
-        except Exception:
-            pass  # Do not break response if audit write fails
+        # Persist to DB for read-only audit log API (batched by the writer thread)
+        enqueue_audit_record({
+            'timestamp': now,
+            'method': request.method,
+            'path': request.path,
+            'user': user,
+            'ip_address': request._audit_ip,
+            'status_code': response.status_code,
+            'user_agent': request._audit_ua,
+            'request_body': getattr(request, '_audit_request_body', {}),
+        })
         
         return response
 
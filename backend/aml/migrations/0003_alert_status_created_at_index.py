@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-15 21:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0002_add_audit_log'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['status', '-created_at'], name='aml_alert_status_cc6130_idx'),
+        ),
+    ]
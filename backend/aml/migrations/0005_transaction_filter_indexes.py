@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-15 21:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0004_auditlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='aml_transac_is_susp_251fb4_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['transaction_type'], name='aml_transac_transac_9a4b2c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['currency'], name='aml_transac_currenc_6b664b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('is_suspicious', True)), fields=['-transaction_date'], name='txn_suspicious_partial'),
+        ),
+    ]
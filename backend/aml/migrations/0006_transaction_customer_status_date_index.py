@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0005_transaction_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['customer', 'status', 'transaction_date'], include=('amount',), name='tx_cust_status_date_amt'),
+        ),
+    ]
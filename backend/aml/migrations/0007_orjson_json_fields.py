@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:05
+
+import aml.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0006_transaction_customer_status_date_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auditlog',
+            name='request_body',
+            field=aml.fields.FastJSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='report_data',
+            field=aml.fields.FastJSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='riskscore',
+            name='factors',
+            field=aml.fields.FastJSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='rule',
+            name='configuration',
+            field=aml.fields.FastJSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='flagged_reasons',
+            field=aml.fields.FastJSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:11
+
+import aml.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0007_orjson_json_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alert',
+            name='id',
+            field=models.UUIDField(default=aml.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='id',
+            field=models.UUIDField(default=aml.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='id',
+            field=models.UUIDField(default=aml.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='riskscore',
+            name='id',
+            field=models.UUIDField(default=aml.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='rule',
+            name='id',
+            field=models.UUIDField(default=aml.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='id',
+            field=models.UUIDField(default=aml.fields.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
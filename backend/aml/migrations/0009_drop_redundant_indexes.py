@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0008_uuid7_primary_keys'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='aml_alert_alert_i_9f51ad_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='aml_alert_created_a5a522_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='aml_auditlo_timesta_ed7e12_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='aml_auditlo_path_3c9985_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='aml_custome_custome_ac9733_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='aml_custome_email_8ff208_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='report',
+            name='aml_report_report__85e117_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='aml_transac_transac_056293_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='aml_transac_transac_7f86a7_idx',
+        ),
+        migrations.AlterField(
+            model_name='alert',
+            name='alert_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='customer_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='customer',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='report_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='transaction_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0009_drop_redundant_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alert',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='aml.customer'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['severity', '-created_at'], name='aml_alert_severit_1f531c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['customer', '-created_at'], name='aml_alert_custome_5e4889_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:22
+
+from django.db import migrations, models
+
+CREATE_VIEW = """
+CREATE MATERIALIZED VIEW mv_customer_tx_stats AS
+SELECT customer_id,
+       date_trunc('hour', transaction_date) AS bucket,
+       sum(amount) AS total_amount,
+       count(*) AS tx_count
+FROM aml_transaction
+WHERE status = 'COMPLETED'
+GROUP BY 1, 2
+"""
+
+
+def create_view(apps, schema_editor):
+    # PostgreSQL only; on SQLite the risk scorer aggregates aml_transaction directly
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_VIEW)
+    # Unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+    schema_editor.execute(
+        'CREATE UNIQUE INDEX mv_customer_tx_stats_customer_bucket '
+        'ON mv_customer_tx_stats (customer_id, bucket)'
+    )
+
+
+def drop_view(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP MATERIALIZED VIEW IF EXISTS mv_customer_tx_stats')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0010_alert_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerTxStats',
+            fields=[
+                ('customer_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('bucket', models.DateTimeField()),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=30)),
+                ('tx_count', models.IntegerField()),
+            ],
+            options={
+                'verbose_name': 'Customer transaction stats (hourly)',
+                'verbose_name_plural': 'Customer transaction stats (hourly)',
+                'db_table': 'mv_customer_tx_stats',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_view, drop_view),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0011_customer_tx_stats_view'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['customer', '-created_at'], include=('severity',), name='alert_cust_created_sev'),
+        ),
+        migrations.RemoveIndex(
+            model_name='alert',
+            name='aml_alert_custome_5e4889_idx',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0012_alert_customer_severity_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['status', '-transaction_date'], name='aml_transac_status_abef4f_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:42
+
+from django.db import migrations
+
+# Customer ?search= fields; icontains compiles to UPPER("col"::text) LIKE UPPER(%s)
+# on PostgreSQL, so each trigram index is on that exact expression
+SEARCH_COLUMNS = ['customer_id', 'first_name', 'last_name', 'email', 'national_id']
+
+
+def create_indexes(apps, schema_editor):
+    # PostgreSQL only; SQLite has no trigram indexes and scans the (small) dev table
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS aml_customer_{column}_trgm '
+            f'ON aml_customer USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS aml_customer_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0013_transaction_status_date_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-15 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('aml', '0014_customer_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('FAILED', 'Failed'), ('DRAFT', 'Draft'), ('GENERATED', 'Generated'), ('SUBMITTED', 'Submitted'), ('APPROVED', 'Approved')], default='DRAFT', max_length=20),
+        ),
+    ]
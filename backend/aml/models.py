@@ -2,9 +2,11 @@
 AML System Models
 """
 from django.db import models
+from django.db.models import Q
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-import uuid
+
+from .fields import FastJSONField, uuid7
 
 
 class Customer(models.Model):
@@ -24,11 +26,11 @@ class Customer(models.Model):
         ('CRITICAL', 'Critical'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    customer_id = models.CharField(max_length=100, unique=True, db_index=True)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    customer_id = models.CharField(max_length=100, unique=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
-    email = models.EmailField(unique=True, db_index=True)
+    email = models.EmailField(unique=True)
     phone = models.CharField(max_length=20, blank=True)
     customer_type = models.CharField(max_length=20, choices=CUSTOMER_TYPES, default='INDIVIDUAL')
     
@@ -56,8 +58,6 @@ class Customer(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['customer_id']),
-            models.Index(fields=['email']),
             models.Index(fields=['current_risk_level']),
         ]
     
@@ -84,8 +84,8 @@ class Transaction(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    transaction_id = models.CharField(max_length=100, unique=True, db_index=True)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    transaction_id = models.CharField(max_length=100, unique=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='transactions')
     
     # Transaction Details
@@ -110,15 +110,25 @@ class Transaction(models.Model):
     risk_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True,
                                       validators=[MinValueValidator(0), MaxValueValidator(100)])
     is_suspicious = models.BooleanField(default=False)
-    flagged_reasons = models.JSONField(default=list, blank=True)
+    # Free-text rule reasons, only ever read whole: JSON keeps SQLite support
+    # (ArrayField is PostgreSQL-only) and is stored as binary jsonb on PostgreSQL
+    flagged_reasons = FastJSONField(default=list, blank=True)
     
     class Meta:
         ordering = ['-transaction_date']
         indexes = [
-            models.Index(fields=['transaction_id']),
-            models.Index(fields=['transaction_date']),
             models.Index(fields=['customer', 'transaction_date']),
-            models.Index(fields=['is_suspicious']),
+            # Rule-engine aggregates: customer + COMPLETED + date range, Sum/Count(amount)
+            # answered from the index alone (INCLUDE is PostgreSQL-only, ignored elsewhere)
+            models.Index(fields=['customer', 'status', 'transaction_date'], include=['amount'],
+                         name='tx_cust_status_date_amt'),
+            models.Index(fields=['transaction_type']),
+            models.Index(fields=['currency']),
+            # ?status= lists (newest first) and the CTR window: status='COMPLETED' + date range
+            models.Index(fields=['status', '-transaction_date']),
+            # Suspicious rows are a small minority: keep them in a small partial index
+            models.Index(fields=['-transaction_date'], name='txn_suspicious_partial',
+                         condition=Q(is_suspicious=True)),
         ]
     
     def __str__(self):
@@ -142,14 +152,14 @@ class Rule(models.Model):
         ('DRAFT', 'Draft'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=200)
     description = models.TextField()
     rule_type = models.CharField(max_length=20, choices=RULE_TYPES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
     
     # Rule Configuration (stored as JSON for flexibility)
-    configuration = models.JSONField(default=dict)
+    configuration = FastJSONField(default=dict)
     
     # Priority and Scoring
     priority = models.IntegerField(default=1, validators=[MinValueValidator(1), MaxValueValidator(10)])
@@ -191,10 +201,11 @@ class Alert(models.Model):
         ('ESCALATED', 'Escalated'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    alert_id = models.CharField(max_length=100, unique=True, db_index=True)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    alert_id = models.CharField(max_length=100, unique=True)
     transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='alerts')
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='alerts')
+    # Indexed by the (customer, -created_at) index in Meta
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='alerts', db_index=False)
     
     # Alert Details
     severity = models.CharField(max_length=20, choices=SEVERITY_LEVELS, default='MEDIUM')
@@ -220,9 +231,14 @@ class Alert(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['alert_id']),
             models.Index(fields=['status', 'severity']),
-            models.Index(fields=['created_at']),
+            models.Index(fields=['status', '-created_at']),
+            # Newest-first alert lookups per severity and per customer
+            models.Index(fields=['severity', '-created_at']),
+            # Customer alert-history counts by severity answered from the index alone
+            # (INCLUDE is PostgreSQL-only, ignored elsewhere)
+            models.Index(fields=['customer', '-created_at'], include=['severity'],
+                         name='alert_cust_created_sev'),
         ]
     
     def __str__(self):
@@ -239,7 +255,7 @@ class RiskScore(models.Model):
         ('AGGREGATE', 'Aggregate Risk Score'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='risk_scores')
     transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True,
                                      related_name='risk_scores')
@@ -249,7 +265,7 @@ class RiskScore(models.Model):
                                  validators=[MinValueValidator(0), MaxValueValidator(100)])
     
     # Score Breakdown
-    factors = models.JSONField(default=dict)  # Store individual risk factors
+    factors = FastJSONField(default=dict)  # Store individual risk factors
     calculation_method = models.CharField(max_length=100, blank=True)
     
     # Metadata
@@ -278,21 +294,23 @@ class Report(models.Model):
     ]
     
     STATUS_CHOICES = [
+        ('PENDING', 'Pending'),  # queued by the API, built by a worker
+        ('FAILED', 'Failed'),
         ('DRAFT', 'Draft'),
         ('GENERATED', 'Generated'),
         ('SUBMITTED', 'Submitted'),
         ('APPROVED', 'Approved'),
     ]
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    report_id = models.CharField(max_length=100, unique=True, db_index=True)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    report_id = models.CharField(max_length=100, unique=True)
     report_type = models.CharField(max_length=20, choices=REPORT_TYPES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
     
     # Report Content
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    report_data = models.JSONField(default=dict)  # Structured report data
+    report_data = FastJSONField(default=dict)  # Structured report data
     
     # Related Entities
     related_alerts = models.ManyToManyField(Alert, related_name='reports', blank=True)
@@ -317,7 +335,6 @@ class Report(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['report_id']),
             models.Index(fields=['report_type', 'status']),
             models.Index(fields=['created_at']),
         ]
@@ -331,20 +348,19 @@ class AuditLog(models.Model):
     Audit log for API requests (compliance). Written by AuditTrailMiddleware.
     Read-only via API for compliance reporting.
     """
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set at request time by the middleware (rows are bulk-inserted later)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     method = models.CharField(max_length=10)
     path = models.CharField(max_length=500, db_index=True)
     user = models.CharField(max_length=150, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     status_code = models.PositiveSmallIntegerField(null=True, blank=True)
     user_agent = models.CharField(max_length=500, blank=True)
-    request_body = models.JSONField(default=dict, blank=True)
+    request_body = FastJSONField(default=dict, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
         indexes = [
-            models.Index(fields=['-timestamp']),
-            models.Index(fields=['path']),
             models.Index(fields=['user']),
         ]
         verbose_name = 'Audit log entry'
@@ -353,3 +369,23 @@ class AuditLog(models.Model):
     def __str__(self):
         return f"{self.timestamp.isoformat()} {self.method} {self.path} {self.status_code}"
 
+
+class CustomerTxStats(models.Model):
+    """
+    Hourly completed-transaction totals per customer.
+
+    Read-only model over the PostgreSQL materialized view mv_customer_tx_stats
+    (see migration 0011), refreshed by the refresh_customer_tx_stats task.
+    Not available on SQLite. Only queried through aggregate(); the view has no
+    single-column key, so customer_id stands in as the primary key.
+    """
+    customer_id = models.UUIDField(primary_key=True)
+    bucket = models.DateTimeField()
+    total_amount = models.DecimalField(max_digits=30, decimal_places=2)
+    tx_count = models.IntegerField()
+
+    class Meta:
+        managed = False
+        db_table = 'mv_customer_tx_stats'
+        verbose_name = 'Customer transaction stats (hourly)'
+        verbose_name_plural = 'Customer transaction stats (hourly)'
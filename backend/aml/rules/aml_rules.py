@@ -3,9 +3,14 @@ AML Rule Engine
 Implements configurable rules for detecting suspicious transactions
 """
 import logging
+import threading
+import uuid
 from decimal import Decimal
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from django.core.cache import cache
 from django.utils import timezone
 from django.db.models import Sum, Count, Q, Avg
 from django.db.models.functions import TruncDay
@@ -14,6 +19,75 @@ from aml.models import Rule, Transaction, Customer
 
 logger = logging.getLogger('aml')
 
+# Rule configuration values compared against Decimal amounts; cast once at load time
+DECIMAL_CONFIG_KEYS = (
+    'amount_threshold',
+    'daily_amount_threshold',
+    'structuring_threshold',
+    'cross_border_threshold',
+)
+
+# Behavioral pattern-change comparison window (last N days vs the N days before)
+PATTERN_CHANGE_WINDOW = timedelta(days=7)
+
+# Batches at least this large get NumPy pre-screening of amount/country rules
+VECTORIZE_MIN_BATCH = 64
+
+# Shared-cache keys: a version token bumped on every rule change, and the
+# (version, active rules) table so new workers skip the DB load
+RULES_VERSION_CACHE_KEY = 'aml:rules:version'
+RULES_TABLE_CACHE_KEY = 'aml:rules:table'
+
+
+def bump_rules_version():
+    """Mark the cached rule set stale for every worker sharing the cache"""
+    cache.set(RULES_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    cache.delete(RULES_TABLE_CACHE_KEY)
+
+
+def get_rules_version() -> str:
+    """Current rule-set version token (created on first use)"""
+    version = cache.get(RULES_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(RULES_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(RULES_VERSION_CACHE_KEY)
+    return version
+
+
+class TransactionColumns:
+    """
+    Column-wise (struct-of-arrays) view of an evaluation batch
+    
+    Holds only the fields the vectorized pre-screen reads, each as one NumPy
+    array, so masks are computed without touching the model instances again.
+    """
+    __slots__ = ('size', 'amounts', 'receiver_countries', '_transactions', '_customer_countries')
+    
+    def __init__(self, transactions: List[Transaction]):
+        self.size = len(transactions)
+        self.amounts = np.fromiter((t.amount for t in transactions), dtype=np.float64, count=self.size)
+        self.receiver_countries = np.array([t.receiver_country for t in transactions], dtype=str)
+        self._transactions = transactions
+        self._customer_countries = None
+    
+    @property
+    def customer_countries(self) -> np.ndarray:
+        """Sender customer country per transaction ('' when there is no receiver country); built on first use"""
+        if self._customer_countries is None:
+            self._customer_countries = np.array(
+                [t.customer.country if t.receiver_country else '' for t in self._transactions],
+                dtype=str,
+            )
+        return self._customer_countries
+    
+    def customer_stat(self, customer_stats: Dict, name: str) -> np.ndarray:
+        """Per-transaction column of a customer aggregate (0 for customers without one)"""
+        return np.fromiter(
+            (float(customer_stats.get(t.customer_id, {}).get(name) or 0) for t in self._transactions),
+            dtype=np.float64,
+            count=self.size,
+        )
+
 
 class RuleEngine:
     """
@@ -21,13 +95,77 @@ class RuleEngine:
     """
     
     def __init__(self):
-        self.active_rules = None
+        self.active_rules = []
+        self.compiled_rules = []
+        self.compiled_version = None
+        self._reload_lock = threading.Lock()
+        self._rules_by_type = {}
+        self._evaluators = {
+            'THRESHOLD': self._evaluate_threshold_rule,
+            'PATTERN': self._evaluate_pattern_rule,
+            'BEHAVIORAL': self._evaluate_behavioral_rule,
+            'GEOGRAPHIC': self._evaluate_geographic_rule,
+        }
         self._load_rules()
     
     def _load_rules(self):
-        """Load active rules from database"""
-        self.active_rules = Rule.objects.filter(status='ACTIVE').order_by('priority')
-        logger.info(f"Loaded {self.active_rules.count()} active rules")
+        """Bind the compiled active rules for the current rule-set version to this engine"""
+        version = get_rules_version()
+        rules = _load_compiled_rules(version)
+        
+        compiled_rules = []
+        rules_by_type = {}
+        for rule in rules:
+            compiled_rules.append((rule, self._compile_rule(rule)))
+            rules_by_type.setdefault(rule.rule_type, []).append(rule)
+        
+        self.active_rules = list(rules)
+        self.compiled_rules = compiled_rules
+        self._rules_by_type = rules_by_type
+        self.compiled_version = version
+    
+    @staticmethod
+    def _compile_config(config: Dict) -> Dict:
+        """
+        Copy of a rule configuration with threshold values pre-cast to Decimal
+        and the high-risk country list turned into a frozenset (O(1) lookups)
+        """
+        compiled = dict(config)
+        for key in DECIMAL_CONFIG_KEYS:
+            if key in compiled:
+                compiled[key] = Decimal(str(compiled[key]))
+        compiled['high_risk_countries'] = frozenset(compiled.get('high_risk_countries', ()))
+        if 'structuring_threshold' in compiled:
+            compiled['structuring_floor'] = compiled['structuring_threshold'] * Decimal('0.9')
+        return compiled
+    
+    @staticmethod
+    def _assign_stat_names(config: Dict, stat_names: Dict):
+        """
+        Name the customer aggregates a pattern rule reads; rules with the same
+        window parameters share one name, so the aggregate is computed once
+        """
+        if 'structuring_threshold' in config:
+            params = ('structuring', config['structuring_threshold'], config.get('lookback_days', 7))
+            config['structuring_stat'] = stat_names.setdefault(params, f'structuring_count_{len(stat_names)}')
+        if 'rapid_transaction_threshold' in config:
+            params = ('rapid', config.get('rapid_transaction_minutes', 10))
+            config['rapid_stat'] = stat_names.setdefault(params, f'rapid_count_{len(stat_names)}')
+    
+    def _compile_rule(self, rule: Rule) -> Callable[[Transaction, Dict, Dict], Dict]:
+        """
+        Bind a rule to its evaluator and compiled config once, at load time
+        
+        Returns:
+            Callable taking (transaction, customer_stats, cutoffs) and returning the rule result
+        """
+        evaluator = self._evaluators.get(rule.rule_type)
+        if evaluator is None:
+            logger.warning(f"Unknown rule type: {rule.rule_type}")
+            return lambda transaction, stats, cutoffs: {'triggered': False, 'reason': '', 'risk_score': 0}
+        
+        config = rule.compiled_config
+        return lambda transaction, stats, cutoffs: evaluator(rule, transaction, config, stats, cutoffs)
     
     def evaluate_transaction(self, transaction: Transaction) -> Tuple[List[Rule], List[str], Decimal]:
         """
@@ -36,53 +174,186 @@ class RuleEngine:
         Returns:
             Tuple of (triggered_rules, reasons, total_risk_score)
         """
-        triggered_rules = []
-        reasons = []
-        total_risk_score = Decimal('0.0')
+        return self.evaluate_transactions([transaction])[0]
+    
+    def evaluate_transactions(self, transactions: List[Transaction]) -> List[Tuple[List[Rule], List[str], Decimal]]:
+        """
+        Evaluate a batch of transactions against all active rules
+        
+        Customer aggregates (daily count/amount, structuring and rapid
+        transaction counts) are fetched for the whole batch in one grouped
+        query instead of one query per rule per transaction.
         
-        if not self.active_rules.exists():
+        Returns:
+            List of (triggered_rules, reasons, total_risk_score), one per transaction
+        """
+        self._ensure_current()
+        if not self.compiled_rules:
             logger.warning("No active rules found")
-            return triggered_rules, reasons, total_risk_score
+            return [([], [], Decimal('0.0')) for _ in transactions]
+        
+        cutoffs = self._get_cutoffs()
+        customer_stats = self._get_customer_stats({t.customer_id for t in transactions}, cutoffs)
+        masks = (
+            self._candidate_masks(TransactionColumns(transactions), customer_stats)
+            if len(transactions) >= VECTORIZE_MIN_BATCH else {}
+        )
+        return [
+            self._evaluate_rules(transaction, customer_stats.get(transaction.customer_id, {}), cutoffs, masks, index)
+            for index, transaction in enumerate(transactions)
+        ]
+    
+    def _get_cutoffs(self) -> Dict[str, datetime]:
+        """
+        Compute the "since" datetimes the active rules need, once per evaluation batch
+        
+        Returns:
+            Dict with 'now', 'today_start' and per-rule lookback cutoffs
+            (structuring_since_<pk>, rapid_since_<pk>, lookback_since_<pk>)
+        """
+        now = timezone.now()
+        cutoffs = {
+            'now': now,
+            'today_start': now.replace(hour=0, minute=0, second=0, microsecond=0),
+        }
+        
+        for rule in self._rules_by_type.get('PATTERN', []):
+            config = rule.compiled_config
+            if 'structuring_threshold' in config:
+                cutoffs[f'structuring_since_{rule.pk}'] = now - timedelta(days=config.get('lookback_days', 7))
+            if 'rapid_transaction_threshold' in config:
+                cutoffs[f'rapid_since_{rule.pk}'] = now - timedelta(minutes=config.get('rapid_transaction_minutes', 10))
+        
+        for rule in self._rules_by_type.get('BEHAVIORAL', []):
+            if 'amount_increase_threshold' in rule.compiled_config:
+                cutoffs[f'lookback_since_{rule.pk}'] = now - timedelta(days=rule.compiled_config.get('lookback_days', 30))
+        
+        return cutoffs
+    
+    def _evaluate_rules(self, transaction: Transaction, stats: Dict, cutoffs: Dict,
+                        masks: Dict, index: int) -> Tuple[List[Rule], List[str], Decimal]:
+        """
+        Evaluate one transaction against the compiled rules using precomputed customer stats
         
-        for rule in self.active_rules:
+        Rules with a candidate mask (see _candidate_masks) are skipped for
+        transactions the mask rules out.
+        """
+        triggered_rules = []
+        reasons = []
+        total_risk_score = 0.0
+        
+        for rule, evaluate in self.compiled_rules:
+            mask = masks.get(rule.pk)
+            if mask is not None and not mask[index]:
+                continue
             try:
-                result = self._evaluate_rule(rule, transaction)
+                result = evaluate(transaction, stats, cutoffs)
                 if result['triggered']:
                     triggered_rules.append(rule)
                     reasons.append(result['reason'])
                     # Add weighted risk score
-                    rule_risk = Decimal(str(result.get('risk_score', 0))) * rule.risk_weight
-                    total_risk_score += rule_risk
-                    logger.info(f"Rule '{rule.name}' triggered for transaction {transaction.transaction_id}")
+                    total_risk_score += result.get('risk_score', 0) * rule.float_risk_weight
+                    logger.info("Rule '%s' triggered for transaction %s", rule.name, transaction.transaction_id)
             except Exception as e:
-                logger.error(f"Error evaluating rule {rule.name}: {str(e)}")
+                logger.error("Error evaluating rule %s: %s", rule.name, e)
                 continue
         
-        return triggered_rules, reasons, total_risk_score
+        # Scores are accumulated as floats; Decimal only at the model boundary
+        return triggered_rules, reasons, Decimal(str(round(total_risk_score, 2)))
+    
+    def _candidate_masks(self, columns: TransactionColumns, customer_stats: Dict) -> Dict[int, np.ndarray]:
+        """
+        Vectorized pre-screen for threshold rules (amount and daily customer
+        aggregates) and geographic rules (high-risk / cross-border countries).
+        
+        Returns:
+            Dict of rule pk -> boolean array, True where the rule can trigger.
+            Rules without an entry are evaluated for every transaction.
+        """
+        masks = {}
+        amounts = columns.amounts
+        
+        for rule in self._rules_by_type.get('THRESHOLD', []):
+            config = rule.compiled_config
+            mask = np.zeros(columns.size, dtype=bool)
+            if 'amount_threshold' in config:
+                mask |= amounts >= rule.float_thresholds['amount_threshold']
+            if 'daily_count_threshold' in config:
+                mask |= columns.customer_stat(customer_stats, 'today_count') >= config['daily_count_threshold']
+            if 'daily_amount_threshold' in config:
+                mask |= columns.customer_stat(customer_stats, 'today_total') >= rule.float_thresholds['daily_amount_threshold']
+            masks[rule.pk] = mask
+        
+        geographic_rules = self._rules_by_type.get('GEOGRAPHIC', [])
+        if geographic_rules:
+            receiver_countries = columns.receiver_countries
+            has_receiver = receiver_countries != ''
+            
+            for rule in geographic_rules:
+                config = rule.compiled_config
+                mask = np.isin(receiver_countries, list(config['high_risk_countries']))
+                if 'cross_border_threshold' in config:
+                    mask |= (
+                        has_receiver
+                        & (columns.customer_countries != receiver_countries)
+                        & (amounts >= rule.float_thresholds['cross_border_threshold'])
+                    )
+                masks[rule.pk] = mask
+        
+        return masks
     
-    def _evaluate_rule(self, rule: Rule, transaction: Transaction) -> Dict:
+    def _get_customer_stats(self, customer_ids: set, cutoffs: Dict) -> Dict[int, Dict]:
         """
-        Evaluate a single rule against a transaction
+        Aggregate the "as of now" statistics the threshold and pattern rules need,
+        for all given customers in a single grouped query.
+        
+        Structuring/rapid counts are "as of now" windows, so a GROUP BY with
+        filtered COUNTs gives the same answer for every transaction of a customer;
+        a per-row window function (COUNT(*) OVER ... RANGE) is not needed.
         
         Returns:
-            Dict with 'triggered', 'reason', and 'risk_score'
+            Dict of customer_id -> {stat_name: value}; customers without matching
+            transactions are absent (treat as zero)
         """
-        rule_type = rule.rule_type
-        config = rule.configuration
-        
-        if rule_type == 'THRESHOLD':
-            return self._evaluate_threshold_rule(rule, transaction, config)
-        elif rule_type == 'PATTERN':
-            return self._evaluate_pattern_rule(rule, transaction, config)
-        elif rule_type == 'BEHAVIORAL':
-            return self._evaluate_behavioral_rule(rule, transaction, config)
-        elif rule_type == 'GEOGRAPHIC':
-            return self._evaluate_geographic_rule(rule, transaction, config)
-        else:
-            logger.warning(f"Unknown rule type: {rule_type}")
-            return {'triggered': False, 'reason': '', 'risk_score': 0}
+        today_start = cutoffs['today_start']
+        aggregates = {}
+        since = cutoffs['now']
+        
+        for rule in self._rules_by_type.get('THRESHOLD', []):
+            config = rule.compiled_config
+            if 'daily_count_threshold' in config or 'daily_amount_threshold' in config:
+                aggregates['today_count'] = Count('id', filter=Q(transaction_date__gte=today_start))
+                aggregates['today_total'] = Sum('amount', filter=Q(transaction_date__gte=today_start))
+                since = min(since, today_start)
+        
+        for rule in self._rules_by_type.get('PATTERN', []):
+            config = rule.compiled_config
+            if 'structuring_threshold' in config:
+                threshold = config['structuring_threshold']
+                lookback_date = cutoffs[f'structuring_since_{rule.pk}']
+                aggregates[config['structuring_stat']] = Count('id', filter=Q(
+                    transaction_date__gte=lookback_date,
+                    amount__gte=config['structuring_floor'],
+                    amount__lt=threshold,
+                ))
+                since = min(since, lookback_date)
+            if 'rapid_transaction_threshold' in config:
+                time_threshold = cutoffs[f'rapid_since_{rule.pk}']
+                aggregates[config['rapid_stat']] = Count('id', filter=Q(transaction_date__gte=time_threshold))
+                since = min(since, time_threshold)
+        
+        if not aggregates or not customer_ids:
+            return {}
+        
+        rows = Transaction.objects.filter(
+            customer_id__in=customer_ids,
+            transaction_date__gte=since,
+            status='COMPLETED'
+        ).order_by().values('customer_id').annotate(**aggregates)
+        return {row.pop('customer_id'): row for row in rows}
     
-    def _evaluate_threshold_rule(self, rule: Rule, transaction: Transaction, config: Dict) -> Dict:
+    def _evaluate_threshold_rule(self, rule: Rule, transaction: Transaction, config: Dict,
+                                 stats: Dict, cutoffs: Dict) -> Dict:
         """
         Evaluate threshold-based rules (amount, frequency, etc.)
         """
@@ -92,20 +363,15 @@ class RuleEngine:
         
         # Amount threshold
         if 'amount_threshold' in config:
-            threshold = Decimal(str(config['amount_threshold']))
+            threshold = config['amount_threshold']
             if transaction.amount >= threshold:
                 triggered = True
                 reason = f"Transaction amount {transaction.amount} exceeds threshold {threshold}"
-                risk_score = min(100, float(transaction.amount / threshold) * 50)
+                risk_score = min(100, float(transaction.amount) / rule.float_thresholds['amount_threshold'] * 50)
         
         # Daily transaction count threshold
         if 'daily_count_threshold' in config:
-            today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            today_count = Transaction.objects.filter(
-                customer=transaction.customer,
-                transaction_date__gte=today_start,
-                status='COMPLETED'
-            ).count()
+            today_count = stats.get('today_count', 0)
             
             if today_count >= config['daily_count_threshold']:
                 triggered = True
@@ -114,18 +380,13 @@ class RuleEngine:
         
         # Daily amount threshold
         if 'daily_amount_threshold' in config:
-            today_start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            today_total = Transaction.objects.filter(
-                customer=transaction.customer,
-                transaction_date__gte=today_start,
-                status='COMPLETED'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+            today_total = stats.get('today_total') or Decimal('0')
             
-            threshold = Decimal(str(config['daily_amount_threshold']))
+            threshold = config['daily_amount_threshold']
             if today_total >= threshold:
                 triggered = True
                 reason = f"Daily transaction amount {today_total} exceeds threshold {threshold}"
-                risk_score = max(risk_score, min(100, float(today_total / threshold) * 50))
+                risk_score = max(risk_score, min(100, float(today_total) / rule.float_thresholds['daily_amount_threshold'] * 50))
         
         return {
             'triggered': triggered,
@@ -133,7 +394,8 @@ class RuleEngine:
             'risk_score': risk_score
         }
     
-    def _evaluate_pattern_rule(self, rule: Rule, transaction: Transaction, config: Dict) -> Dict:
+    def _evaluate_pattern_rule(self, rule: Rule, transaction: Transaction, config: Dict,
+                               stats: Dict, cutoffs: Dict) -> Dict:
         """
         Evaluate pattern-based rules (structuring, layering, etc.)
         """
@@ -143,20 +405,11 @@ class RuleEngine:
         
         # Structuring detection (multiple transactions just below threshold)
         if 'structuring_threshold' in config:
-            threshold = Decimal(str(config['structuring_threshold']))
+            threshold = config['structuring_threshold']
             # Check if transaction is just below threshold
-            if threshold * Decimal('0.9') <= transaction.amount < threshold:
-                # Check for multiple similar transactions
-                lookback_days = config.get('lookback_days', 7)
-                lookback_date = timezone.now() - timedelta(days=lookback_days)
-                
-                similar_transactions = Transaction.objects.filter(
-                    customer=transaction.customer,
-                    transaction_date__gte=lookback_date,
-                    amount__gte=threshold * Decimal('0.9'),
-                    amount__lt=threshold,
-                    status='COMPLETED'
-                ).count()
+            if config['structuring_floor'] <= transaction.amount < threshold:
+                # Check for multiple similar transactions within lookback_days
+                similar_transactions = stats.get(config['structuring_stat'], 0)
                 
                 if similar_transactions >= config.get('structuring_count', 3):
                     triggered = True
@@ -167,13 +420,7 @@ class RuleEngine:
         if 'rapid_transaction_threshold' in config:
             minutes_threshold = config.get('rapid_transaction_minutes', 10)
             count_threshold = config.get('rapid_transaction_count', 5)
-            
-            time_threshold = timezone.now() - timedelta(minutes=minutes_threshold)
-            recent_count = Transaction.objects.filter(
-                customer=transaction.customer,
-                transaction_date__gte=time_threshold,
-                status='COMPLETED'
-            ).count()
+            recent_count = stats.get(config['rapid_stat'], 0)
             
             if recent_count >= count_threshold:
                 triggered = True
@@ -186,7 +433,8 @@ class RuleEngine:
             'risk_score': risk_score
         }
     
-    def _evaluate_behavioral_rule(self, rule: Rule, transaction: Transaction, config: Dict) -> Dict:
+    def _evaluate_behavioral_rule(self, rule: Rule, transaction: Transaction, config: Dict,
+                                  stats: Dict, cutoffs: Dict) -> Dict:
         """
         Evaluate behavioral rules (sudden behavior changes)
         """
@@ -194,23 +442,14 @@ class RuleEngine:
         reason = ""
         risk_score = 0
         
-        customer = transaction.customer
-        
         # Check for sudden increase in transaction amount
         if 'amount_increase_threshold' in config:
-            # Get average transaction amount in last 30 days
-            lookback_days = config.get('lookback_days', 30)
-            lookback_date = timezone.now() - timedelta(days=lookback_days)
-            
-            avg_amount = Transaction.objects.filter(
-                customer=customer,
-                transaction_date__gte=lookback_date,
-                transaction_date__lt=transaction.transaction_date,
-                status='COMPLETED'
-            ).aggregate(avg=Avg('amount'))['avg']
+            # Get average transaction amount in last lookback_days (default 30)
+            lookback_date = cutoffs[f'lookback_since_{rule.pk}']
+            avg_amount = self._get_behavioral_stats(transaction, lookback_date, stats)['avg_amount']
             
             if avg_amount:
-                increase_ratio = float(transaction.amount / avg_amount)
+                increase_ratio = float(transaction.amount) / float(avg_amount)
                 threshold_ratio = config.get('amount_increase_threshold', 3.0)
                 
                 if increase_ratio >= threshold_ratio:
@@ -221,23 +460,10 @@ class RuleEngine:
         # Check for change in transaction pattern
         if 'pattern_change_detection' in config and config['pattern_change_detection']:
             # Compare last 7 days vs previous 7 days
-            now = transaction.transaction_date
-            recent_start = now - timedelta(days=7)
-            previous_start = recent_start - timedelta(days=7)
-            
-            recent_count = Transaction.objects.filter(
-                customer=customer,
-                transaction_date__gte=recent_start,
-                transaction_date__lt=now,
-                status='COMPLETED'
-            ).count()
-            
-            previous_count = Transaction.objects.filter(
-                customer=customer,
-                transaction_date__gte=previous_start,
-                transaction_date__lt=recent_start,
-                status='COMPLETED'
-            ).count()
+            lookback_date = cutoffs.get(f'lookback_since_{rule.pk}')
+            behavioral_stats = self._get_behavioral_stats(transaction, lookback_date, stats)
+            recent_count = behavioral_stats['recent_count']
+            previous_count = behavioral_stats['previous_count']
             
             if previous_count > 0:
                 change_ratio = recent_count / previous_count
@@ -252,7 +478,37 @@ class RuleEngine:
             'risk_score': risk_score
         }
     
-    def _evaluate_geographic_rule(self, rule: Rule, transaction: Transaction, config: Dict) -> Dict:
+    def _get_behavioral_stats(self, transaction: Transaction, lookback_date: Optional[datetime],
+                              stats: Dict) -> Dict:
+        """
+        Transaction-relative aggregates for behavioral rules in one query: the
+        average amount since lookback_date (up to the transaction) and the counts
+        for the recent/previous pattern-change windows.
+        
+        Memoized in the customer's stats dict, so behavioral rules sharing a
+        lookback window share the query.
+        """
+        key = ('behavioral', transaction.pk, lookback_date)
+        if key not in stats:
+            recent_start = transaction.transaction_date - PATTERN_CHANGE_WINDOW
+            previous_start = recent_start - PATTERN_CHANGE_WINDOW
+            since = previous_start if lookback_date is None else min(lookback_date, previous_start)
+            aggregates = {
+                'recent_count': Count('id', filter=Q(transaction_date__gte=recent_start)),
+                'previous_count': Count('id', filter=Q(transaction_date__gte=previous_start,
+                                                       transaction_date__lt=recent_start)),
+                'avg_amount': Avg('amount', filter=Q(transaction_date__gte=lookback_date or since)),
+            }
+            stats[key] = Transaction.objects.filter(
+                customer_id=transaction.customer_id,
+                transaction_date__gte=since,
+                transaction_date__lt=transaction.transaction_date,
+                status='COMPLETED'
+            ).aggregate(**aggregates)
+        return stats[key]
+    
+    def _evaluate_geographic_rule(self, rule: Rule, transaction: Transaction, config: Dict,
+                                  stats: Dict, cutoffs: Dict) -> Dict:
         """
         Evaluate geographic-based rules (high-risk countries, etc.)
         """
@@ -261,8 +517,7 @@ class RuleEngine:
         risk_score = 0
         
         # High-risk countries
-        high_risk_countries = config.get('high_risk_countries', [])
-        if transaction.receiver_country in high_risk_countries:
+        if transaction.receiver_country in config['high_risk_countries']:
             triggered = True
             reason = f"Transaction to high-risk country: {transaction.receiver_country}"
             risk_score = 70
@@ -270,11 +525,11 @@ class RuleEngine:
         # Cross-border transaction threshold
         if 'cross_border_threshold' in config and transaction.receiver_country:
             if transaction.customer.country != transaction.receiver_country:
-                threshold = Decimal(str(config['cross_border_threshold']))
+                threshold = config['cross_border_threshold']
                 if transaction.amount >= threshold:
                     triggered = True
                     reason = f"Large cross-border transaction: {transaction.amount} from {transaction.customer.country} to {transaction.receiver_country}"
-                    risk_score = max(risk_score, min(100, float(transaction.amount / threshold) * 40))
+                    risk_score = max(risk_score, min(100, float(transaction.amount) / rule.float_thresholds['cross_border_threshold'] * 40))
         
         return {
             'triggered': triggered,
@@ -282,19 +537,74 @@ class RuleEngine:
             'risk_score': risk_score
         }
     
+    def _ensure_current(self):
+        """Reload the compiled rules if the shared rule-set version moved on"""
+        if get_rules_version() == self.compiled_version:
+            return
+        with self._reload_lock:
+            if get_rules_version() != self.compiled_version:
+                self._load_rules()
+                logger.info("Rules reloaded after rule change")
+    
     def reload_rules(self):
         """Reload rules from database"""
-        self._load_rules()
+        bump_rules_version()
+        with self._reload_lock:
+            self._load_rules()
         logger.info("Rules reloaded")
 
 
+@lru_cache(maxsize=8)
+def _load_compiled_rules(version: str) -> Tuple[Rule, ...]:
+    """
+    Active rules for a rule-set version with their configs compiled
+    (shared by every RuleEngine in the process until the version changes)
+    
+    The rule table comes from the shared cache when another worker already
+    loaded this version, otherwise from the database (one query).
+    """
+    cached = cache.get(RULES_TABLE_CACHE_KEY)
+    if cached is not None and cached[0] == version:
+        rules = cached[1]
+    else:
+        rules = list(
+            Rule.objects.filter(status='ACTIVE')
+            .only('id', 'name', 'description', 'rule_type', 'configuration', 'priority', 'risk_weight')
+            .order_by('priority')
+        )
+        cache.set(RULES_TABLE_CACHE_KEY, (version, rules), None)
+    
+    compiled = []
+    stat_names = {}
+    for rule in rules:
+        try:
+            rule.compiled_config = RuleEngine._compile_config(rule.configuration)
+        except Exception as e:
+            logger.error(f"Invalid configuration for rule {rule.name}: {str(e)}")
+            continue
+        if rule.rule_type == 'PATTERN':
+            RuleEngine._assign_stat_names(rule.compiled_config, stat_names)
+        # Float copies for risk-score arithmetic; Decimal stays for comparisons and messages
+        rule.float_thresholds = {
+            key: float(value) for key, value in rule.compiled_config.items() if key in DECIMAL_CONFIG_KEYS
+        }
+        rule.float_risk_weight = float(rule.risk_weight)
+        compiled.append(rule)
+    
+    logger.info(f"Loaded {len(compiled)} active rules")
+    return tuple(compiled)
+
+
 # Singleton instance
 _rule_engine_instance = None
+_rule_engine_lock = threading.Lock()
 
 def get_rule_engine() -> RuleEngine:
-    """Get singleton instance of RuleEngine"""
+    """Get singleton instance of RuleEngine (thread-safe lazy init)"""
     global _rule_engine_instance
     if _rule_engine_instance is None:
-        _rule_engine_instance = RuleEngine()
+        with _rule_engine_lock:
+            if _rule_engine_instance is None:
+                _rule_engine_instance = RuleEngine()
     return _rule_engine_instance
 
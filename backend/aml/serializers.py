@@ -4,10 +4,36 @@ DRF Serializers for AML models
 from rest_framework import serializers
 from .models import Customer, Transaction, Alert, RiskScore, Rule, Report, AuditLog
 
+# context['detail_level'] value (set from ?detail=summary) selecting compact nested details
+DETAIL_SUMMARY = 'summary'
+
+
+class CustomerCachingListSerializer(serializers.ListSerializer):
+    """
+    List serializer that lets nested CustomerSerializers reuse one representation
+    per customer within a single response (alerts embed the customer twice).
+    """
+    
+    def to_representation(self, data):
+        self.context['customer_representations'] = {}
+        try:
+            return super().to_representation(data)
+        finally:
+            self.context.pop('customer_representations', None)
+
 
 class CustomerSerializer(serializers.ModelSerializer):
     """Serializer for Customer model"""
     
+    def to_representation(self, instance):
+        cache = self.context.get('customer_representations')
+        if cache is None:
+            return super().to_representation(instance)
+        key = (type(self), instance.pk)
+        if key not in cache:
+            cache[key] = super().to_representation(instance)
+        return cache[key]
+    
     class Meta:
         model = Customer
         fields = [
@@ -19,10 +45,28 @@ class CustomerSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class CustomerSummarySerializer(CustomerSerializer):
+    """Compact customer representation for nested details at the summary level"""
+    
+    class Meta(CustomerSerializer.Meta):
+        fields = ['id', 'customer_id', 'first_name', 'last_name', 'current_risk_level']
+
+
 class TransactionSerializer(serializers.ModelSerializer):
     """Serializer for Transaction model"""
     customer_detail = CustomerSerializer(source='customer', read_only=True)
     
+    # Free-text columns left out at the summary level (the views defer them)
+    SUMMARY_OMITTED_FIELDS = ['description']
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('detail_level') == DETAIL_SUMMARY:
+            fields['customer_detail'] = CustomerSummarySerializer(source='customer', read_only=True)
+            for name in self.SUMMARY_OMITTED_FIELDS:
+                del fields[name]
+        return fields
+    
     class Meta:
         model = Transaction
         fields = [
@@ -35,6 +79,7 @@ class TransactionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'risk_score', 'is_suspicious', 
                            'flagged_reasons', 'created_at', 'updated_at']
+        list_serializer_class = CustomerCachingListSerializer
 
 
 class RuleSerializer(serializers.ModelSerializer):
@@ -50,12 +95,35 @@ class RuleSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at', 'last_applied_at']
 
 
+class RuleSummarySerializer(serializers.ModelSerializer):
+    """Compact rule representation for nested details at the summary level"""
+    
+    class Meta:
+        model = Rule
+        fields = ['id', 'name', 'rule_type', 'priority', 'risk_weight']
+        read_only_fields = fields
+
+
 class AlertSerializer(serializers.ModelSerializer):
     """Serializer for Alert model"""
     transaction_detail = TransactionSerializer(source='transaction', read_only=True)
     customer_detail = CustomerSerializer(source='customer', read_only=True)
     triggered_rules_detail = RuleSerializer(source='triggered_rules', many=True, read_only=True)
     
+    # Free-text columns left out at the summary level (the views defer them)
+    SUMMARY_OMITTED_FIELDS = ['description', 'review_notes', 'resolution_notes']
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('detail_level') == DETAIL_SUMMARY:
+            fields['customer_detail'] = CustomerSummarySerializer(source='customer', read_only=True)
+            fields['triggered_rules_detail'] = RuleSummarySerializer(
+                source='triggered_rules', many=True, read_only=True
+            )
+            for name in self.SUMMARY_OMITTED_FIELDS:
+                del fields[name]
+        return fields
+    
     class Meta:
         model = Alert
         fields = [
@@ -66,12 +134,19 @@ class AlertSerializer(serializers.ModelSerializer):
             'resolution_notes', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'alert_id', 'created_at', 'updated_at']
+        list_serializer_class = CustomerCachingListSerializer
 
 
 class RiskScoreSerializer(serializers.ModelSerializer):
     """Serializer for RiskScore model"""
     customer_detail = CustomerSerializer(source='customer', read_only=True)
     
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('detail_level') == DETAIL_SUMMARY:
+            fields['customer_detail'] = CustomerSummarySerializer(source='customer', read_only=True)
+        return fields
+    
     class Meta:
         model = RiskScore
         fields = [
@@ -80,6 +155,7 @@ class RiskScoreSerializer(serializers.ModelSerializer):
             'calculated_at', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+        list_serializer_class = CustomerCachingListSerializer
 
 
 class ReportSerializer(serializers.ModelSerializer):
@@ -6,13 +6,42 @@ import logging
 import uuid
 from decimal import Decimal
 from typing import Dict, Optional, List
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Avg
+from django.db.models import Avg, Count, Q
 
 from aml.models import Alert, Transaction, Customer, Rule
 
 logger = logging.getLogger('aml')
 
+# Rows per statement for bulk alert INSERTs/UPDATEs
+BULK_BATCH_SIZE = 500
+
+# Columns a review writes; updates are limited to these so the UPDATE stays narrow
+REVIEW_FIELDS = ['status', 'reviewed_by', 'reviewed_at', 'review_notes', 'resolution_notes', 'updated_at']
+
+# Open-alert counts polled by the dashboard; dropped whenever alert status/severity may change
+OPEN_ALERTS_COUNT_CACHE_KEY = 'aml:alerts:open_count'
+OPEN_ALERTS_COUNT_CACHE_TIMEOUT = 20
+
+# Period statistics, one entry per ?days= value; all dropped at once by a new generation token
+ALERT_STATS_GENERATION_CACHE_KEY = 'aml:alerts:stats:generation'
+ALERT_STATS_CACHE_TIMEOUT = 15
+
+
+def invalidate_alert_aggregates():
+    """Drop the cached open-alert counts and statistics (bulk writes and update() send no post_save)"""
+    cache.delete_many([OPEN_ALERTS_COUNT_CACHE_KEY, ALERT_STATS_GENERATION_CACHE_KEY])
+
+
+def _alert_stats_generation() -> str:
+    """Current statistics generation token (created on first use)"""
+    generation = cache.get(ALERT_STATS_GENERATION_CACHE_KEY)
+    if generation is None:
+        cache.add(ALERT_STATS_GENERATION_CACHE_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(ALERT_STATS_GENERATION_CACHE_KEY)
+    return generation
+
 
 class AlertGenerator:
     """
@@ -37,8 +66,62 @@ class AlertGenerator:
         Returns:
             Created Alert object
         """
-        logger.info(f"Generating alert for transaction {transaction.transaction_id}")
+        logger.info("Generating alert for transaction %s", transaction.transaction_id)
+        
+        alert = self._build_alert(transaction, triggered_rules, risk_score, severity, reasons)
+        alert.save(force_insert=True)
+        
+        # Add triggered rules (new alert: insert the links directly, set() would first read existing ones)
+        if triggered_rules:
+            through_model = Alert.triggered_rules.through
+            through_model.objects.bulk_create([
+                through_model(alert_id=alert.pk, rule_id=rule_pk)
+                for rule_pk in dict.fromkeys(rule.pk for rule in triggered_rules)
+            ])
+        
+        logger.info("Alert %s created for transaction %s with severity %s", alert.alert_id, transaction.transaction_id, severity)
+        
+        return alert
+    
+    def generate_alerts(self, items: List[Dict]) -> List[Alert]:
+        """
+        Generate alerts for many transactions with bulk INSERTs
+        
+        Triggered rules are the rule engine's shared, already-loaded Rule
+        instances, so titles/descriptions read rule names in memory (no lookups).
+        
+        Args:
+            items: List of dicts with the generate_alert() keyword arguments
+                   (transaction, triggered_rules, risk_score, severity, reasons)
+            
+        Returns:
+            List of created Alert objects
+        """
+        alerts = [self._build_alert(**item) for item in items]
+        Alert.objects.bulk_create(alerts, batch_size=BULK_BATCH_SIZE)
+        
+        # Alert ids are client-side UUIDs, so the M2M rows can be built without re-reading
+        through_model = Alert.triggered_rules.through
+        through_model.objects.bulk_create(
+            [
+                through_model(alert_id=alert.pk, rule_id=rule.pk)
+                for alert, item in zip(alerts, items)
+                for rule in item['triggered_rules']
+            ],
+            batch_size=BULK_BATCH_SIZE * 2,
+        )
+        
+        invalidate_alert_aggregates()
         
+        logger.info(f"{len(alerts)} alerts created in bulk")
+        return alerts
+    
+    def _build_alert(self, transaction: Transaction,
+                     triggered_rules: List[Rule],
+                     risk_score: Decimal,
+                     severity: str,
+                     reasons: List[str]) -> Alert:
+        """Build an unsaved Alert for a suspicious transaction"""
         # Generate unique alert ID
         alert_id = f"ALT-{timezone.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
         
@@ -46,27 +129,25 @@ class AlertGenerator:
         title = self._generate_alert_title(transaction, triggered_rules, severity)
         
         # Create alert description
-        description = self._generate_alert_description(transaction, triggered_rules, reasons, risk_score)
+        customer = transaction.customer
+        description = self._generate_alert_description(
+            transaction=transaction,
+            customer=customer,
+            triggered_rules=triggered_rules,
+            reasons=reasons,
+            risk_score=risk_score
+        )
         
-        # Create alert
-        alert = Alert.objects.create(
+        return Alert(
             alert_id=alert_id,
             transaction=transaction,
-            customer=transaction.customer,
+            customer=customer,
             severity=severity,
             status='OPEN',
             title=title,
             description=description,
             risk_score=risk_score
         )
-        
-        # Add triggered rules
-        if triggered_rules:
-            alert.triggered_rules.set(triggered_rules)
-        
-        logger.info(f"Alert {alert_id} created for transaction {transaction.transaction_id} with severity {severity}")
-        
-        return alert
     
     def _generate_alert_title(self, transaction: Transaction, 
                              triggered_rules: List[Rule],
@@ -80,18 +161,19 @@ class AlertGenerator:
         else:
             return f"[{severity}] Suspicious Transaction - High Risk Score"
     
-    def _generate_alert_description(self, transaction: Transaction,
+    def _generate_alert_description(self, *, transaction: Transaction,
+                                   customer: Customer,
                                    triggered_rules: List[Rule],
                                    reasons: List[str],
                                    risk_score: Decimal) -> str:
         """Generate alert description"""
         description_parts = [
-            f"Transaction ID: {transaction.transaction_id}",
-            f"Customer: {transaction.customer.first_name} {transaction.customer.last_name} ({transaction.customer.customer_id})",
-            f"Amount: {transaction.amount} {transaction.currency}",
-            f"Type: {transaction.get_transaction_type_display()}",
-            f"Date: {transaction.transaction_date.strftime('%Y-%m-%d %H:%M:%S')}",
-            f"Risk Score: {risk_score}",
+            f"Transaction ID: {transaction.transaction_id}\n"
+            f"Customer: {customer.first_name} {customer.last_name} ({customer.customer_id})\n"
+            f"Amount: {transaction.amount} {transaction.currency}\n"
+            f"Type: {transaction.get_transaction_type_display()}\n"
+            f"Date: {transaction.transaction_date:%Y-%m-%d %H:%M:%S}\n"
+            f"Risk Score: {risk_score}"
         ]
         
         if transaction.receiver_account:
@@ -102,13 +184,11 @@ class AlertGenerator:
         
         if reasons:
             description_parts.append("\nTriggered Reasons:")
-            for i, reason in enumerate(reasons, 1):
-                description_parts.append(f"{i}. {reason}")
+            description_parts.extend(f"{i}. {reason}" for i, reason in enumerate(reasons, 1))
         
         if triggered_rules:
             description_parts.append("\nTriggered Rules:")
-            for rule in triggered_rules:
-                description_parts.append(f"- {rule.name}: {rule.description}")
+            description_parts.extend(f"- {rule.name}: {rule.description}" for rule in triggered_rules)
         
         return "\n".join(description_parts)
     
@@ -128,15 +208,7 @@ class AlertGenerator:
         """
         logger.info(f"Reviewing alert {alert.alert_id} by {reviewer}")
         
-        alert.status = status
-        alert.reviewed_by = reviewer
-        alert.reviewed_at = timezone.now()
-        alert.review_notes = notes
-        
-        if status == 'RESOLVED':
-            alert.resolution_notes = notes
-        
-        alert.save()
+        self._save_reviews([alert], reviewer, lambda a: self._apply_review(a, status, notes))
         
         logger.info(f"Alert {alert.alert_id} reviewed. Status: {status}")
         
@@ -156,20 +228,7 @@ class AlertGenerator:
         """
         logger.info(f"Escalating alert {alert.alert_id}")
         
-        # Increase severity if not already CRITICAL
-        if alert.severity != 'CRITICAL':
-            severity_map = {
-                'LOW': 'MEDIUM',
-                'MEDIUM': 'HIGH',
-                'HIGH': 'CRITICAL'
-            }
-            alert.severity = severity_map.get(alert.severity, 'CRITICAL')
-        
-        alert.status = 'ESCALATED'
-        alert.reviewed_by = reviewer
-        alert.reviewed_at = timezone.now()
-        alert.review_notes = f"ESCALATED: {notes}"
-        alert.save()
+        self._save_reviews([alert], reviewer, lambda a: self._apply_escalation(a, notes), ['severity'])
         
         logger.info(f"Alert {alert.alert_id} escalated to {alert.severity}")
         
@@ -189,24 +248,87 @@ class AlertGenerator:
         """
         logger.info(f"Marking alert {alert.alert_id} as false positive")
         
-        alert.status = 'FALSE_POSITIVE'
-        alert.reviewed_by = reviewer
-        alert.reviewed_at = timezone.now()
-        alert.review_notes = notes
-        alert.resolution_notes = f"False Positive: {notes}"
-        alert.save()
+        self._save_reviews([alert], reviewer, lambda a: self._apply_false_positive(a, notes))
         
         logger.info(f"Alert {alert.alert_id} marked as false positive")
         
         return alert
     
-    def get_alerts_by_severity(self, severity: str, status: Optional[str] = None) -> List[Alert]:
+    def bulk_review(self, alerts: List[Alert], reviewer: str,
+                    status: str, notes: str) -> List[Alert]:
+        """
+        Apply one review decision to many alerts with batched UPDATEs
+        
+        ESCALATED and FALSE_POSITIVE are handled as in escalate_alert()
+        and mark_false_positive(); other statuses as in review_alert().
+        
+        Args:
+            alerts: Alerts to review
+            reviewer: Username of reviewer
+            status: New status
+            notes: Review notes
+            
+        Returns:
+            List of updated Alert objects
+        """
+        logger.info(f"Reviewing {len(alerts)} alerts by {reviewer}. Status: {status}")
+        
+        if status == 'ESCALATED':
+            return self._save_reviews(alerts, reviewer, lambda a: self._apply_escalation(a, notes), ['severity'])
+        if status == 'FALSE_POSITIVE':
+            return self._save_reviews(alerts, reviewer, lambda a: self._apply_false_positive(a, notes))
+        return self._save_reviews(alerts, reviewer, lambda a: self._apply_review(a, status, notes))
+    
+    def _save_reviews(self, alerts: List[Alert], reviewer: str, apply,
+                      extra_fields: Optional[List[str]] = None) -> List[Alert]:
+        """Apply a review change to each alert in memory, then write only the review columns"""
+        now = timezone.now()
+        for alert in alerts:
+            apply(alert)
+            alert.reviewed_by = reviewer
+            alert.reviewed_at = now
+            alert.updated_at = now  # bulk_update() skips auto_now
+        
+        Alert.objects.bulk_update(alerts, REVIEW_FIELDS + (extra_fields or []), batch_size=BULK_BATCH_SIZE)
+        invalidate_alert_aggregates()
+        return alerts
+    
+    @staticmethod
+    def _apply_review(alert: Alert, status: str, notes: str):
+        alert.status = status
+        alert.review_notes = notes
+        if status == 'RESOLVED':
+            alert.resolution_notes = notes
+    
+    @staticmethod
+    def _apply_escalation(alert: Alert, notes: str):
+        # Increase severity if not already CRITICAL
+        if alert.severity != 'CRITICAL':
+            severity_map = {
+                'LOW': 'MEDIUM',
+                'MEDIUM': 'HIGH',
+                'HIGH': 'CRITICAL'
+            }
+            alert.severity = severity_map.get(alert.severity, 'CRITICAL')
+        
+        alert.status = 'ESCALATED'
+        alert.review_notes = f"ESCALATED: {notes}"
+    
+    @staticmethod
+    def _apply_false_positive(alert: Alert, notes: str):
+        alert.status = 'FALSE_POSITIVE'
+        alert.review_notes = notes
+        alert.resolution_notes = f"False Positive: {notes}"
+    
+    def get_alerts_by_severity(self, severity: str, status: Optional[str] = None,
+                               limit: int = 200) -> List[Alert]:
         """
         Get alerts filtered by severity and optionally by status
         
         Args:
             severity: Severity level
             status: Optional status filter
+            limit: Maximum number of alerts to return (newest first)
             
         Returns:
             List of Alert objects
@@ -216,7 +338,7 @@ class AlertGenerator:
         if status:
             queryset = queryset.filter(status=status)
         
-        return list(queryset.order_by('-created_at'))
+        return list(queryset.order_by('-created_at')[:limit])
     
     def get_customer_alerts(self, customer: Customer, 
                            status: Optional[str] = None,
@@ -243,60 +365,73 @@ class AlertGenerator:
         """
         Get count of open alerts by severity
         
+        Cached for OPEN_ALERTS_COUNT_CACHE_TIMEOUT seconds; alert writes invalidate it.
+        
         Returns:
             Dict with severity as key and count as value
         """
-        alerts = Alert.objects.filter(status='OPEN')
+        return cache.get_or_set(
+            OPEN_ALERTS_COUNT_CACHE_KEY, self._compute_open_alerts_count, OPEN_ALERTS_COUNT_CACHE_TIMEOUT
+        )
+    
+    def _compute_open_alerts_count(self) -> Dict[str, int]:
+        """Count open alerts by severity in one aggregate query"""
+        counts = Alert.objects.filter(status='OPEN').aggregate(
+            TOTAL=Count('id'),
+            **self._count_by('severity', Alert.SEVERITY_LEVELS)
+        )
         
         return {
-            'LOW': alerts.filter(severity='LOW').count(),
-            'MEDIUM': alerts.filter(severity='MEDIUM').count(),
-            'HIGH': alerts.filter(severity='HIGH').count(),
-            'CRITICAL': alerts.filter(severity='CRITICAL').count(),
-            'TOTAL': alerts.count()
+            **{severity: counts[f'severity_{severity}'] for severity, _ in Alert.SEVERITY_LEVELS},
+            'TOTAL': counts['TOTAL']
         }
     
     def get_alerts_statistics(self, days: int = 30) -> Dict:
         """
         Get alert statistics for the last N days
         
+        Cached for ALERT_STATS_CACHE_TIMEOUT seconds per days value; alert writes invalidate it.
+        
         Args:
             days: Number of days to look back
             
         Returns:
             Dict with statistics
         """
+        return cache.get_or_set(
+            f'aml:alerts:stats:{_alert_stats_generation()}:{days}',
+            lambda: self._compute_alerts_statistics(days),
+            ALERT_STATS_CACHE_TIMEOUT
+        )
+    
+    def _compute_alerts_statistics(self, days: int) -> Dict:
+        """Alert statistics for the last N days in one aggregate query"""
         start_date = timezone.now() - timezone.timedelta(days=days)
-        alerts = Alert.objects.filter(created_at__gte=start_date)
+        # One pass over the period: filtered COUNTs per severity/status plus the average
+        stats = Alert.objects.filter(created_at__gte=start_date).aggregate(
+            total=Count('id'),
+            average_risk_score=Avg('risk_score'),
+            **self._count_by('severity', Alert.SEVERITY_LEVELS),
+            **self._count_by('status', Alert.STATUS_CHOICES)
+        )
         
         return {
-            'total': alerts.count(),
-            'by_severity': {
-                'LOW': alerts.filter(severity='LOW').count(),
-                'MEDIUM': alerts.filter(severity='MEDIUM').count(),
-                'HIGH': alerts.filter(severity='HIGH').count(),
-                'CRITICAL': alerts.filter(severity='CRITICAL').count(),
-            },
-            'by_status': {
-                'OPEN': alerts.filter(status='OPEN').count(),
-                'UNDER_REVIEW': alerts.filter(status='UNDER_REVIEW').count(),
-                'RESOLVED': alerts.filter(status='RESOLVED').count(),
-                'FALSE_POSITIVE': alerts.filter(status='FALSE_POSITIVE').count(),
-                'ESCALATED': alerts.filter(status='ESCALATED').count(),
-            },
-            'average_risk_score': float(
-                alerts.aggregate(avg=Avg('risk_score'))['avg'] or Decimal('0')
-            ) if alerts.exists() else 0,
+            'total': stats['total'],
+            'by_severity': {severity: stats[f'severity_{severity}'] for severity, _ in Alert.SEVERITY_LEVELS},
+            'by_status': {status: stats[f'status_{status}'] for status, _ in Alert.STATUS_CHOICES},
+            'average_risk_score': float(stats['average_risk_score'] or 0),
         }
+    
+    @staticmethod
+    def _count_by(field: str, choices) -> Dict[str, Count]:
+        """Filtered COUNT aggregates, one per choice value, aliased '<field>_<value>'"""
+        return {f'{field}_{value}': Count('id', filter=Q(**{field: value})) for value, _ in choices}
 
 
-# Singleton instance
-_alert_generator_instance = None
+# Singleton instance (built at import: stateless and needs no DB access)
+_alert_generator_instance = AlertGenerator()
 
 def get_alert_generator() -> AlertGenerator:
     """Get singleton instance of AlertGenerator"""
-    global _alert_generator_instance
-    if _alert_generator_instance is None:
-        _alert_generator_instance = AlertGenerator()
     return _alert_generator_instance
 
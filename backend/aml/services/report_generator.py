@@ -4,12 +4,15 @@ Generates regulatory reports (SAR, CTR, etc.)
 """
 import logging
 import uuid
-import json
 import csv
 import os
 from decimal import Decimal
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
+import orjson
+from django.db import transaction as db_transaction
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Concat
 from django.utils import timezone
 from django.conf import settings
 from reportlab.lib import colors
@@ -17,10 +20,72 @@ from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 
+from aml.fields import ORJSON_OPTIONS
 from aml.models import Report, Alert, Transaction, Customer
 
 logger = logging.getLogger('aml')
 
+LINK_BATCH_SIZE = 1000
+# Rows per fetch when a report streams its rows from a queryset
+REPORT_ROWS_CHUNK_SIZE = 2000
+
+# "First Last", concatenated by the database in the report row queries
+CUSTOMER_FULL_NAME = Concat('customer__first_name', Value(' '), 'customer__last_name')
+
+# report_data keys written per CSV row, in column order
+SAR_CSV_KEYS = (
+    'alert_id', 'transaction_id', 'customer_id', 'customer_name',
+    'amount', 'currency', 'severity', 'risk_score', 'created_at',
+)
+CTR_CSV_KEYS = (
+    'transaction_id', 'customer_id', 'customer_name', 'amount', 'currency',
+    'transaction_type', 'transaction_date', 'receiver_account', 'receiver_country',
+)
+
+# PDF exports list at most this many rows (CSV/JSON carry the full report)
+PDF_MAX_ROWS = 50
+
+
+class EmptyReportError(ValueError):
+    """Raised before anything is written when a report's selection has no rows"""
+
+
+def new_report_id(report_type: str) -> str:
+    """Unique report id, e.g. SAR-20240131-1A2B3C4D"""
+    return f"{report_type}-{timezone.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+
+
+# PDF styles are immutable once built: create them once per process, not per export
+PDF_STYLES = getSampleStyleSheet()
+METADATA_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.grey),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('BACKGROUND', (1, 0), (1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+ALERT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+SUMMARY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
 
 class ReportGenerator:
     """
@@ -29,98 +94,112 @@ class ReportGenerator:
     
     def __init__(self):
         self.reports_dir = os.path.join(settings.BASE_DIR, 'reports')
-        os.makedirs(self.reports_dir, exist_ok=True)
+        self._reports_dir_ready = False
     
-    def generate_sar(self, alerts: List[Alert], 
+    def generate_sar(self, alerts: Union[QuerySet, List[Alert]],
                     period_start: datetime,
                     period_end: datetime,
-                    submitted_by: str = '') -> Report:
+                    submitted_by: str = '',
+                    report: Optional[Report] = None) -> Report:
         """
         Generate Suspicious Activity Report (SAR)
         
         Args:
-            alerts: List of alerts to include in the report
+            alerts: Alerts to include in the report (a queryset is read in one streamed query)
             period_start: Start of reporting period
             period_end: End of reporting period
             submitted_by: Username of person submitting the report
+            report: Pending report row to fill in (a new report is created when omitted)
             
         Returns:
             Created Report object
+            
+        Raises:
+            EmptyReportError: if there are no alerts to report
         """
-        logger.info(f"Generating SAR report for {len(alerts)} alerts")
-        
-        # Generate report ID
-        report_id = f"SAR-{timezone.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+        rows = self._alert_rows(alerts)
+        if not rows:
+            raise EmptyReportError('No alerts found in the specified period')
+        logger.info(f"Generating SAR report for {len(rows)} alerts")
         
         # Prepare report data
         report_data = {
             'report_type': 'SAR',
             'period_start': period_start.isoformat(),
             'period_end': period_end.isoformat(),
-            'alerts_count': len(alerts),
+            'alerts_count': len(rows),
             'alerts': []
         }
         
         # Add alert details
-        for alert in alerts:
+        for row in rows:
             alert_data = {
-                'alert_id': alert.alert_id,
-                'transaction_id': alert.transaction.transaction_id,
-                'customer_id': alert.customer.customer_id,
-                'customer_name': f"{alert.customer.first_name} {alert.customer.last_name}",
-                'amount': str(alert.transaction.amount),
-                'currency': alert.transaction.currency,
-                'severity': alert.severity,
-                'risk_score': str(alert.risk_score),
-                'description': alert.description,
-                'created_at': alert.created_at.isoformat(),
+                'alert_id': row['alert_id'],
+                'transaction_id': row['transaction__transaction_id'],
+                'customer_id': row['customer__customer_id'],
+                'customer_name': row['customer_name'],
+                'amount': str(row['transaction__amount']),
+                'currency': row['transaction__currency'],
+                'severity': row['severity'],
+                'risk_score': str(row['risk_score']),
+                'description': row['description'],
+                'created_at': row['created_at'].isoformat(),
             }
             report_data['alerts'].append(alert_data)
         
-        # Create report object
-        report = Report.objects.create(
-            report_id=report_id,
-            report_type='SAR',
-            status='DRAFT',
-            title=f"Suspicious Activity Report - {period_start.date()} to {period_end.date()}",
-            description=f"SAR report containing {len(alerts)} suspicious activities",
-            report_data=report_data,
-            period_start=period_start,
-            period_end=period_end,
-            submitted_by=submitted_by
-        )
-        
-        # Link related entities
-        report.related_alerts.set(alerts)
-        report.related_transactions.set([alert.transaction for alert in alerts])
-        report.related_customers.set([alert.customer for alert in alerts])
+        # Create report object and its links in one commit (no savepoint when nested: errors propagate anyway)
+        with db_transaction.atomic(savepoint=False):
+            report = self._save_report(
+                report,
+                report_type='SAR',
+                status='DRAFT',
+                title=f"Suspicious Activity Report - {period_start.date()} to {period_end.date()}",
+                description=f"SAR report containing {len(rows)} suspicious activities",
+                report_data=report_data,
+                period_start=period_start,
+                period_end=period_end,
+                submitted_by=submitted_by
+            )
+            
+            # Link related entities
+            self._link_related(
+                report,
+                alert_ids=[row['pk'] for row in rows],
+                transaction_ids=[row['transaction_id'] for row in rows],
+                customer_ids=[row['customer_id'] for row in rows],
+            )
         
-        logger.info(f"SAR report {report_id} created")
+        logger.info(f"SAR report {report.report_id} created")
         
         return report
     
-    def generate_ctr(self, transactions: List[Transaction],
+    def generate_ctr(self, transactions: Union[QuerySet, List[Transaction]],
                     period_start: datetime,
                     period_end: datetime,
                     threshold: Decimal = Decimal('100000000'),
-                    submitted_by: str = '') -> Report:
+                    submitted_by: str = '',
+                    report: Optional[Report] = None) -> Report:
         """
         Generate Currency Transaction Report (CTR)
         
         Args:
-            transactions: List of transactions to include
+            transactions: Transactions to include (a queryset is read in one streamed query)
             period_start: Start of reporting period
             period_end: End of reporting period
             threshold: Amount threshold for CTR
             submitted_by: Username of person submitting the report
+            report: Pending report row to fill in (a new report is created when omitted)
             
         Returns:
             Created Report object
+            
+        Raises:
+            EmptyReportError: if there are no transactions to report
         """
-        logger.info(f"Generating CTR report for {len(transactions)} transactions")
-        
-        # Generate report ID
-        report_id = f"CTR-{timezone.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+        rows = self._transaction_rows(transactions)
+        if not rows:
+            raise EmptyReportError('No transactions found exceeding the threshold')
+        logger.info(f"Generating CTR report for {len(rows)} transactions")
         
         # Prepare report data
         report_data = {
@@ -128,47 +207,133 @@ class ReportGenerator:
             'period_start': period_start.isoformat(),
             'period_end': period_end.isoformat(),
             'threshold': str(threshold),
-            'transactions_count': len(transactions),
-            'total_amount': str(sum(t.amount for t in transactions)),
+            'transactions_count': len(rows),
+            'total_amount': str(sum((row['amount'] for row in rows), Decimal('0'))),
             'transactions': []
         }
         
         # Add transaction details
-        for transaction in transactions:
+        for row in rows:
             transaction_data = {
-                'transaction_id': transaction.transaction_id,
-                'customer_id': transaction.customer.customer_id,
-                'customer_name': f"{transaction.customer.first_name} {transaction.customer.last_name}",
-                'amount': str(transaction.amount),
-                'currency': transaction.currency,
-                'transaction_type': transaction.transaction_type,
-                'transaction_date': transaction.transaction_date.isoformat(),
-                'receiver_account': transaction.receiver_account,
-                'receiver_country': transaction.receiver_country,
+                'transaction_id': row['transaction_id'],
+                'customer_id': row['customer__customer_id'],
+                'customer_name': row['customer_name'],
+                'amount': str(row['amount']),
+                'currency': row['currency'],
+                'transaction_type': row['transaction_type'],
+                'transaction_date': row['transaction_date'].isoformat(),
+                'receiver_account': row['receiver_account'],
+                'receiver_country': row['receiver_country'],
             }
             report_data['transactions'].append(transaction_data)
         
-        # Create report object
-        report = Report.objects.create(
-            report_id=report_id,
-            report_type='CTR',
-            status='DRAFT',
-            title=f"Currency Transaction Report - {period_start.date()} to {period_end.date()}",
-            description=f"CTR report for transactions exceeding {threshold} threshold",
-            report_data=report_data,
-            period_start=period_start,
-            period_end=period_end,
-            submitted_by=submitted_by
-        )
-        
-        # Link related entities
-        report.related_transactions.set(transactions)
-        report.related_customers.set([t.customer for t in transactions])
+        # Create report object and its links in one commit (no savepoint when nested: errors propagate anyway)
+        with db_transaction.atomic(savepoint=False):
+            report = self._save_report(
+                report,
+                report_type='CTR',
+                status='DRAFT',
+                title=f"Currency Transaction Report - {period_start.date()} to {period_end.date()}",
+                description=f"CTR report for transactions exceeding {threshold} threshold",
+                report_data=report_data,
+                period_start=period_start,
+                period_end=period_end,
+                submitted_by=submitted_by
+            )
+            
+            # Link related entities
+            self._link_related(
+                report,
+                transaction_ids=[row['pk'] for row in rows],
+                customer_ids=[row['customer_id'] for row in rows],
+            )
         
-        logger.info(f"CTR report {report_id} created")
+        logger.info(f"CTR report {report.report_id} created")
         
         return report
     
+    @staticmethod
+    def _save_report(report: Optional[Report], **fields) -> Report:
+        """Create the report row, or fill in a pending one queued by the API"""
+        if report is None:
+            return Report.objects.create(report_id=new_report_id(fields['report_type']), **fields)
+        for name, value in fields.items():
+            setattr(report, name, value)
+        report.save(update_fields=[*fields, 'updated_at'])
+        return report
+    
+    def _report_path(self, filename: str) -> str:
+        """Path for an export file; the reports directory is created on the first export only"""
+        if not self._reports_dir_ready:
+            os.makedirs(self.reports_dir, exist_ok=True)
+            self._reports_dir_ready = True
+        return os.path.join(self.reports_dir, filename)
+    
+    def _alert_rows(self, alerts: Union[QuerySet, List[Alert]]) -> List[Dict]:
+        """Fetch the SAR columns (transaction/customer joined in) as dicts in one query, in input order"""
+        queryset = (
+            alerts if isinstance(alerts, QuerySet)
+            else Alert.objects.filter(pk__in=[alert.pk for alert in alerts])
+        )
+        rows = queryset.annotate(
+            customer_name=CUSTOMER_FULL_NAME,
+        ).values(
+            'pk', 'transaction_id', 'customer_id', 'alert_id', 'severity', 'risk_score',
+            'description', 'created_at', 'customer_name',
+            'transaction__transaction_id', 'transaction__amount', 'transaction__currency',
+            'customer__customer_id',
+        )
+        return self._in_input_order(rows, alerts)
+    
+    def _transaction_rows(self, transactions: Union[QuerySet, List[Transaction]]) -> List[Dict]:
+        """Fetch the CTR columns (customer joined in) as dicts in one query, in input order"""
+        queryset = (
+            transactions if isinstance(transactions, QuerySet)
+            else Transaction.objects.filter(pk__in=[t.pk for t in transactions])
+        )
+        rows = queryset.annotate(
+            customer_name=CUSTOMER_FULL_NAME,
+        ).values(
+            'pk', 'customer_id', 'transaction_id', 'amount', 'currency', 'transaction_type',
+            'transaction_date', 'receiver_account', 'receiver_country',
+            'customer__customer_id', 'customer_name',
+        )
+        return self._in_input_order(rows, transactions)
+    
+    @staticmethod
+    def _in_input_order(rows: QuerySet, source: Union[QuerySet, List]) -> List[Dict]:
+        """
+        Report rows in the order of the caller's objects.
+        
+        A queryset source already yields them in its own order: stream them in
+        chunks instead of materializing model instances plus a pk__in lookup.
+        """
+        if isinstance(source, QuerySet):
+            return list(rows.iterator(chunk_size=REPORT_ROWS_CHUNK_SIZE))
+        by_pk = {row['pk']: row for row in rows}
+        return [by_pk[obj.pk] for obj in source if obj.pk in by_pk]
+    
+    def _link_related(self, report: Report, alert_ids: List[int] = (),
+                      transaction_ids: List[int] = (), customer_ids: List[int] = ()):
+        """
+        Link related entities through the M2M through tables.
+        
+        One multi-row INSERT per relation instead of set()'s existence
+        SELECT plus per-relation INSERT; ids are de-duplicated up front
+        (many alerts share a customer) and ignore_conflicts covers reruns.
+        """
+        links = (
+            (Report.related_alerts.through, 'alert_id', alert_ids),
+            (Report.related_transactions.through, 'transaction_id', transaction_ids),
+            (Report.related_customers.through, 'customer_id', customer_ids),
+        )
+        for through, column, ids in links:
+            through.objects.bulk_create(
+                [through(report_id=report.pk, **{column: pk}) for pk in dict.fromkeys(ids)],
+                batch_size=LINK_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+    
     def export_report_json(self, report: Report) -> str:
         """
         Export report to JSON file
@@ -180,10 +345,11 @@ class ReportGenerator:
             Path to generated JSON file
         """
         filename = f"{report.report_id}.json"
-        filepath = os.path.join(self.reports_dir, filename)
+        filepath = self._report_path(filename)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(report.report_data, f, indent=2, ensure_ascii=False)
+        # orjson writes UTF-8 bytes unescaped, same output as ensure_ascii=False
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(report.report_data, option=ORJSON_OPTIONS | orjson.OPT_INDENT_2))
         
         report.file_path = filepath
         report.file_format = 'JSON'
@@ -204,7 +370,7 @@ class ReportGenerator:
             Path to generated CSV file
         """
         filename = f"{report.report_id}.csv"
-        filepath = os.path.join(self.reports_dir, filename)
+        filepath = self._report_path(filename)
         
         with open(filepath, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
@@ -215,40 +381,20 @@ class ReportGenerator:
                     'Alert ID', 'Transaction ID', 'Customer ID', 'Customer Name',
                     'Amount', 'Currency', 'Severity', 'Risk Score', 'Created At'
                 ])
-                
-                # Write data
-                for alert_data in report.report_data.get('alerts', []):
-                    writer.writerow([
-                        alert_data.get('alert_id', ''),
-                        alert_data.get('transaction_id', ''),
-                        alert_data.get('customer_id', ''),
-                        alert_data.get('customer_name', ''),
-                        alert_data.get('amount', ''),
-                        alert_data.get('currency', ''),
-                        alert_data.get('severity', ''),
-                        alert_data.get('risk_score', ''),
-                        alert_data.get('created_at', ''),
-                    ])
+                rows, keys = report.report_data.get('alerts', []), SAR_CSV_KEYS
             
             elif report.report_type == 'CTR':
                 writer.writerow([
                     'Transaction ID', 'Customer ID', 'Customer Name',
                     'Amount', 'Currency', 'Type', 'Date', 'Receiver Account', 'Receiver Country'
                 ])
-                
-                # Write data
-                for transaction_data in report.report_data.get('transactions', []):
-                    writer.writerow([
-                        transaction_data.get('transaction_id', ''),
-                        transaction_data.get('customer_id', ''),
-                        transaction_data.get('customer_name', ''),
-                        transaction_data.get('amount', ''),
-                        transaction_data.get('currency', ''),
-                        transaction_data.get('transaction_type', ''),
-                        transaction_data.get('transaction_date', ''),
-                        transaction_data.get('receiver_account', ''),
-                        transaction_data.get('receiver_country', ''),
-                    ])
+                rows, keys = report.report_data.get('transactions', []), CTR_CSV_KEYS
+            
+            else:
+                rows, keys = [], ()
+            
+            # Write data (from the report snapshot, not the live rows)
+            writer.writerows([row.get(key, '') for key in keys] for row in rows)
         
         report.file_path = filepath
         report.file_format = 'CSV'
@@ -269,11 +415,11 @@ class ReportGenerator:
             Path to generated PDF file
         """
         filename = f"{report.report_id}.pdf"
-        filepath = os.path.join(self.reports_dir, filename)
+        filepath = self._report_path(filename)
         
         doc = SimpleDocTemplate(filepath, pagesize=letter)
         story = []
-        styles = getSampleStyleSheet()
+        styles = PDF_STYLES
         
         # Title
         title = Paragraph(f"<b>{report.title}</b>", styles['Title'])
@@ -293,16 +439,7 @@ class ReportGenerator:
             metadata.append(['Submitted By:', report.submitted_by])
         
         metadata_table = Table(metadata, colWidths=[150, 300])
-        metadata_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.grey),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        metadata_table.setStyle(METADATA_TABLE_STYLE)
         story.append(metadata_table)
         story.append(Spacer(1, 20))
         
@@ -314,7 +451,7 @@ class ReportGenerator:
             # Alert table
             alert_data = [['Alert ID', 'Customer', 'Amount', 'Severity', 'Risk Score']]
             
-            for alert_data_item in report.report_data.get('alerts', [])[:50]:  # Limit to 50 for PDF
+            for alert_data_item in report.report_data.get('alerts', [])[:PDF_MAX_ROWS]:
                 alert_data.append([
                     alert_data_item.get('alert_id', '')[:20],
                     alert_data_item.get('customer_name', '')[:30],
@@ -324,16 +461,7 @@ class ReportGenerator:
                 ])
             
             alert_table = Table(alert_data, colWidths=[100, 150, 100, 80, 80])
-            alert_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            alert_table.setStyle(ALERT_TABLE_STYLE)
             story.append(alert_table)
         
         elif report.report_type == 'CTR':
@@ -347,14 +475,7 @@ class ReportGenerator:
             ]
             
             summary_table = Table(summary_data, colWidths=[200, 200])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.lightblue),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            summary_table.setStyle(SUMMARY_TABLE_STYLE)
             story.append(summary_table)
             story.append(Spacer(1, 20))
         
@@ -391,13 +512,10 @@ class ReportGenerator:
         return report
 
 
-# Singleton instance
-_report_generator_instance = None
+# Singleton instance (built at import: only resolves the reports path, no DB or filesystem access)
+_report_generator_instance = ReportGenerator()
 
 def get_report_generator() -> ReportGenerator:
     """Get singleton instance of ReportGenerator"""
-    global _report_generator_instance
-    if _report_generator_instance is None:
-        _report_generator_instance = ReportGenerator()
     return _report_generator_instance
 
@@ -3,16 +3,81 @@ Risk Scoring Service
 Calculates risk scores for customers and transactions based on various factors
 """
 import logging
+from bisect import bisect_left, bisect_right
 from decimal import Decimal
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from itertools import accumulate
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg, Max, Q
+from django.db import connection
+from django.db.models import Sum, Count, Avg, Max, IntegerField, OuterRef, Q, Subquery, Value
 
-from aml.models import Customer, Transaction, RiskScore
+from aml.models import Alert, Customer, CustomerTxStats, Transaction, RiskScore
 
 logger = logging.getLogger('aml')
 
+# Scoring lookup tables, built once rather than on every factor call
+HIGH_RISK_COUNTRIES = frozenset(settings.AML_HIGH_RISK_COUNTRIES)
+CUSTOMER_RISK_LEVEL_SCORES = {
+    'LOW': Decimal('20'),
+    'MEDIUM': Decimal('50'),
+    'HIGH': Decimal('80'),
+    'CRITICAL': Decimal('100'),
+}
+# Account age bands in days (<7, <30, <90, older) and their scores: new accounts are riskier
+ACCOUNT_AGE_BANDS = (7, 30, 90)
+ACCOUNT_AGE_SCORES = (Decimal('70'), Decimal('50'), Decimal('30'), Decimal('15'))
+# KYC fields checked for completeness; score by number missing (3 or more share the top score)
+KYC_FIELDS = ('date_of_birth', 'national_id', 'address', 'phone')
+KYC_MISSING_SCORES = (Decimal('15'), Decimal('40'), Decimal('60'), Decimal('80'))
+
+
+# When the last refresh of the hourly stats view (mv_customer_tx_stats) started;
+# written by the refresh_customer_tx_stats task (Celery beat, shared cache)
+CUSTOMER_TX_STATS_REFRESHED_CACHE_KEY = 'aml:customer_tx_stats:refreshed_at'
+HOUR = timedelta(hours=1)
+# Stands in for the stats view subqueries when only raw transactions are aggregated
+NO_BUCKETS = Value(None, output_field=IntegerField())
+
+
+def _floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def hourly_stats_window(start: datetime, end: Optional[datetime]) -> Optional[tuple]:
+    """
+    [view_start, view_end) of whole hourly buckets inside [start, end) that the
+    stats view holds completely, or None to aggregate raw transactions only.
+
+    Only buckets that ended before the last refresh started are complete, so
+    the view is skipped on SQLite and when no refresh has been recorded (beat
+    not running); callers add raw rows for [start, view_start) and [view_end, end).
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    refreshed_at = cache.get(CUSTOMER_TX_STATS_REFRESHED_CACHE_KEY)
+    if refreshed_at is None:
+        return None
+    view_start = _floor_hour(start) + (HOUR if start != _floor_hour(start) else timedelta(0))
+    view_end = _floor_hour(refreshed_at if end is None else min(refreshed_at, end))
+    return (view_start, view_end) if view_end > view_start else None
+
+
+def _add_totals(*totals) -> Optional[Decimal]:
+    """Sum of nullable SUM() results (None when every part is None)"""
+    present = [total for total in totals if total is not None]
+    return sum(present, Decimal('0')) if present else None
+
+
+def _per_customer(queryset, aggregate):
+    """Correlated subquery: aggregate of queryset's rows for the outer customer"""
+    return Subquery(
+        queryset.filter(customer_id=OuterRef('pk')).order_by()
+        .values('customer_id').annotate(value=aggregate).values('value')
+    )
+
 
 class RiskScorer:
     """
@@ -28,35 +93,48 @@ class RiskScorer:
             'behavioral_patterns': 0.15,
             'rule_violations': 0.15,
         }
+        self.customer_weights = {
+            'transaction_history': 0.30,
+            'alert_history': 0.25,
+            'account_age': 0.15,
+            'geographic_risk': 0.15,
+            'kyc_completeness': 0.15,
+        }
     
     def calculate_transaction_risk_score(self, transaction: Transaction, 
-                                         rule_risk_score: Decimal = Decimal('0')) -> Dict:
+                                         rule_risk_score: Decimal = Decimal('0'),
+                                         window_stats: Optional[Dict] = None,
+                                         now: Optional[datetime] = None) -> Dict:
         """
         Calculate risk score for a specific transaction
         
+        Args:
+            window_stats: Precomputed history stats for this transaction
+                (from get_transaction_window_stats); queried when omitted
+            now: Reference time for the history windows (defaults to timezone.now())
+        
         Returns:
             Dict with 'score', 'factors', and 'method'
         """
         factors = {}
-        total_score = Decimal('0.0')
+        if window_stats is None:
+            window_stats = self._get_transaction_window_stats(transaction, now or timezone.now())
         
         # Factor 1: Transaction Amount (0-100)
-        amount_score = self._calculate_amount_risk(transaction)
+        amount_score = self._calculate_amount_risk(transaction, window_stats)
         factors['transaction_amount'] = {
             'score': float(amount_score),
             'weight': self.weights['transaction_amount'],
             'details': f"Amount: {transaction.amount} {transaction.currency}"
         }
-        total_score += amount_score * Decimal(str(self.weights['transaction_amount']))
         
         # Factor 2: Transaction Frequency (0-100)
-        frequency_score = self._calculate_frequency_risk(transaction)
+        frequency_score = self._calculate_frequency_risk(window_stats)
         factors['transaction_frequency'] = {
             'score': float(frequency_score),
             'weight': self.weights['transaction_frequency'],
-            'details': self._get_frequency_details(transaction)
+            'details': self._get_frequency_details(window_stats)
         }
-        total_score += frequency_score * Decimal(str(self.weights['transaction_frequency']))
         
         # Factor 3: Geographic Risk (0-100)
         geo_score = self._calculate_geographic_risk(transaction)
@@ -65,7 +143,6 @@ class RiskScorer:
             'weight': self.weights['geographic_risk'],
             'details': f"From: {transaction.customer.country}, To: {transaction.receiver_country or 'N/A'}"
         }
-        total_score += geo_score * Decimal(str(self.weights['geographic_risk']))
         
         # Factor 4: Customer History (0-100)
         history_score = self._calculate_customer_history_risk(transaction.customer)
@@ -74,7 +151,6 @@ class RiskScorer:
             'weight': self.weights['customer_history'],
             'details': f"Customer risk level: {transaction.customer.current_risk_level}"
         }
-        total_score += history_score * Decimal(str(self.weights['customer_history']))
         
         # Factor 5: Behavioral Patterns (0-100)
         behavioral_score = self._calculate_behavioral_risk(transaction)
@@ -83,7 +159,6 @@ class RiskScorer:
             'weight': self.weights['behavioral_patterns'],
             'details': self._get_behavioral_details(transaction)
         }
-        total_score += behavioral_score * Decimal(str(self.weights['behavioral_patterns']))
         
         # Factor 6: Rule Violations (0-100)
         rule_score = min(Decimal('100'), rule_risk_score)
@@ -92,10 +167,9 @@ class RiskScorer:
             'weight': self.weights['rule_violations'],
             'details': f"Rule-based risk: {rule_score}"
         }
-        total_score += rule_score * Decimal(str(self.weights['rule_violations']))
         
-        # Ensure score is between 0 and 100
-        final_score = max(Decimal('0'), min(Decimal('100'), total_score))
+        # Weighted total, clamped to 0-100
+        final_score = self._weighted_score(factors)
         
         return {
             'score': final_score,
@@ -103,63 +177,70 @@ class RiskScorer:
             'method': 'weighted_average'
         }
     
-    def calculate_customer_risk_score(self, customer: Customer) -> Dict:
+    def calculate_customer_risk_score(self, customer: Customer,
+                                      history_stats: Optional[tuple] = None,
+                                      now: Optional[datetime] = None) -> Dict:
         """
         Calculate overall risk score for a customer
         
+        Args:
+            history_stats: Precomputed (transaction_stats, alert_stats) for this
+                customer (from get_customer_history_stats); queried when omitted
+            now: Reference time for history windows and account age (defaults to timezone.now())
+        
         Returns:
             Dict with 'score', 'factors', and 'method'
         """
         factors = {}
-        total_score = Decimal('0.0')
+        now = now or timezone.now()
+        if history_stats is None:
+            history_stats = self.get_customer_history_stats([customer], now)[customer.pk]
+        transaction_stats, alert_stats = history_stats
         
         # Factor 1: Transaction History
-        transaction_score = self._calculate_customer_transaction_risk(customer)
+        transaction_score = self._calculate_customer_transaction_risk(transaction_stats)
         factors['transaction_history'] = {
             'score': float(transaction_score),
-            'weight': 0.30,
-            'details': self._get_customer_transaction_details(customer)
+            'weight': self.customer_weights['transaction_history'],
+            'details': self._get_customer_transaction_details(transaction_stats)
         }
-        total_score += transaction_score * Decimal('0.30')
         
         # Factor 2: Alert History
-        alert_score = self._calculate_customer_alert_risk(customer)
+        alert_score = self._calculate_customer_alert_risk(alert_stats)
         factors['alert_history'] = {
             'score': float(alert_score),
-            'weight': 0.25,
-            'details': self._get_customer_alert_details(customer)
+            'weight': self.customer_weights['alert_history'],
+            'details': self._get_customer_alert_details(alert_stats)
         }
-        total_score += alert_score * Decimal('0.25')
         
         # Factor 3: Account Age and Activity
-        account_score = self._calculate_account_age_risk(customer)
+        age_days = (now - customer.registration_date).days
+        account_score = self._calculate_account_age_risk(age_days)
         factors['account_age'] = {
             'score': float(account_score),
-            'weight': 0.15,
-            'details': f"Account age: {(timezone.now() - customer.registration_date).days} days"
+            'weight': self.customer_weights['account_age'],
+            'details': f"Account age: {age_days} days"
         }
-        total_score += account_score * Decimal('0.15')
         
         # Factor 4: Geographic Risk
         geo_score = self._calculate_customer_geographic_risk(customer)
         factors['geographic_risk'] = {
             'score': float(geo_score),
-            'weight': 0.15,
+            'weight': self.customer_weights['geographic_risk'],
             'details': f"Country: {customer.country}"
         }
-        total_score += geo_score * Decimal('0.15')
         
         # Factor 5: KYC Completeness
-        kyc_score = self._calculate_kyc_completeness_risk(customer)
+        missing_kyc = [field for field in KYC_FIELDS if not getattr(customer, field)]
+        kyc_score = self._calculate_kyc_completeness_risk(missing_kyc)
         factors['kyc_completeness'] = {
             'score': float(kyc_score),
-            'weight': 0.15,
-            'details': self._get_kyc_completeness_details(customer)
+            'weight': self.customer_weights['kyc_completeness'],
+            'details': self._get_kyc_completeness_details(missing_kyc)
         }
-        total_score += kyc_score * Decimal('0.15')
         
-        # Ensure score is between 0 and 100
-        final_score = max(Decimal('0'), min(Decimal('100'), total_score))
+        # Weighted total, clamped to 0-100
+        final_score = self._weighted_score(factors)
         
         return {
             'score': final_score,
@@ -167,18 +248,153 @@ class RiskScorer:
             'method': 'weighted_average'
         }
     
-    def _calculate_amount_risk(self, transaction: Transaction) -> Decimal:
-        """Calculate risk based on transaction amount"""
-        # Get customer's average transaction amount
-        lookback_days = 30
-        lookback_date = timezone.now() - timedelta(days=lookback_days)
+    @staticmethod
+    def _weighted_score(factors: Dict) -> Decimal:
+        """
+        Weighted sum of the factor scores, clamped to 0-100
         
-        avg_amount = Transaction.objects.filter(
-            customer=transaction.customer,
-            transaction_date__gte=lookback_date,
+        Summed in float (scores are 0-100, weights two decimals); converted to a
+        two-place Decimal only for the returned / stored score.
+        """
+        total_score = sum(factor['score'] * factor['weight'] for factor in factors.values())
+        return Decimal(str(round(max(0.0, min(100.0, total_score)), 2)))
+    
+    def get_transaction_window_stats(self, transactions: List[Transaction],
+                                     now: Optional[datetime] = None) -> Dict:
+        """
+        Window stats (as _get_transaction_window_stats) for a batch, keyed by transaction pk
+        
+        Reads the batch customers' completed history once and counts each
+        transaction's windows in memory (bisect over dates, prefix sums of amounts).
+        """
+        if not transactions:
+            return {}
+        
+        lookback_date = (now or timezone.now()) - timedelta(days=30)
+        earliest = min(t.transaction_date for t in transactions) - timedelta(hours=24)
+        rows = Transaction.objects.filter(
+            customer_id__in={t.customer_id for t in transactions},
+            transaction_date__gte=min(lookback_date, earliest),
+            transaction_date__lt=max(t.transaction_date for t in transactions),
+            status='COMPLETED'
+        ).order_by('customer_id', 'transaction_date').values_list('customer_id', 'transaction_date', 'amount')
+        
+        dates_by_customer = {}
+        amounts_by_customer = {}
+        for customer_id, transaction_date, amount in rows:
+            dates_by_customer.setdefault(customer_id, []).append(transaction_date)
+            amounts_by_customer.setdefault(customer_id, []).append(amount)
+        totals_by_customer = {
+            customer_id: [Decimal('0'), *accumulate(amounts)]
+            for customer_id, amounts in amounts_by_customer.items()
+        }
+        
+        stats = {}
+        for transaction in transactions:
+            dates = dates_by_customer.get(transaction.customer_id, [])
+            totals = totals_by_customer.get(transaction.customer_id, [Decimal('0')])
+            end = bisect_left(dates, transaction.transaction_date)
+            start = min(bisect_left(dates, lookback_date), end)
+            stats[transaction.pk] = {
+                'avg_amount': (totals[end] - totals[start]) / (end - start) if end > start else None,
+                'count_24h': end - bisect_left(dates, transaction.transaction_date - timedelta(hours=24)),
+                'count_1h': end - bisect_left(dates, transaction.transaction_date - timedelta(hours=1)),
+            }
+        return stats
+    
+    def get_customer_history_stats(self, customers: List[Customer],
+                                   now: Optional[datetime] = None) -> Dict:
+        """
+        (transaction_stats, alert_stats) for calculate_customer_risk_score, keyed by
+        customer pk
+        
+        One query for the whole list: each 90-day counter is a correlated
+        subquery on the customer row (served by the customer/date indexes).
+        """
+        customer_ids = [customer.pk for customer in customers]
+        lookback_date = (now or timezone.now()) - timedelta(days=90)
+        
+        transactions = Transaction.objects.filter(transaction_date__gte=lookback_date, status='COMPLETED')
+        buckets = None
+        window = hourly_stats_window(lookback_date, None)
+        if window:
+            # Whole hours from the stats view, raw rows around them
+            buckets = CustomerTxStats.objects.filter(bucket__gte=window[0], bucket__lt=window[1])
+            transactions = transactions.exclude(transaction_date__gte=window[0], transaction_date__lt=window[1])
+        alerts = Alert.objects.filter(created_at__gte=lookback_date)
+        
+        rows = Customer.objects.filter(pk__in=customer_ids).annotate(
+            transaction_total=_per_customer(transactions, Sum('amount')),
+            transaction_count=_per_customer(transactions, Count('id')),
+            bucket_total=_per_customer(buckets, Sum('total_amount')) if window else NO_BUCKETS,
+            bucket_count=_per_customer(buckets, Sum('tx_count')) if window else NO_BUCKETS,
+            alert_total=_per_customer(alerts, Count('id')),
+            alert_critical=_per_customer(alerts.filter(severity='CRITICAL'), Count('id')),
+            alert_high=_per_customer(alerts.filter(severity='HIGH'), Count('id')),
+        ).values_list(
+            'pk', 'transaction_total', 'transaction_count', 'bucket_total', 'bucket_count',
+            'alert_total', 'alert_critical', 'alert_high',
+        )
+        
+        # Subqueries over no rows give NULL: no history means zero counts
+        return {
+            pk: (
+                {
+                    'total': _add_totals(transaction_total, bucket_total),
+                    'count': (transaction_count or 0) + (bucket_count or 0),
+                },
+                {'total': alert_total or 0, 'critical': alert_critical or 0, 'high': alert_high or 0},
+            )
+            for (pk, transaction_total, transaction_count, bucket_total, bucket_count,
+                 alert_total, alert_critical, alert_high) in rows
+        }
+    
+    def _get_transaction_window_stats(self, transaction: Transaction, now: datetime) -> Dict:
+        """
+        Customer history before this transaction, for the amount and frequency factors,
+        in one query: 30-day average amount, and counts for the last 24 hours / hour
+        """
+        lookback_date = now - timedelta(days=30)
+        last_24h = transaction.transaction_date - timedelta(hours=24)
+        last_hour = transaction.transaction_date - timedelta(hours=1)
+        
+        window = hourly_stats_window(lookback_date, transaction.transaction_date)
+        if window:
+            # Whole hours of the 30-day average from the stats view; the rest of
+            # the period and the short-window counts from raw rows, in one query
+            in_view = Q(transaction_date__gte=window[0], transaction_date__lt=window[1])
+            stats = Transaction.objects.filter(
+                customer_id=transaction.customer_id,
+                transaction_date__gte=min(lookback_date, last_24h),
+                transaction_date__lt=transaction.transaction_date,
+                status='COMPLETED'
+            ).aggregate(
+                raw_total=Sum('amount', filter=Q(transaction_date__gte=lookback_date) & ~in_view),
+                raw_count=Count('id', filter=Q(transaction_date__gte=lookback_date) & ~in_view),
+                count_24h=Count('id', filter=Q(transaction_date__gte=last_24h)),
+                count_1h=Count('id', filter=Q(transaction_date__gte=last_hour)),
+            )
+            history = self._get_hourly_stats(transaction.customer_id, *window)
+            total = _add_totals(stats.pop('raw_total'), history['total'])
+            count = stats.pop('raw_count') + history['count']
+            stats['avg_amount'] = total / count if count else None
+            return stats
+        
+        return Transaction.objects.filter(
+            customer_id=transaction.customer_id,
+            transaction_date__gte=min(lookback_date, last_24h),
             transaction_date__lt=transaction.transaction_date,
             status='COMPLETED'
-        ).aggregate(avg=Avg('amount'))['avg']
+        ).aggregate(
+            avg_amount=Avg('amount', filter=Q(transaction_date__gte=lookback_date)),
+            count_24h=Count('id', filter=Q(transaction_date__gte=last_24h)),
+            count_1h=Count('id', filter=Q(transaction_date__gte=last_hour)),
+        )
+    
+    def _calculate_amount_risk(self, transaction: Transaction, window_stats: Dict) -> Decimal:
+        """Calculate risk based on transaction amount"""
+        # Customer's average transaction amount over the last 30 days
+        avg_amount = window_stats['avg_amount']
         
         if not avg_amount or avg_amount == 0:
             # New customer or no history - moderate risk for large amounts
@@ -200,25 +416,11 @@ class RiskScorer:
         else:
             return Decimal('20')
     
-    def _calculate_frequency_risk(self, transaction: Transaction) -> Decimal:
+    def _calculate_frequency_risk(self, window_stats: Dict) -> Decimal:
         """Calculate risk based on transaction frequency"""
-        # Check transactions in last 24 hours
-        last_24h = transaction.transaction_date - timedelta(hours=24)
-        count_24h = Transaction.objects.filter(
-            customer=transaction.customer,
-            transaction_date__gte=last_24h,
-            transaction_date__lt=transaction.transaction_date,
-            status='COMPLETED'
-        ).count()
-        
-        # Check transactions in last hour
-        last_hour = transaction.transaction_date - timedelta(hours=1)
-        count_1h = Transaction.objects.filter(
-            customer=transaction.customer,
-            transaction_date__gte=last_hour,
-            transaction_date__lt=transaction.transaction_date,
-            status='COMPLETED'
-        ).count()
+        # Transactions in the last 24 hours / last hour before this one
+        count_24h = window_stats['count_24h']
+        count_1h = window_stats['count_1h']
         
         # High frequency = higher risk
         if count_1h >= 10:
@@ -234,10 +436,7 @@ class RiskScorer:
     
     def _calculate_geographic_risk(self, transaction: Transaction) -> Decimal:
         """Calculate risk based on geographic factors"""
-        # High-risk countries list (example)
-        high_risk_countries = ['XX', 'YY']  # Replace with actual high-risk countries
-        
-        if transaction.receiver_country in high_risk_countries:
+        if transaction.receiver_country in HIGH_RISK_COUNTRIES:
             return Decimal('90')
         
         # Cross-border transactions
@@ -249,45 +448,36 @@ class RiskScorer:
     
     def _calculate_customer_history_risk(self, customer: Customer) -> Decimal:
         """Calculate risk based on customer's historical risk level"""
-        risk_levels = {
-            'LOW': Decimal('20'),
-            'MEDIUM': Decimal('50'),
-            'HIGH': Decimal('80'),
-            'CRITICAL': Decimal('100'),
-        }
-        return risk_levels.get(customer.current_risk_level, Decimal('50'))
+        return CUSTOMER_RISK_LEVEL_SCORES.get(customer.current_risk_level, Decimal('50'))
     
     def _calculate_behavioral_risk(self, transaction: Transaction) -> Decimal:
         """Calculate risk based on behavioral patterns"""
         # Check for unusual transaction times (e.g., very late night)
         hour = transaction.transaction_date.hour
-        if hour >= 2 and hour <= 5:  # 2 AM to 5 AM
+        if 2 <= hour <= 5:  # 2 AM to 5 AM
             return Decimal('40')
         
-        # Check for round number amounts (potential structuring)
-        amount_str = str(transaction.amount)
-        if amount_str.endswith('0000') or amount_str.endswith('00000'):
+        # Check for round number amounts (potential structuring); exact Decimal
+        # modulo, so stored amounts like 15000000.00 count as round
+        if transaction.amount % 10000 == 0:
             return Decimal('30')
         
         return Decimal('15')
     
-    def _calculate_customer_transaction_risk(self, customer: Customer) -> Decimal:
+    def _get_hourly_stats(self, customer_id, start: datetime, end: datetime) -> Dict:
+        """Completed-transaction total and count from the hourly stats view (PostgreSQL)"""
+        buckets = CustomerTxStats.objects.filter(customer_id=customer_id, bucket__gte=start, bucket__lt=end)
+        history = buckets.aggregate(total=Sum('total_amount'), count=Sum('tx_count'))
+        history['count'] = history['count'] or 0
+        return history
+    
+    def _calculate_customer_transaction_risk(self, history: Dict) -> Decimal:
         """Calculate risk based on customer's transaction history"""
-        lookback_days = 90
-        lookback_date = timezone.now() - timedelta(days=lookback_days)
-        
-        transactions = Transaction.objects.filter(
-            customer=customer,
-            transaction_date__gte=lookback_date,
-            status='COMPLETED'
-        )
-        
-        if not transactions.exists():
+        count = history['count']
+        if not count:
             return Decimal('30')  # New customer
         
-        total_amount = transactions.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        count = transactions.count()
-        avg_amount = total_amount / count if count > 0 else Decimal('0')
+        total_amount = history['total'] or Decimal('0')
         
         # High volume or high value = higher risk
         if total_amount > Decimal('100000000'):  # 100M threshold
@@ -301,19 +491,14 @@ class RiskScorer:
         else:
             return Decimal('25')
     
-    def _calculate_customer_alert_risk(self, customer: Customer) -> Decimal:
+    def _calculate_customer_alert_risk(self, counts: Dict) -> Decimal:
         """Calculate risk based on customer's alert history"""
-        lookback_days = 90
-        lookback_date = timezone.now() - timedelta(days=lookback_days)
-        
-        alerts = customer.alerts.filter(created_at__gte=lookback_date)
-        
-        if not alerts.exists():
+        total_count = counts['total']
+        if not total_count:
             return Decimal('10')
         
-        critical_count = alerts.filter(severity='CRITICAL').count()
-        high_count = alerts.filter(severity='HIGH').count()
-        total_count = alerts.count()
+        critical_count = counts['critical']
+        high_count = counts['high']
         
         if critical_count > 0:
             return Decimal('100')
@@ -326,101 +511,48 @@ class RiskScorer:
         else:
             return Decimal('30')
     
-    def _calculate_account_age_risk(self, customer: Customer) -> Decimal:
+    def _calculate_account_age_risk(self, age_days: int) -> Decimal:
         """Calculate risk based on account age"""
-        age_days = (timezone.now() - customer.registration_date).days
-        
-        # Very new accounts are higher risk
-        if age_days < 7:
-            return Decimal('70')
-        elif age_days < 30:
-            return Decimal('50')
-        elif age_days < 90:
-            return Decimal('30')
-        else:
-            return Decimal('15')
+        return ACCOUNT_AGE_SCORES[bisect_right(ACCOUNT_AGE_BANDS, age_days)]
     
     def _calculate_customer_geographic_risk(self, customer: Customer) -> Decimal:
         """Calculate risk based on customer's geographic location"""
-        # High-risk countries (example)
-        high_risk_countries = ['XX', 'YY']
-        
-        if customer.country in high_risk_countries:
+        if customer.country in HIGH_RISK_COUNTRIES:
             return Decimal('80')
         
         return Decimal('20')
     
-    def _calculate_kyc_completeness_risk(self, customer: Customer) -> Decimal:
+    def _calculate_kyc_completeness_risk(self, missing_fields: List[str]) -> Decimal:
         """Calculate risk based on KYC data completeness"""
-        missing_fields = 0
-        
-        if not customer.date_of_birth:
-            missing_fields += 1
-        if not customer.national_id:
-            missing_fields += 1
-        if not customer.address:
-            missing_fields += 1
-        if not customer.phone:
-            missing_fields += 1
-        
         # More missing fields = higher risk
-        if missing_fields >= 3:
-            return Decimal('80')
-        elif missing_fields == 2:
-            return Decimal('60')
-        elif missing_fields == 1:
-            return Decimal('40')
-        else:
-            return Decimal('15')
+        return KYC_MISSING_SCORES[min(len(missing_fields), len(KYC_MISSING_SCORES) - 1)]
     
-    def _get_frequency_details(self, transaction: Transaction) -> str:
+    def _get_frequency_details(self, window_stats: Dict) -> str:
         """Get details about transaction frequency"""
-        last_24h = transaction.transaction_date - timedelta(hours=24)
-        count_24h = Transaction.objects.filter(
-            customer=transaction.customer,
-            transaction_date__gte=last_24h,
-            transaction_date__lt=transaction.transaction_date,
-            status='COMPLETED'
-        ).count()
-        return f"{count_24h} transactions in last 24 hours"
+        return f"{window_stats['count_24h']} transactions in last 24 hours"
     
     def _get_behavioral_details(self, transaction: Transaction) -> str:
         """Get details about behavioral patterns"""
         hour = transaction.transaction_date.hour
         return f"Transaction time: {hour}:00"
     
-    def _get_customer_transaction_details(self, customer: Customer) -> str:
+    def _get_customer_transaction_details(self, history: Dict) -> str:
         """Get details about customer transactions"""
-        lookback_days = 90
-        lookback_date = timezone.now() - timedelta(days=lookback_days)
-        count = Transaction.objects.filter(
-            customer=customer,
-            transaction_date__gte=lookback_date,
-            status='COMPLETED'
-        ).count()
-        return f"{count} transactions in last 90 days"
+        return f"{history['count']} transactions in last 90 days"
     
-    def _get_customer_alert_details(self, customer: Customer) -> str:
+    def _get_customer_alert_details(self, counts: Dict) -> str:
         """Get details about customer alerts"""
-        lookback_days = 90
-        lookback_date = timezone.now() - timedelta(days=lookback_days)
-        count = customer.alerts.filter(created_at__gte=lookback_date).count()
-        return f"{count} alerts in last 90 days"
+        return f"{counts['total']} alerts in last 90 days"
     
-    def _get_kyc_completeness_details(self, customer: Customer) -> str:
+    def _get_kyc_completeness_details(self, missing_fields: List[str]) -> str:
         """Get details about KYC completeness"""
-        fields = ['date_of_birth', 'national_id', 'address', 'phone']
-        missing = [f for f in fields if not getattr(customer, f)]
-        return f"Missing: {', '.join(missing) if missing else 'None'}"
+        return f"Missing: {', '.join(missing_fields) if missing_fields else 'None'}"
 
 
-# Singleton instance
-_risk_scorer_instance = None
+# Singleton instance (built at import: stateless and needs no DB access)
+_risk_scorer_instance = RiskScorer()
 
 def get_risk_scorer() -> RiskScorer:
     """Get singleton instance of RiskScorer"""
-    global _risk_scorer_instance
-    if _risk_scorer_instance is None:
-        _risk_scorer_instance = RiskScorer()
     return _risk_scorer_instance
 
@@ -3,18 +3,25 @@ Transaction Monitoring Service
 Monitors and processes transactions in real-time
 """
 import logging
+import threading
 import uuid
 from decimal import Decimal
 from typing import Dict, Optional
+from django.db import transaction as db_transaction
 from django.utils import timezone
+from kombu.exceptions import OperationalError as BrokerError
 
 from aml.models import Transaction, Customer, RiskScore
 from aml.rules.aml_rules import get_rule_engine
 from aml.services.risk_scorer import get_risk_scorer
 from aml.services.alert_generator import get_alert_generator
+from aml.utils import bulk_update_rows
 
 logger = logging.getLogger('aml')
 
+# Rows per statement for batch UPDATE/INSERTs
+BULK_BATCH_SIZE = 500
+
 
 class TransactionMonitor:
     """
@@ -25,52 +32,43 @@ class TransactionMonitor:
         self.rule_engine = get_rule_engine()
         self.risk_scorer = get_risk_scorer()
     
-    def monitor_transaction(self, transaction: Transaction) -> Dict:
+    def monitor_transaction(self, transaction: Transaction, rule_result: Optional[tuple] = None) -> Dict:
         """
         Monitor a transaction and apply AML rules and risk scoring
         
         Args:
             transaction: Transaction object to monitor
+            rule_result: Precomputed RuleEngine result for this transaction (batch processing)
             
         Returns:
             Dict with monitoring results including alerts, risk scores, etc.
         """
-        logger.info(f"Monitoring transaction {transaction.transaction_id}")
+        logger.info("Monitoring transaction %s", transaction.transaction_id)
         
         try:
             # Step 1: Evaluate rules
-            triggered_rules, rule_reasons, rule_risk_score = self.rule_engine.evaluate_transaction(transaction)
+            if rule_result is None:
+                rule_result = self.rule_engine.evaluate_transaction(transaction)
+            triggered_rules, rule_reasons, rule_risk_score = rule_result
             
             # Step 2: Calculate transaction risk score
             risk_result = self.risk_scorer.calculate_transaction_risk_score(
                 transaction, 
-                rule_risk_score=rule_risk_score
+                rule_risk_score=rule_risk_score,
+                now=timezone.now()
             )
             
             # Step 3: Update transaction with risk information
             transaction.risk_score = risk_result['score']
             transaction.is_suspicious = len(triggered_rules) > 0 or risk_result['score'] >= Decimal('70')
             transaction.flagged_reasons = rule_reasons
-            transaction.save()
-            
-            # Step 4: Save risk score record
-            RiskScore.objects.create(
-                customer=transaction.customer,
-                transaction=transaction,
-                score_type='TRANSACTION',
-                score=risk_result['score'],
-                factors=risk_result['factors'],
-                calculation_method=risk_result['method']
-            )
-            
-            # Step 5: Update customer risk score if needed
-            self._update_customer_risk_score(transaction.customer)
+            transaction.save(update_fields=['risk_score', 'is_suspicious', 'flagged_reasons', 'updated_at'])
             
-            # Step 6: Determine if alert should be generated
+            # Step 4: Determine if alert should be generated
             should_alert = self._should_generate_alert(transaction, triggered_rules, risk_result['score'])
             alert_severity = self._determine_alert_severity(risk_result['score'], len(triggered_rules))
             
-            # Step 7: Generate alert if needed
+            # Step 5: Generate alert if needed
             alert = None
             if should_alert:
                 alert_generator = get_alert_generator()
@@ -82,6 +80,10 @@ class TransactionMonitor:
                     reasons=rule_reasons
                 )
             
+            # Step 6: Risk score record and customer re-score, on a background
+            # worker once the transaction update and alert are committed
+            self._defer_risk_artifacts(transaction, risk_result)
+            
             result = {
                 'transaction_id': transaction.transaction_id,
                 'risk_score': float(risk_result['score']),
@@ -94,13 +96,14 @@ class TransactionMonitor:
                 'alert_id': alert.alert_id if alert else None,
             }
             
-            logger.info(f"Transaction {transaction.transaction_id} monitored. Risk: {risk_result['score']}, "
-                       f"Suspicious: {transaction.is_suspicious}, Rules triggered: {len(triggered_rules)}")
+            logger.info("Transaction %s monitored. Risk: %s, Suspicious: %s, Rules triggered: %s",
+                        transaction.transaction_id, risk_result['score'], transaction.is_suspicious,
+                        len(triggered_rules))
             
             return result
             
         except Exception as e:
-            logger.error(f"Error monitoring transaction {transaction.transaction_id}: {str(e)}")
+            logger.error("Error monitoring transaction %s: %s", transaction.transaction_id, e)
             raise
     
     def _should_generate_alert(self, transaction: Transaction, 
@@ -138,47 +141,109 @@ class TransactionMonitor:
         else:
             return 'LOW'
     
-    def _update_customer_risk_score(self, customer: Customer):
+    @staticmethod
+    def _defer_risk_artifacts(transaction: Transaction, risk_result: Dict):
+        """
+        Queue persist_risk_artifacts once the current DB transaction commits.
+        
+        Scoring and alerting never depend on the broker: if the task cannot be
+        published (broker unreachable) it runs inline instead.
+        """
+        from aml.tasks import persist_risk_artifacts  # aml.tasks imports this module
+        transaction_pk = str(transaction.pk)
+        risk_payload = {
+            'score': str(risk_result['score']),
+            'factors': risk_result['factors'],
+            'method': risk_result['method'],
+        }
+        
+        def enqueue():
+            try:
+                persist_risk_artifacts.delay(transaction_pk, risk_payload)
+            except BrokerError as e:
+                logger.warning("Could not queue risk artifacts for %s (%s); persisting inline",
+                               transaction.transaction_id, e)
+                persist_risk_artifacts(transaction_pk, risk_payload)
+        
+        db_transaction.on_commit(enqueue)
+    
+    def _update_customer_risk_scores(self, customers: list, now):
         """
-        Update customer's overall risk score based on recent transactions
+        Re-score the customers of a batch: customer history is read in one
+        query, and customers / risk score records are bulk-written
         """
         try:
-            # Calculate new customer risk score
-            customer_risk_result = self.risk_scorer.calculate_customer_risk_score(customer)
-            
-            # Update customer risk score
-            customer.risk_score = customer_risk_result['score']
-            
-            # Update risk level based on score
-            if customer_risk_result['score'] >= Decimal('80'):
-                customer.current_risk_level = 'CRITICAL'
-            elif customer_risk_result['score'] >= Decimal('60'):
-                customer.current_risk_level = 'HIGH'
-            elif customer_risk_result['score'] >= Decimal('40'):
-                customer.current_risk_level = 'MEDIUM'
-            else:
-                customer.current_risk_level = 'LOW'
-            
-            customer.save()
-            
-            # Save risk score record
-            RiskScore.objects.create(
-                customer=customer,
-                score_type='CUSTOMER',
-                score=customer_risk_result['score'],
-                factors=customer_risk_result['factors'],
-                calculation_method=customer_risk_result['method']
-            )
+            history_stats = self.risk_scorer.get_customer_history_stats(customers, now)
+            risk_scores = []
+            for customer in customers:
+                customer_risk_result = self.risk_scorer.calculate_customer_risk_score(
+                    customer,
+                    history_stats=history_stats[customer.pk],
+                    now=now
+                )
+                risk_scores.append(self._apply_customer_risk(customer, customer_risk_result))
+                customer.updated_at = now
+            
+            with db_transaction.atomic():
+                bulk_update_rows(
+                    Customer,
+                    customers,
+                    ['risk_score', 'current_risk_level', 'updated_at'],
+                    batch_size=BULK_BATCH_SIZE
+                )
+                RiskScore.objects.bulk_create(risk_scores, batch_size=BULK_BATCH_SIZE)
             
-            logger.info(f"Updated customer {customer.customer_id} risk score to {customer_risk_result['score']}")
+            logger.info("Updated risk scores for %s customers", len(customers))
             
         except Exception as e:
-            logger.error(f"Error updating customer risk score for {customer.customer_id}: {str(e)}")
+            logger.error("Error updating risk scores for %s customers: %s", len(customers), e)
+    
+    @staticmethod
+    def _apply_customer_risk(customer: Customer, customer_risk_result: Dict) -> RiskScore:
+        """Set the customer's risk score and level; returns the (unsaved) risk score record"""
+        customer.risk_score = customer_risk_result['score']
+        
+        # Update risk level based on score
+        if customer_risk_result['score'] >= Decimal('80'):
+            customer.current_risk_level = 'CRITICAL'
+        elif customer_risk_result['score'] >= Decimal('60'):
+            customer.current_risk_level = 'HIGH'
+        elif customer_risk_result['score'] >= Decimal('40'):
+            customer.current_risk_level = 'MEDIUM'
+        else:
+            customer.current_risk_level = 'LOW'
+        
+        return RiskScore(
+            customer=customer,
+            score_type='CUSTOMER',
+            score=customer_risk_result['score'],
+            factors=customer_risk_result['factors'],
+            calculation_method=customer_risk_result['method']
+        )
+    
+    @staticmethod
+    def _attach_customers(transactions: list):
+        """
+        Load the customers of transactions fetched without select_related('customer')
+        in one query, instead of one lazy SELECT per transaction during scoring
+        """
+        missing = {t.customer_id for t in transactions if not Transaction.customer.is_cached(t)}
+        if not missing:
+            return
+        customers = Customer.objects.in_bulk(missing)
+        for transaction in transactions:
+            if not Transaction.customer.is_cached(transaction):
+                transaction.customer = customers[transaction.customer_id]
     
     def process_batch_transactions(self, transactions: list) -> Dict:
         """
         Process multiple transactions in batch
         
+        Transactions are scored in memory first, then written with bulk
+        UPDATE/INSERTs (transactions, risk scores, alerts) in one DB transaction.
+        Scoring uses customer risk levels as of the start of the batch; each
+        affected customer is re-scored once afterwards.
+        
         Args:
             transactions: List of Transaction objects
             
@@ -193,40 +258,104 @@ class TransactionMonitor:
             'details': []
         }
         
-        for transaction in transactions:
+        self._attach_customers(transactions)
+        
+        # One reference time for every history window in the batch
+        now = timezone.now()
+        
+        # Evaluate rules and read customer history for the whole batch up front
+        rule_results = self.rule_engine.evaluate_transactions(transactions)
+        window_stats = self.risk_scorer.get_transaction_window_stats(transactions, now)
+        
+        scored = []
+        risk_scores = []
+        alert_items = []
+        
+        for transaction, (triggered_rules, rule_reasons, rule_risk_score) in zip(transactions, rule_results):
             try:
-                result = self.monitor_transaction(transaction)
-                results['processed'] += 1
-                
-                if result['is_suspicious']:
-                    results['suspicious'] += 1
-                
-                if result['should_alert']:
-                    results['alerts_generated'] += 1
-                
-                results['details'].append({
-                    'transaction_id': transaction.transaction_id,
-                    'risk_score': result['risk_score'],
-                    'is_suspicious': result['is_suspicious']
-                })
-                
+                risk_result = self.risk_scorer.calculate_transaction_risk_score(
+                    transaction,
+                    rule_risk_score=rule_risk_score,
+                    window_stats=window_stats[transaction.pk]
+                )
             except Exception as e:
                 results['errors'] += 1
-                logger.error(f"Error processing transaction {transaction.transaction_id}: {str(e)}")
+                logger.error("Error processing transaction %s: %s", transaction.transaction_id, e)
+                continue
+            
+            transaction.risk_score = risk_result['score']
+            transaction.is_suspicious = len(triggered_rules) > 0 or risk_result['score'] >= Decimal('70')
+            transaction.flagged_reasons = rule_reasons
+            transaction.updated_at = now
+            scored.append(transaction)
+            
+            risk_scores.append(RiskScore(
+                customer=transaction.customer,
+                transaction=transaction,
+                score_type='TRANSACTION',
+                score=risk_result['score'],
+                factors=risk_result['factors'],
+                calculation_method=risk_result['method']
+            ))
+            
+            should_alert = self._should_generate_alert(transaction, triggered_rules, risk_result['score'])
+            if should_alert:
+                alert_items.append({
+                    'transaction': transaction,
+                    'triggered_rules': triggered_rules,
+                    'risk_score': risk_result['score'],
+                    'severity': self._determine_alert_severity(risk_result['score'], len(triggered_rules)),
+                    'reasons': rule_reasons,
+                })
+            
+            results['details'].append({
+                'transaction_id': transaction.transaction_id,
+                'risk_score': float(risk_result['score']),
+                'is_suspicious': transaction.is_suspicious
+            })
+        
+        try:
+            with db_transaction.atomic():
+                bulk_update_rows(
+                    Transaction,
+                    scored,
+                    ['risk_score', 'is_suspicious', 'flagged_reasons', 'updated_at'],
+                    batch_size=BULK_BATCH_SIZE
+                )
+                RiskScore.objects.bulk_create(risk_scores, batch_size=BULK_BATCH_SIZE)
+                if alert_items:
+                    get_alert_generator().generate_alerts(alert_items)
+        except Exception as e:
+            results['errors'] += len(scored)
+            results['details'] = []
+            logger.error("Error saving batch of %s transactions: %s", len(scored), e)
+            return results
+        
+        results['processed'] = len(scored)
+        results['suspicious'] = sum(1 for transaction in scored if transaction.is_suspicious)
+        results['alerts_generated'] = len(alert_items)
+        
+        # One customer re-score per affected customer, after the batch is persisted
+        customers = {transaction.customer_id: transaction.customer for transaction in scored}
+        if customers:
+            self._update_customer_risk_scores(list(customers.values()), now)
         
-        logger.info(f"Batch processing completed: {results['processed']} processed, "
-                   f"{results['suspicious']} suspicious, {results['alerts_generated']} alerts")
+        logger.info("Batch processing completed: %s processed, %s suspicious, %s alerts",
+                    results['processed'], results['suspicious'], results['alerts_generated'])
         
         return results
 
 
-# Singleton instance
+# Singleton instance (lazy: the rule engine loads rules from the DB)
 _transaction_monitor_instance = None
+_transaction_monitor_lock = threading.Lock()
 
 def get_transaction_monitor() -> TransactionMonitor:
-    """Get singleton instance of TransactionMonitor"""
+    """Get singleton instance of TransactionMonitor (thread-safe lazy init)"""
     global _transaction_monitor_instance
     if _transaction_monitor_instance is None:
-        _transaction_monitor_instance = TransactionMonitor()
+        with _transaction_monitor_lock:
+            if _transaction_monitor_instance is None:
+                _transaction_monitor_instance = TransactionMonitor()
     return _transaction_monitor_instance
 
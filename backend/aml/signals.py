@@ -0,0 +1,29 @@
+"""
+Signal handlers for AML models
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Alert, Rule
+from .rules.aml_rules import bump_rules_version
+from .services.alert_generator import invalidate_alert_aggregates
+
+
+@receiver(post_save, sender=Rule)
+@receiver(post_delete, sender=Rule)
+def invalidate_rule_engine(sender, **kwargs):
+    """
+    Any rule change makes every worker's compiled rule set stale. The version is
+    bumped on commit: bumping earlier would let another worker reload (and cache)
+    the pre-change rows under the new version.
+    """
+    transaction.on_commit(bump_rules_version)
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def invalidate_alert_counts(sender, update_fields=None, **kwargs):
+    """Open-alert counts and statistics only change with an alert's status, severity or score"""
+    if update_fields is None or {'status', 'severity', 'risk_score'} & set(update_fields):
+        invalidate_alert_aggregates()
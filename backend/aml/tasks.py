@@ -0,0 +1,116 @@
+"""
+Celery tasks for AML background jobs
+"""
+import logging
+
+from decimal import Decimal
+from typing import Optional
+
+from celery import shared_task
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction as db_transaction
+from django.utils import timezone
+
+from aml.models import Alert, Report, RiskScore, Transaction
+from aml.services.report_generator import EmptyReportError, get_report_generator
+from aml.services.risk_scorer import CUSTOMER_TX_STATS_REFRESHED_CACHE_KEY, get_risk_scorer
+from aml.services.transaction_monitor import TransactionMonitor
+
+logger = logging.getLogger('aml')
+
+
+@shared_task
+def generate_report_task(report_pk: str, threshold: Optional[str] = None) -> str:
+    """
+    Build a PENDING report queued by the API and export its file; returns the final status.
+
+    The selection comes from the report row (type and period; the CTR threshold,
+    as a string, is passed along). An empty selection or an error leaves the
+    report FAILED with the reason as its description.
+    """
+    report = Report.objects.get(pk=report_pk)
+    report_generator = get_report_generator()
+    try:
+        if report.report_type == 'SAR':
+            alerts = Alert.objects.filter(
+                created_at__gte=report.period_start, created_at__lte=report.period_end
+            )
+            report_generator.generate_sar(
+                alerts=alerts, period_start=report.period_start, period_end=report.period_end,
+                submitted_by=report.submitted_by, report=report
+            )
+        else:
+            transactions = Transaction.objects.filter(
+                transaction_date__gte=report.period_start,
+                transaction_date__lte=report.period_end,
+                amount__gte=threshold,
+                status='COMPLETED'
+            )
+            report_generator.generate_ctr(
+                transactions=transactions, period_start=report.period_start, period_end=report.period_end,
+                threshold=Decimal(threshold), submitted_by=report.submitted_by, report=report
+            )
+        
+        export = {
+            'JSON': report_generator.export_report_json,
+            'CSV': report_generator.export_report_csv,
+            'PDF': report_generator.export_report_pdf,
+        }[report.file_format]
+        export(report)
+    except EmptyReportError as e:
+        _mark_report_failed(report_pk, str(e))
+        return 'FAILED'
+    except Exception as e:
+        _mark_report_failed(report_pk, f'Error generating report: {e}')
+        raise
+    return report.status
+
+
+def _mark_report_failed(report_pk: str, reason: str) -> None:
+    Report.objects.filter(pk=report_pk).update(status='FAILED', description=reason, updated_at=timezone.now())
+
+
+@shared_task(autoretry_for=(OperationalError,), retry_backoff=True, max_retries=3)
+def persist_risk_artifacts(transaction_pk: str, risk_result: dict) -> None:
+    """
+    Write a monitored transaction's risk score record and re-score its customer
+    (deferred from monitor_transaction; risk_result carries the score as a string).
+
+    Both RiskScore rows and the customer update commit together; errors propagate
+    so the task is recorded as failed (and retried when the database was unavailable).
+    """
+    transaction = Transaction.objects.select_related('customer').get(pk=transaction_pk)
+    customer = transaction.customer
+    customer_risk_result = get_risk_scorer().calculate_customer_risk_score(customer)
+    customer_risk_score = TransactionMonitor._apply_customer_risk(customer, customer_risk_result)
+    
+    with db_transaction.atomic():
+        RiskScore.objects.bulk_create([
+            RiskScore(
+                customer=customer,
+                transaction=transaction,
+                score_type='TRANSACTION',
+                score=Decimal(risk_result['score']),
+                factors=risk_result['factors'],
+                calculation_method=risk_result['method']
+            ),
+            customer_risk_score,
+        ])
+        customer.save(update_fields=['risk_score', 'current_risk_level', 'updated_at'])
+    
+    logger.info("Updated customer %s risk score to %s", customer.customer_id, customer_risk_result['score'])
+
+
+@shared_task
+def refresh_customer_tx_stats() -> None:
+    """
+    Refresh the hourly customer stats view (PostgreSQL; scheduled every minute by beat)
+    and record when the refresh started: the risk scorer only reads hourly buckets
+    that ended before then, and aggregates raw transactions for everything newer.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    started_at = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY mv_customer_tx_stats')
+    cache.set(CUSTOMER_TX_STATS_REFRESHED_CACHE_KEY, started_at, None)
@@ -1,25 +1,69 @@
 """
 Tests for AML System
 """
+import logging
+import shutil
+import tempfile
 from decimal import Decimal
-from django.test import TestCase, Client
+from unittest import mock, skipUnless
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 from datetime import timedelta
 
 from .models import Customer, Transaction, Rule, Alert, RiskScore, Report
-from .services.transaction_monitor import get_transaction_monitor
+from .services.transaction_monitor import TransactionMonitor, get_transaction_monitor
 from .services.risk_scorer import get_risk_scorer
 from .services.alert_generator import get_alert_generator
 from .services.report_generator import get_report_generator
-from .rules.aml_rules import get_rule_engine
+from .rules.aml_rules import RuleEngine, bump_rules_version, get_rule_engine
+from .utils import bulk_update_rows
+
+
+def setUpModule():
+    # Audit/monitoring records are noise here; a disabled logger also makes
+    # isEnabledFor() false, so the audit helpers skip building payloads
+    logging.getLogger('aml').disabled = True
+
+
+def tearDownModule():
+    logging.getLogger('aml').disabled = False
+
+
+def build_customer():
+    """Unsaved CUST001 fixture customer (for tests that never query it)"""
+    return Customer(
+        customer_id='CUST001',
+        first_name='John',
+        last_name='Doe',
+        email='john.doe@example.com',
+        country='IR'
+    )
+
+
+def create_customer():
+    """Create the shared CUST001 fixture customer"""
+    customer = build_customer()
+    customer.save(force_insert=True)
+    return customer
+
+
+def create_threshold_rule():
+    """Create the shared 'High Amount Threshold' fixture rule"""
+    return Rule.objects.create(
+        name='High Amount Threshold',
+        description='Flag transactions above 10M',
+        rule_type='THRESHOLD',
+        status='ACTIVE',
+        configuration={'amount_threshold': 10000000},
+        priority=1
+    )
 
 
 class HealthReadyTest(TestCase):
     """Test health and readiness endpoints (no auth)."""
 
-    def setUp(self):
-        self.client = Client()
-
     def test_health_returns_ok(self):
         r = self.client.get('/api/health/')
         self.assertEqual(r.status_code, 200)
@@ -32,21 +76,37 @@ class HealthReadyTest(TestCase):
         self.assertEqual(r.json()['status'], 'ready')
         self.assertEqual(r.json()['database'], 'ok')
 
+        # A recent successful probe is reused without touching the database
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/ready/').status_code, 200)
+
+
+class DashboardViewTest(TestCase):
+    """Test the root dashboard"""
+    
+    def setUp(self):
+        cache.clear()
+    
+    def test_dashboard_counts_are_cached(self):
+        """Test repeat dashboard hits are served from the cache without queries"""
+        create_customer()
+        response = self.client.get('/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['customers'], 1)
+        self.assertEqual(response.context['alerts_open'], 0)
+        with self.assertNumQueries(0):
+            self.client.get('/')
 
-class CustomerModelTest(TestCase):
+
+class CustomerModelTest(SimpleTestCase):
     """Test Customer model"""
     
     def setUp(self):
-        self.customer = Customer.objects.create(
-            customer_id='CUST001',
-            first_name='John',
-            last_name='Doe',
-            email='john.doe@example.com',
-            country='IR'
-        )
+        self.customer = build_customer()
     
     def test_customer_creation(self):
-        """Test customer creation"""
+        """Test customer field defaults"""
         self.assertEqual(self.customer.customer_id, 'CUST001')
         self.assertEqual(self.customer.first_name, 'John')
         self.assertEqual(self.customer.current_risk_level, 'MEDIUM')
@@ -56,18 +116,13 @@ class CustomerModelTest(TestCase):
 class TransactionModelTest(TestCase):
     """Test Transaction model"""
     
-    def setUp(self):
-        self.customer = Customer.objects.create(
-            customer_id='CUST001',
-            first_name='John',
-            last_name='Doe',
-            email='john.doe@example.com',
-            country='IR'
-        )
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
         
-        self.transaction = Transaction.objects.create(
+        cls.transaction = Transaction.objects.create(
             transaction_id='TXN001',
-            customer=self.customer,
+            customer=cls.customer,
             transaction_type='TRANSFER',
             amount=Decimal('1000000'),
             currency='IRR',
@@ -82,29 +137,82 @@ class TransactionModelTest(TestCase):
         self.assertFalse(self.transaction.is_suspicious)
 
 
+class BulkUpdateRowsTest(TestCase):
+    """Test bulk_update_rows against the configured database"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
+    
+    def _create_transactions(self, count):
+        return [
+            Transaction.objects.create(
+                transaction_id=f'TXN-BULK-{i}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('1000'),
+                currency='IRR',
+                status='COMPLETED'
+            )
+            for i in range(count)
+        ]
+    
+    def _assert_round_trip(self, batch_size):
+        transactions = self._create_transactions(3)
+        updated_at = timezone.now() - timedelta(days=1)
+        values = [
+            (Decimal('87.50'), True, [{'rule': 'High Amount', 'note': 'مبلغ بالا'}]),
+            (None, False, []),
+            (Decimal('0.01'), True, ['velocity', {'count': 12}]),
+        ]
+        for txn, (score, suspicious, reasons) in zip(transactions, values):
+            txn.risk_score = score
+            txn.is_suspicious = suspicious
+            txn.flagged_reasons = reasons
+            txn.updated_at = updated_at
+        
+        bulk_update_rows(
+            Transaction,
+            transactions,
+            ['risk_score', 'is_suspicious', 'flagged_reasons', 'updated_at'],
+            batch_size=batch_size
+        )
+        
+        for txn, (score, suspicious, reasons) in zip(transactions, values):
+            stored = Transaction.objects.get(pk=txn.pk)
+            self.assertEqual(stored.risk_score, score)
+            self.assertEqual(stored.is_suspicious, suspicious)
+            self.assertEqual(stored.flagged_reasons, reasons)
+            self.assertEqual(stored.updated_at, updated_at)
+    
+    def test_round_trip(self):
+        """Decimal, boolean, JSON and datetime values are written by primary key"""
+        self._assert_round_trip(batch_size=500)
+    
+    @skipUnless(connection.vendor == 'postgresql', 'UPDATE ... FROM (VALUES ...) is PostgreSQL only')
+    def test_postgresql_values_casts(self):
+        """VALUES literals are cast to the JSON, numeric and UUID column types"""
+        # batch_size=2 splits the rows into a full and a partial VALUES batch
+        self._assert_round_trip(batch_size=2)
+    
+    def test_empty_objs(self):
+        """No objects means no query"""
+        with self.assertNumQueries(0):
+            bulk_update_rows(Transaction, [], ['risk_score'])
+
+
 class RuleEngineTest(TestCase):
     """Test Rule Engine"""
     
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
+        cls.rule = create_threshold_rule()
+    
     def setUp(self):
-        self.customer = Customer.objects.create(
-            customer_id='CUST001',
-            first_name='John',
-            last_name='Doe',
-            email='john.doe@example.com',
-            country='IR'
-        )
-        
-        # Create a threshold rule
-        self.rule = Rule.objects.create(
-            name='High Amount Threshold',
-            description='Flag transactions above 10M',
-            rule_type='THRESHOLD',
-            status='ACTIVE',
-            configuration={
-                'amount_threshold': 10000000
-            },
-            priority=1
-        )
+        # The rollback after a test that saved rules does not undo its version
+        # bump, which would leave the compiled-rules cache holding those rules
+        bump_rules_version()
     
     def test_threshold_rule(self):
         """Test threshold rule evaluation"""
@@ -124,19 +232,246 @@ class RuleEngineTest(TestCase):
         self.assertGreater(len(triggered_rules), 0)
         self.assertIn(self.rule, triggered_rules)
         self.assertGreater(risk_score, 0)
+    
+    def test_batch_evaluation_uses_grouped_stats(self):
+        """Test batch evaluation shares one aggregate query across transactions"""
+        Rule.objects.create(
+            name='Daily Transaction Count',
+            description='Flag more than 2 transactions per day',
+            rule_type='THRESHOLD',
+            status='ACTIVE',
+            configuration={'daily_count_threshold': 2},
+            priority=2
+        )
+        transactions = [
+            Transaction.objects.create(
+                transaction_id=f'TXN00{i}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('1000'),
+                currency='IRR',
+                status='COMPLETED'
+            )
+            for i in range(3)
+        ]
+        
+        rule_engine = RuleEngine()
+        # Rules are loaded once; a single grouped aggregate covers all transactions
+        with self.assertNumQueries(1):
+            results = rule_engine.evaluate_transactions(transactions)
+        
+        self.assertEqual(len(results), 3)
+        for triggered_rules, reasons, risk_score in results:
+            self.assertEqual([rule.name for rule in triggered_rules], ['Daily Transaction Count'])
+    
+    def test_behavioral_rules_share_one_aggregate(self):
+        """Test behavioral rules with the same window share a single aggregate query"""
+        for name in ('Amount Spike', 'Amount Spike (pattern)'):
+            Rule.objects.create(
+                name=name,
+                description='Sudden behavior change',
+                rule_type='BEHAVIORAL',
+                status='ACTIVE',
+                configuration={
+                    'amount_increase_threshold': 3.0,
+                    'lookback_days': 30,
+                    'pattern_change_detection': True,
+                },
+                priority=2
+            )
+        now = timezone.now()
+        for i in range(3):
+            Transaction.objects.create(
+                transaction_id=f'TXNH{i}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('1000'),
+                currency='IRR',
+                status='COMPLETED',
+                transaction_date=now - timedelta(days=i + 1)
+            )
+        transaction = Transaction.objects.create(
+            transaction_id='TXN001',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('10000'),
+            currency='IRR',
+            status='COMPLETED',
+            transaction_date=now
+        )
+        
+        rule_engine = RuleEngine()
+        with self.assertNumQueries(1):
+            triggered_rules, reasons, _ = rule_engine.evaluate_transaction(transaction)
+        
+        self.assertEqual(len(triggered_rules), 2)
+        self.assertIn('Sudden amount increase', reasons[0])
+    
+    def test_rule_changes_reload_engine(self):
+        """Test saved and deactivated rules are picked up without a restart"""
+        transaction = Transaction.objects.create(
+            transaction_id='TXN001',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('15000000'),
+            currency='IRR',
+            receiver_country='XX',
+            status='COMPLETED'
+        )
+        rule_engine = RuleEngine()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            geo_rule = Rule.objects.create(
+                name='High-Risk Country',
+                description='Flag high-risk countries',
+                rule_type='GEOGRAPHIC',
+                status='ACTIVE',
+                configuration={'high_risk_countries': ['XX']},
+                priority=2
+            )
+        triggered_rules, _, _ = rule_engine.evaluate_transaction(transaction)
+        self.assertEqual(triggered_rules, [self.rule, geo_rule])
+        
+        geo_rule.status = 'INACTIVE'
+        with self.captureOnCommitCallbacks(execute=True):
+            geo_rule.save()
+        triggered_rules, _, _ = rule_engine.evaluate_transaction(transaction)
+        self.assertEqual(triggered_rules, [self.rule])
+    
+    def test_seeded_rules_reach_running_engine(self):
+        """Test rules bulk-inserted by create_sample_rules are picked up without reload_rules()"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        transaction = Transaction.objects.create(
+            transaction_id='TXN001',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('1000'),
+            currency='IRR',
+            receiver_country='XX',
+            status='COMPLETED'
+        )
+        rule_engine = get_rule_engine()
+        self.assertEqual(rule_engine.evaluate_transaction(transaction)[0], [])
+        
+        call_command('create_sample_rules', stdout=StringIO())
+        
+        triggered_rules, _, _ = rule_engine.evaluate_transaction(transaction)
+        self.assertEqual([rule.name for rule in triggered_rules], ['High-Risk Country Detection'])
+    
+    def test_rule_change_reloads_engine_only_after_commit(self):
+        """Test a rule saved inside a transaction is not visible to the engine before commit"""
+        from django.db import transaction as db_transaction
+        
+        transaction = Transaction.objects.create(
+            transaction_id='TXN001',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('15000000'),
+            currency='IRR',
+            receiver_country='XX',
+            status='COMPLETED'
+        )
+        rule_engine = RuleEngine()
+        rule_engine.evaluate_transaction(transaction)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            with db_transaction.atomic():
+                geo_rule = Rule.objects.create(
+                    name='High-Risk Country',
+                    description='Flag high-risk countries',
+                    rule_type='GEOGRAPHIC',
+                    status='ACTIVE',
+                    configuration={'high_risk_countries': ['XX']},
+                    priority=2
+                )
+                # Not committed yet: the rule-set version (and cached rule table) is unchanged
+                triggered_rules, _, _ = rule_engine.evaluate_transaction(transaction)
+                self.assertEqual(triggered_rules, [self.rule])
+        
+        triggered_rules, _, _ = rule_engine.evaluate_transaction(transaction)
+        self.assertEqual(triggered_rules, [self.rule, geo_rule])
+    
+    def test_vectorized_batch_matches_single_evaluation(self):
+        """Test NumPy pre-screening gives the same results as per-transaction evaluation"""
+        Rule.objects.create(
+            name='High-Risk Country',
+            description='Flag high-risk and large cross-border transactions',
+            rule_type='GEOGRAPHIC',
+            status='ACTIVE',
+            configuration={'high_risk_countries': ['XX'], 'cross_border_threshold': 5000000},
+            priority=2
+        )
+        Rule.objects.create(
+            name='Daily Count',
+            description='Flag customers with many transactions today',
+            rule_type='THRESHOLD',
+            status='ACTIVE',
+            configuration={'daily_count_threshold': 30},
+            priority=3
+        )
+        other_customer = Customer.objects.create(
+            customer_id='CUST002',
+            first_name='Jane',
+            last_name='Roe',
+            email='jane.roe@example.com',
+            country='DE'
+        )
+        countries = ['', 'IR', 'XX', 'DE']
+        transactions = [
+            Transaction.objects.create(
+                transaction_id=f'TXNV{i:03d}',
+                customer=other_customer if i % 4 == 3 else self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal(i * 250000),
+                currency='IRR',
+                receiver_country=countries[i % len(countries)],
+                status='COMPLETED'
+            )
+            for i in range(80)
+        ]
+        
+        rule_engine = RuleEngine()
+        batch_results = rule_engine.evaluate_transactions(transactions)
+        single_results = [rule_engine.evaluate_transaction(t) for t in transactions]
+        
+        self.assertEqual(batch_results, single_results)
+        self.assertTrue(any(triggered for triggered, _, _ in batch_results))
 
 
 class RiskScorerTest(TestCase):
     """Test Risk Scorer"""
     
-    def setUp(self):
-        self.customer = Customer.objects.create(
-            customer_id='CUST001',
-            first_name='John',
-            last_name='Doe',
-            email='john.doe@example.com',
-            country='IR'
-        )
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
+    
+    def test_hourly_stats_window_stops_at_last_refresh(self):
+        """Test only whole hours that ended before the last view refresh are read from the view"""
+        from datetime import datetime, timezone as dt_timezone
+        from django.db import connection
+        from .services.risk_scorer import CUSTOMER_TX_STATS_REFRESHED_CACHE_KEY, hourly_stats_window
+        
+        start = datetime(2024, 1, 1, 9, 30, tzinfo=dt_timezone.utc)
+        end = datetime(2024, 1, 2, 15, 10, tzinfo=dt_timezone.utc)
+        refreshed_at = datetime(2024, 1, 2, 12, 0, 40, tzinfo=dt_timezone.utc)
+        
+        self.assertIsNone(hourly_stats_window(start, end))  # SQLite: raw rows only
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertIsNone(hourly_stats_window(start, end))  # no refresh recorded (beat not running)
+            cache.set(CUSTOMER_TX_STATS_REFRESHED_CACHE_KEY, refreshed_at)
+            try:
+                self.assertEqual(
+                    hourly_stats_window(start, end),
+                    (datetime(2024, 1, 1, 10, tzinfo=dt_timezone.utc), datetime(2024, 1, 2, 12, tzinfo=dt_timezone.utc))
+                )
+                self.assertEqual(
+                    hourly_stats_window(start, None)[1], datetime(2024, 1, 2, 12, tzinfo=dt_timezone.utc)
+                )
+                self.assertIsNone(hourly_stats_window(start, datetime(2024, 1, 1, 10, 59, tzinfo=dt_timezone.utc)))
+            finally:
+                cache.delete(CUSTOMER_TX_STATS_REFRESHED_CACHE_KEY)
     
     def test_transaction_risk_scoring(self):
         """Test transaction risk score calculation"""
@@ -157,10 +492,104 @@ class RiskScorerTest(TestCase):
         self.assertGreaterEqual(result['score'], 0)
         self.assertLessEqual(result['score'], 100)
     
+    def test_transaction_window_stats_single_query(self):
+        """Amount and frequency factors share one aggregate over the customer's history"""
+        now = timezone.now()
+        for i, minutes in enumerate([30, 300, 60 * 24 * 3]):
+            Transaction.objects.create(
+                transaction_id=f'HIST{i}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('1000000'),
+                status='COMPLETED',
+                transaction_date=now - timedelta(minutes=minutes)
+            )
+        transaction = Transaction.objects.create(
+            transaction_id='TXN002',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('5000000'),
+            status='COMPLETED',
+            transaction_date=now
+        )
+        
+        risk_scorer = get_risk_scorer()
+        with self.assertNumQueries(1):
+            result = risk_scorer.calculate_transaction_risk_score(transaction)
+        
+        self.assertEqual(
+            result['factors']['transaction_frequency']['details'],
+            '2 transactions in last 24 hours'
+        )
+        self.assertEqual(result['factors']['transaction_amount']['score'], 100.0)
+    
+    def test_batch_window_stats_match_single(self):
+        """Batch window stats come from one query and match the per-transaction aggregate"""
+        now = timezone.now()
+        other = Customer.objects.create(customer_id='CUST002', first_name='Jane', last_name='Roe',
+                                        email='jane.roe@example.com', country='IR')
+        transactions = [
+            Transaction.objects.create(
+                transaction_id=f'WIN{i}',
+                customer=self.customer if i % 3 else other,
+                transaction_type='TRANSFER',
+                amount=Decimal(1000000 + i * 250000),
+                status='COMPLETED',
+                transaction_date=now - timedelta(minutes=minutes)
+            )
+            for i, minutes in enumerate([5, 20, 45, 90, 600, 60 * 30, 60 * 24 * 10, 60 * 24 * 40])
+        ]
+        
+        risk_scorer = get_risk_scorer()
+        with self.assertNumQueries(1):
+            batch_stats = risk_scorer.get_transaction_window_stats(transactions, now)
+        
+        for transaction in transactions:
+            expected = risk_scorer._get_transaction_window_stats(transaction, now)
+            stats = batch_stats[transaction.pk]
+            self.assertEqual(stats['count_24h'], expected['count_24h'])
+            self.assertEqual(stats['count_1h'], expected['count_1h'])
+            if expected['avg_amount'] is None:
+                self.assertIsNone(stats['avg_amount'])
+            else:
+                self.assertAlmostEqual(float(stats['avg_amount']), float(expected['avg_amount']), places=2)
+    
+    def test_round_amount_behavioral_risk(self):
+        """Round amounts loaded from the DB (two decimal places) count as round numbers"""
+        noon = timezone.now().replace(hour=12)
+        for transaction_id, amount in [('RND1', '20000000'), ('RND2', '20000000.50')]:
+            Transaction.objects.create(
+                transaction_id=transaction_id,
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal(amount),
+                status='COMPLETED',
+                transaction_date=noon
+            )
+        
+        risk_scorer = get_risk_scorer()
+        round_amount = Transaction.objects.get(transaction_id='RND1')
+        odd_amount = Transaction.objects.get(transaction_id='RND2')
+        self.assertEqual(risk_scorer._calculate_behavioral_risk(round_amount), Decimal('30'))
+        self.assertEqual(risk_scorer._calculate_behavioral_risk(odd_amount), Decimal('15'))
+    
     def test_customer_risk_scoring(self):
         """Test customer risk score calculation"""
+        Transaction.objects.create(
+            transaction_id='TXN003',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('2000000'),
+            status='COMPLETED'
+        )
+        
         risk_scorer = get_risk_scorer()
-        result = risk_scorer.calculate_customer_risk_score(self.customer)
+        # Transaction and alert history in a single round trip
+        with self.assertNumQueries(1):
+            result = risk_scorer.calculate_customer_risk_score(self.customer)
+        
+        self.assertEqual(result['factors']['transaction_history']['details'], '1 transactions in last 90 days')
+        self.assertEqual(result['factors']['alert_history']['details'], '0 alerts in last 90 days')
         
         self.assertIn('score', result)
         self.assertIn('factors', result)
@@ -171,26 +600,13 @@ class RiskScorerTest(TestCase):
 class TransactionMonitorTest(TestCase):
     """Test Transaction Monitor"""
     
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
+        cls.rule = create_threshold_rule()
+    
     def setUp(self):
-        self.customer = Customer.objects.create(
-            customer_id='CUST001',
-            first_name='John',
-            last_name='Doe',
-            email='john.doe@example.com',
-            country='IR'
-        )
-        
-        # Create a threshold rule
-        Rule.objects.create(
-            name='High Amount Threshold',
-            description='Flag transactions above 10M',
-            rule_type='THRESHOLD',
-            status='ACTIVE',
-            configuration={
-                'amount_threshold': 10000000
-            },
-            priority=1
-        )
+        bump_rules_version()
     
     def test_transaction_monitoring(self):
         """Test transaction monitoring"""
@@ -204,7 +620,11 @@ class TransactionMonitorTest(TestCase):
         )
         
         monitor = get_transaction_monitor()
-        result = monitor.monitor_transaction(transaction)
+        monitor.rule_engine.evaluate_transaction(transaction)  # load the rule set outside the count
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            # window stats, transaction UPDATE, alert INSERT, triggered-rule INSERT
+            with self.assertNumQueries(4):
+                result = monitor.monitor_transaction(transaction)
         
         self.assertIn('risk_score', result)
         self.assertIn('is_suspicious', result)
@@ -214,27 +634,365 @@ class TransactionMonitorTest(TestCase):
         transaction.refresh_from_db()
         self.assertIsNotNone(transaction.risk_score)
         
+        # Risk score record and customer re-score are written by the deferred task
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(RiskScore.objects.filter(transaction=transaction, score_type='TRANSACTION').count(), 1)
+        self.assertEqual(RiskScore.objects.filter(customer=self.customer, score_type='CUSTOMER').count(), 1)
+        
         # Check if alert was created
         if result['should_alert']:
             alerts = Alert.objects.filter(transaction=transaction)
             self.assertGreater(alerts.count(), 0)
+    
+    def test_monitoring_survives_broker_outage(self):
+        """Test the alert is created and risk records persisted inline when the broker is unreachable"""
+        from kombu.exceptions import OperationalError as BrokerError
+        from .tasks import persist_risk_artifacts
+        
+        transaction = Transaction.objects.create(
+            transaction_id='TXN002',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('15000000'),
+            currency='IRR',
+            status='COMPLETED'
+        )
+        
+        with mock.patch.object(persist_risk_artifacts, 'delay', side_effect=BrokerError('connection refused')):
+            with self.captureOnCommitCallbacks(execute=True):
+                result = get_transaction_monitor().monitor_transaction(transaction)
+        
+        self.assertTrue(Alert.objects.filter(alert_id=result['alert_id'], transaction=transaction).exists())
+        self.assertEqual(RiskScore.objects.filter(transaction=transaction, score_type='TRANSACTION').count(), 1)
+        self.assertEqual(RiskScore.objects.filter(customer=self.customer, score_type='CUSTOMER').count(), 1)
+    
+    def test_risk_artifacts_task_fails_as_a_unit(self):
+        """Test a failed customer update rolls back the risk records and fails the task"""
+        from django.db import DatabaseError
+        from .tasks import persist_risk_artifacts
+        
+        transaction = Transaction.objects.create(
+            transaction_id='TXN003',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('1000'),
+            status='COMPLETED'
+        )
+        payload = {'score': '10.00', 'factors': {}, 'method': 'weighted_average'}
+        
+        with mock.patch.object(Customer, 'save', side_effect=DatabaseError('deadlock')):
+            with self.assertRaises(DatabaseError):
+                persist_risk_artifacts(str(transaction.pk), payload)
+        
+        self.assertFalse(RiskScore.objects.exists())
+    
+    def test_batch_processing_bulk_writes(self):
+        """Test batch processing persists scores, alerts and triggered rules"""
+        transactions = [
+            Transaction.objects.create(
+                transaction_id=f'TXNB{i}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('15000000'),  # Above threshold
+                currency='IRR',
+                status='COMPLETED'
+            )
+            for i in range(3)
+        ]
+        
+        monitor = TransactionMonitor()
+        monitor.rule_engine = RuleEngine()
+        results = monitor.process_batch_transactions(transactions)
+        
+        self.assertEqual(results['processed'], 3)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(results['alerts_generated'], 3)
+        self.assertEqual(Transaction.objects.filter(is_suspicious=True).count(), 3)
+        self.assertEqual(RiskScore.objects.filter(score_type='TRANSACTION').count(), 3)
+        self.assertEqual(RiskScore.objects.filter(score_type='CUSTOMER').count(), 1)
+        for transaction in transactions:
+            stored = Transaction.objects.get(pk=transaction.pk)
+            self.assertEqual(stored.risk_score, transaction.risk_score)
+            self.assertEqual(stored.flagged_reasons, transaction.flagged_reasons)
+            self.assertEqual(stored.updated_at, transaction.updated_at)
+        for alert in Alert.objects.all():
+            self.assertEqual(list(alert.triggered_rules.all()), [self.rule])
+    
+    def test_batch_attaches_customers_in_one_query(self):
+        """Transactions loaded without select_related get their customers in one query"""
+        for i in range(3):
+            Transaction.objects.create(
+                transaction_id=f'TXNC{i}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('1000000'),
+                status='COMPLETED'
+            )
+        transactions = list(Transaction.objects.all())
+        
+        with self.assertNumQueries(1):
+            TransactionMonitor._attach_customers(transactions)
+        with self.assertNumQueries(0):
+            self.assertEqual({t.customer.customer_id for t in transactions}, {'CUST001'})
+    
+    def test_score_transactions_command_scores_backlog(self):
+        """Test the backlog command scores unscored completed transactions in chunks"""
+        from django.core.management import call_command
+        from io import StringIO
+        
+        for i in range(5):
+            Transaction.objects.create(
+                transaction_id=f'TXNBL{i}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('1000'),
+                currency='IRR',
+                status='COMPLETED'
+            )
+        pending = Transaction.objects.create(
+            transaction_id='TXNBLP',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('1000'),
+            currency='IRR'
+        )
+        
+        out = StringIO()
+        call_command('score_transactions', chunk_size=2, stdout=out)
+        
+        self.assertIn('Scored 5 transactions', out.getvalue())
+        self.assertFalse(Transaction.objects.filter(status='COMPLETED', risk_score__isnull=True).exists())
+        pending.refresh_from_db()
+        self.assertIsNone(pending.risk_score)
 
 
-class AlertGeneratorTest(TestCase):
-    """Test Alert Generator"""
+class TransactionAPITest(TestCase):
+    """Test Transaction API list filters"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        cls.user = User.objects.create_user('analyst', password='pw')
+        customer = create_customer()
+        now = timezone.now()
+        Transaction.objects.bulk_create([
+            Transaction(
+                transaction_id=f'TXN{i:03d}',
+                customer=customer,
+                transaction_type=transaction_type,
+                amount=Decimal('1000'),
+                transaction_date=now - timedelta(days=days_ago),
+                is_suspicious=is_suspicious
+            )
+            for i, (transaction_type, days_ago, is_suspicious) in enumerate([
+                ('TRANSFER', 1, True), ('TRANSFER', 10, False), ('DEPOSIT', 1, False),
+            ])
+        ])
     
     def setUp(self):
-        self.customer = Customer.objects.create(
-            customer_id='CUST001',
-            first_name='John',
-            last_name='Doe',
-            email='john.doe@example.com',
-            country='IR'
+        self.client.force_login(self.user)
+    
+    def _transaction_ids(self, query):
+        response = self.client.get(f'/api/transactions/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(t['transaction_id'] for t in response.json()['results'])
+    
+    def test_list_filters(self):
+        """Test type, suspicious flag and date range filters combine"""
+        since = (timezone.now() - timedelta(days=5)).date().isoformat()
+        
+        self.assertEqual(self._transaction_ids('is_suspicious=true'), ['TXN000'])
+        self.assertEqual(self._transaction_ids('is_suspicious=false&transaction_type=TRANSFER'), ['TXN001'])
+        self.assertEqual(self._transaction_ids(f'date_from={since}'), ['TXN000', 'TXN002'])
+        self.assertEqual(self._transaction_ids(f'date_to={since}&transaction_type=TRANSFER'), ['TXN001'])
+    
+    def test_invalid_filter_value_is_rejected(self):
+        """Test a malformed date is a 400 instead of a database error"""
+        response = self.client.get('/api/transactions/?date_from=yesterday')
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('date_from', response.json())
+
+
+class AlertAPITest(TestCase):
+    """Test Alert API list serialization"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        from django.contrib.auth.models import User
+        cls.user = User.objects.create_user('analyst', password='pw')
+        cls.customer = create_customer()
+        cls.rule = create_threshold_rule()
+    
+    def setUp(self):
+        self.client.force_login(self.user)
+    
+    def _create_alerts(self, count, offset=0):
+        """Bulk-insert count alerts (with their transactions), one INSERT per table"""
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                transaction_id=f'TXN{i:03d}',
+                customer=self.customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('15000000'),
+                currency='IRR',
+                status='COMPLETED'
+            )
+            for i in range(offset, offset + count)
+        ])
+        alerts = Alert.objects.bulk_create([
+            Alert(
+                alert_id=f'ALERT{i:03d}',
+                transaction=transaction,
+                customer=self.customer,
+                title='Test Alert',
+                description='Test',
+                risk_score=Decimal('75')
+            )
+            for i, transaction in enumerate(transactions, start=offset)
+        ])
+        Alert.triggered_rules.through.objects.bulk_create([
+            Alert.triggered_rules.through(alert_id=alert.pk, rule_id=self.rule.pk)
+            for alert in alerts
+        ])
+    
+    def test_alert_list_query_count_is_constant(self):
+        """Test nested alert details are eager-loaded, not fetched per alert"""
+        # session, user, count, alerts (+ customer/transaction joins), triggered rules
+        self._create_alerts(2)
+        with self.assertNumQueries(5):
+            self.client.get('/api/alerts/')
+        
+        self._create_alerts(8, offset=2)
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/alerts/')
+        
+        self.assertEqual(response.status_code, 200)
+        alert = response.json()['results'][0]
+        self.assertEqual(alert['customer_detail']['customer_id'], 'CUST001')
+        self.assertEqual(alert['transaction_detail']['customer_detail'], alert['customer_detail'])
+        self.assertEqual(alert['triggered_rules_detail'][0]['name'], 'High Amount Threshold')
+    
+    def test_customer_alerts_action_is_paginated_without_n_plus_one(self):
+        """Test the customer alerts action eager-loads nested details and paginates"""
+        # session, user, customer, count, alerts (+ transaction/customer joins), triggered rules
+        self._create_alerts(3)
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/customers/CUST001/alerts/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertEqual(response.json()['results'][0]['triggered_rules_detail'][0]['name'], 'High Amount Threshold')
+    
+    def test_monitor_endpoint_creates_one_alert(self):
+        """Test the monitor endpoint returns the monitor's alert instead of generating another"""
+        Transaction.objects.create(
+            transaction_id='TXN100',
+            customer=self.customer,
+            transaction_type='TRANSFER',
+            amount=Decimal('15000000'),
+            currency='IRR',
+            status='COMPLETED'
+        )
+        response = self.client.post(
+            '/api/transactions/monitor/', {'transaction_id': 'TXN100'}, content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, 200)
+        alert = Alert.objects.get(transaction__transaction_id='TXN100')
+        self.assertEqual(response.json()['alert']['alert_id'], alert.alert_id)
+        self.assertEqual(response.json()['monitoring_result']['alert_id'], alert.alert_id)
+        self.assertEqual(response.json()['alert']['triggered_rules_detail'][0]['name'], 'High Amount Threshold')
+    
+    def test_audit_log_list_conditional_get(self):
+        """Test a repeated audit log poll gets 304 until a new entry is written"""
+        from .models import AuditLog
+        
+        def flush_now(record):
+            # Stand-in for the background writer flushing each entry before the next poll
+            AuditLog.objects.create(**record)
+        
+        AuditLog.objects.create(method='GET', path='/api/alerts/', user='analyst', status_code=200)
+        with mock.patch('aml.middleware.enqueue_audit_record', side_effect=flush_now):
+            response = self.client.get('/api/audit-log/')
+            etag = response['ETag']
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(AuditLog.objects.filter(path='/api/audit-log/', user='analyst').exists())
+            
+            # The poller's own (audited) reads do not change its ETag
+            self.assertEqual(self.client.get('/api/audit-log/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get('/api/audit-log/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(AuditLog.objects.filter(path='/api/audit-log/', user='analyst').count(), 3)
+            
+            # Any other entry, including another user's read of the audit log, does
+            AuditLog.objects.create(method='GET', path='/api/audit-log/', user='auditor', status_code=200)
+            self.assertEqual(self.client.get('/api/audit-log/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+    
+    def test_alert_list_summary_detail(self):
+        """Test ?detail=summary renders compact nested customer and rule details"""
+        self._create_alerts(1)
+        response = self.client.get('/api/alerts/?detail=summary')
+        
+        self.assertEqual(response.status_code, 200)
+        alert = response.json()['results'][0]
+        self.assertEqual(
+            set(alert['customer_detail']),
+            {'id', 'customer_id', 'first_name', 'last_name', 'current_risk_level'}
         )
+        self.assertEqual(alert['transaction_detail']['customer_detail'], alert['customer_detail'])
+        self.assertNotIn('configuration', alert['triggered_rules_detail'][0])
+        self.assertNotIn('description', alert)
+        self.assertNotIn('description', alert['transaction_detail'])
+    
+    def test_summary_lists_do_not_select_free_text_columns(self):
+        """Test ?detail=summary list queries leave the deferred text columns out of the SELECT"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self._create_alerts(1)
+        for path, table in (
+            ('/api/alerts/', 'aml_alert'), ('/api/transactions/', 'aml_transaction'), ('/api/customers/', 'aml_customer'),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f'{path}?detail=summary')
+            
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('description', response.json()['results'][0])
+            rows_sql = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'LIMIT' in q['sql']]
+            self.assertNotIn(f'"{table}"."description"', rows_sql[0])
+            self.assertNotIn('"aml_customer"."address"', rows_sql[0])
+    
+    def test_review_writes_only_review_columns(self):
+        """Test reviewing an alert issues a narrow UPDATE and returns the new state"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self._create_alerts(1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/alerts/ALERT000/review/',
+                {'status': 'ESCALATED', 'notes': 'check'},
+                content_type='application/json'
+            )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['severity'], 'HIGH')
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"description"', updates[0])
+        self.assertEqual(Alert.objects.get(alert_id='ALERT000').status, 'ESCALATED')
+
+
+class AlertGeneratorTest(TestCase):
+    """Test Alert Generator"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
         
-        self.transaction = Transaction.objects.create(
+        cls.transaction = Transaction.objects.create(
             transaction_id='TXN001',
-            customer=self.customer,
+            customer=cls.customer,
             transaction_type='TRANSFER',
             amount=Decimal('15000000'),
             currency='IRR',
@@ -281,33 +1039,81 @@ class AlertGeneratorTest(TestCase):
         self.assertEqual(reviewed_alert.status, 'RESOLVED')
         self.assertEqual(reviewed_alert.reviewed_by, 'test_user')
         self.assertIsNotNone(reviewed_alert.reviewed_at)
+    
+    def test_bulk_review_single_update(self):
+        """Test bulk review marks many alerts in one batched UPDATE"""
+        alert_generator = get_alert_generator()
+        alerts = [
+            alert_generator.generate_alert(
+                transaction=self.transaction,
+                triggered_rules=[],
+                risk_score=Decimal('60'),
+                severity='MEDIUM',
+                reasons=['High transaction amount']
+            )
+            for _ in range(3)
+        ]
+        
+        with self.assertNumQueries(1):
+            alert_generator.bulk_review(alerts, 'test_user', 'FALSE_POSITIVE', 'Known payroll run')
+        
+        for alert in Alert.objects.all():
+            self.assertEqual(alert.status, 'FALSE_POSITIVE')
+            self.assertEqual(alert.reviewed_by, 'test_user')
+            self.assertEqual(alert.resolution_notes, 'False Positive: Known payroll run')
+    
+    def test_alert_statistics_single_query(self):
+        """Test alert counts and statistics are each one aggregate query, counts cached"""
+        alert_generator = get_alert_generator()
+        for severity, risk_score in (('HIGH', '80'), ('HIGH', '90'), ('LOW', '30')):
+            alert_generator.generate_alert(
+                transaction=self.transaction,
+                triggered_rules=[],
+                risk_score=Decimal(risk_score),
+                severity=severity,
+                reasons=['High transaction amount']
+            )
+        
+        with self.assertNumQueries(1):
+            counts = alert_generator.get_open_alerts_count()
+        with self.assertNumQueries(1):
+            stats = alert_generator.get_alerts_statistics(days=30)
+        
+        self.assertEqual(counts, {'LOW': 1, 'MEDIUM': 0, 'HIGH': 2, 'CRITICAL': 0, 'TOTAL': 3})
+        
+        # Cached until an alert changes status
+        with self.assertNumQueries(0):
+            alert_generator.get_open_alerts_count()
+            alert_generator.get_alerts_statistics(days=30)
+        alert_generator.bulk_review(list(Alert.objects.filter(severity='LOW')), 'test_user', 'RESOLVED', 'ok')
+        self.assertEqual(alert_generator.get_open_alerts_count()['TOTAL'], 2)
+        self.assertEqual(alert_generator.get_alerts_statistics(days=30)['by_status']['RESOLVED'], 1)
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual(stats['by_severity']['HIGH'], 2)
+        self.assertEqual(stats['by_status']['OPEN'], 3)
+        self.assertAlmostEqual(stats['average_risk_score'], 200 / 3, places=2)
 
 
 class ReportGeneratorTest(TestCase):
     """Test Report Generator"""
     
-    def setUp(self):
-        self.customer = Customer.objects.create(
-            customer_id='CUST001',
-            first_name='John',
-            last_name='Doe',
-            email='john.doe@example.com',
-            country='IR'
-        )
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = create_customer()
         
-        self.transaction = Transaction.objects.create(
+        cls.transaction = Transaction.objects.create(
             transaction_id='TXN001',
-            customer=self.customer,
+            customer=cls.customer,
             transaction_type='TRANSFER',
             amount=Decimal('15000000'),
             currency='IRR',
             status='COMPLETED'
         )
         
-        self.alert = Alert.objects.create(
+        cls.alert = Alert.objects.create(
             alert_id='ALT001',
-            transaction=self.transaction,
-            customer=self.customer,
+            transaction=cls.transaction,
+            customer=cls.customer,
             severity='HIGH',
             status='OPEN',
             title='Test Alert',
@@ -315,6 +1121,18 @@ class ReportGeneratorTest(TestCase):
             risk_score=Decimal('85')
         )
     
+    def setUp(self):
+        # Exports go to a throwaway directory, not BASE_DIR/reports
+        reports_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, reports_dir)
+        report_generator = get_report_generator()
+        for patcher in (
+            mock.patch.object(report_generator, 'reports_dir', reports_dir),
+            mock.patch.object(report_generator, '_reports_dir_ready', True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
     def test_sar_generation(self):
         """Test SAR report generation"""
         report_generator = get_report_generator()
@@ -334,6 +1152,187 @@ class ReportGeneratorTest(TestCase):
         self.assertEqual(report.status, 'DRAFT')
         self.assertIn('alerts', report.report_data)
         self.assertEqual(len(report.report_data['alerts']), 1)
+        self.assertEqual(report.report_data['alerts'][0]['customer_name'], 'John Doe')
+        self.assertEqual(list(report.related_alerts.all()), [self.alert])
+        self.assertEqual(list(report.related_customers.all()), [self.customer])
+    
+    def test_generate_report_task_renders_pdf(self):
+        """Test the report task renders a queued PDF report and records the file on it"""
+        from .tasks import generate_report_task
+        
+        report = Report.objects.create(
+            report_id='SAR-PDF', report_type='SAR', status='PENDING', title='SAR report (pending)',
+            period_start=timezone.now() - timedelta(days=30), period_end=timezone.now(), file_format='PDF'
+        )
+        result = generate_report_task.delay(str(report.pk))
+        
+        report.refresh_from_db()
+        self.assertEqual(result.get(), 'DRAFT')
+        self.assertEqual(report.file_format, 'PDF')
+        self.assertTrue(report.file_path.endswith('SAR-PDF.pdf'))
+    
+    def test_generate_report_task_fills_pending_report(self):
+        """Test the worker task builds and exports a report queued as PENDING"""
+        from .tasks import generate_report_task
+        
+        report = Report.objects.create(
+            report_id='SAR-PENDING', report_type='SAR', status='PENDING', title='SAR report (pending)',
+            period_start=timezone.now() - timedelta(days=30), period_end=timezone.now(), file_format='CSV'
+        )
+        
+        self.assertEqual(generate_report_task(str(report.pk)), 'DRAFT')
+        
+        report.refresh_from_db()
+        self.assertEqual(report.report_id, 'SAR-PENDING')
+        self.assertEqual(report.status, 'DRAFT')
+        self.assertTrue(report.file_path.endswith('SAR-PENDING.csv'))
+        self.assertEqual(list(report.related_alerts.all()), [self.alert])
+    
+    def test_generate_report_task_marks_empty_report_failed(self):
+        """Test an empty selection leaves the queued report FAILED with the reason"""
+        from .tasks import generate_report_task
+        
+        report = Report.objects.create(
+            report_id='CTR-PENDING', report_type='CTR', status='PENDING', title='CTR report (pending)',
+            period_start=timezone.now() - timedelta(days=30), period_end=timezone.now()
+        )
+        
+        self.assertEqual(generate_report_task(str(report.pk), threshold='999999999999'), 'FAILED')
+        
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'FAILED')
+        self.assertEqual(report.description, 'No transactions found exceeding the threshold')
+    
+    def test_generate_endpoint(self):
+        """Test the generate endpoint (eager Celery) returns the built report, or 400 when empty"""
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user('analyst', password='pw'))
+        period = {'period_start': (timezone.now() - timedelta(days=30)).isoformat(), 'period_end': timezone.now().isoformat()}
+        
+        response = self.client.post(
+            '/api/reports/generate/', {'report_type': 'SAR', 'format': 'JSON', **period}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'DRAFT')
+        
+        response = self.client.post(
+            '/api/reports/generate/', {'report_type': 'CTR', 'threshold': '999999999999', **period},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'No transactions found exceeding the threshold'})
+        self.assertEqual(Report.objects.count(), 1)
+    
+    def test_sar_query_count_is_constant(self):
+        """Test SAR assembly loads alert transactions/customers in one query, not per alert"""
+        customers = Customer.objects.bulk_create([
+            Customer(customer_id=f'CUSTS{i:02d}', first_name='Jane', last_name=f'Roe{i}', email=f'jane{i}@example.com')
+            for i in range(50)
+        ])
+        transactions = Transaction.objects.bulk_create([
+            Transaction(
+                transaction_id=f'TXNS{i:02d}',
+                customer=customer,
+                transaction_type='TRANSFER',
+                amount=Decimal('15000000'),
+                status='COMPLETED'
+            )
+            for i, customer in enumerate(customers)
+        ])
+        alerts = Alert.objects.bulk_create([
+            Alert(
+                alert_id=f'ALTS{i:02d}',
+                transaction=transaction,
+                customer=transaction.customer,
+                title='Test Alert',
+                description='Test alert description',
+                risk_score=Decimal('50')
+            )
+            for i, transaction in enumerate(transactions)
+        ])
+        period_end = timezone.now()
+        
+        # joined alert rows, report INSERT, one INSERT per related-entity table
+        with self.assertNumQueries(5):
+            report = get_report_generator().generate_sar(alerts, period_end - timedelta(days=30), period_end)
+        
+        self.assertEqual(len(report.report_data['alerts']), 50)
+        self.assertEqual(report.report_data['alerts'][49]['customer_name'], 'Jane Roe49')
+        self.assertEqual(report.related_customers.count(), 50)
+    
+    def test_sar_from_queryset_streams_rows(self):
+        """Test a queryset input is read in its own order with no pk__in round trip"""
+        Alert.objects.create(
+            alert_id='ALT002',
+            transaction=self.transaction,
+            customer=self.customer,
+            title='Test Alert',
+            description='Test alert description',
+            risk_score=Decimal('50')
+        )
+        period_end = timezone.now()
+        
+        # joined alert rows, report INSERT, one INSERT per related-entity table
+        with self.assertNumQueries(5):
+            report = get_report_generator().generate_sar(
+                Alert.objects.order_by('alert_id'), period_end - timedelta(days=30), period_end
+            )
+        
+        self.assertEqual([a['alert_id'] for a in report.report_data['alerts']], ['ALT001', 'ALT002'])
+        self.assertEqual(report.related_alerts.count(), 2)
+    
+    def test_empty_sar_is_rejected_in_one_query(self):
+        """Test an empty selection raises before any report is written"""
+        from .services.report_generator import EmptyReportError
+        period_end = timezone.now()
+        
+        with self.assertNumQueries(1), self.assertRaises(EmptyReportError):
+            get_report_generator().generate_sar(
+                Alert.objects.filter(alert_id='MISSING'), period_end - timedelta(days=30), period_end
+            )
+        
+        self.assertFalse(Report.objects.exists())
+    
+    def test_download_offloads_to_nginx_when_configured(self):
+        """Test the download endpoint only sets X-Accel-Redirect when a prefix is configured"""
+        from django.contrib.auth.models import User
+        from django.test import override_settings
+        
+        report = get_report_generator().generate_sar(
+            alerts=[self.alert], period_start=timezone.now() - timedelta(days=30), period_end=timezone.now()
+        )
+        Report.objects.filter(pk=report.pk).update(file_path='/srv/reports/sar.pdf', file_format='PDF')
+        self.client.force_login(User.objects.create_user('analyst', password='pw'))
+        
+        with override_settings(REPORTS_ACCEL_REDIRECT_PREFIX='/protected-reports/'):
+            response = self.client.get(f'/api/reports/{report.report_id}/download/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-reports/sar.pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'{report.report_id}.pdf', response['Content-Disposition'])
+        self.assertEqual(response.content, b'')
+    
+    def test_download_streams_report_file(self):
+        """Test the download endpoint streams the exported file in large blocks"""
+        from django.contrib.auth.models import User
+        
+        report_generator = get_report_generator()
+        report = report_generator.generate_sar(
+            alerts=[self.alert], period_start=timezone.now() - timedelta(days=30), period_end=timezone.now()
+        )
+        report_generator.export_report_csv(report)
+        self.client.force_login(User.objects.create_user('analyst', password='pw'))
+        
+        response = self.client.get(f'/api/reports/{report.report_id}/download/')
+        self.addCleanup(response.close)  # closes the streamed file
+        
+        self.assertTrue(report.file_path.startswith(report_generator.reports_dir))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response.block_size, 1 << 20)
+        with open(report.file_path, 'rb') as f:
+            self.assertEqual(b''.join(response.streaming_content), f.read())
     
     def test_ctr_generation(self):
         """Test CTR report generation"""
@@ -355,4 +1354,6 @@ class ReportGeneratorTest(TestCase):
         self.assertEqual(report.status, 'DRAFT')
         self.assertIn('transactions', report.report_data)
         self.assertEqual(len(report.report_data['transactions']), 1)
+        self.assertEqual(report.report_data['total_amount'], '15000000.00')
+        self.assertEqual(report.report_data['transactions'][0]['customer_name'], 'John Doe')
 
@@ -2,10 +2,10 @@
 URL configuration for AML app.
 """
 from django.urls import path, include
-from rest_framework.routers import DefaultRouter
+from rest_framework.routers import SimpleRouter
 from . import views
 
-router = DefaultRouter()
+router = SimpleRouter()
 router.register(r'customers', views.CustomerViewSet, basename='customer')
 router.register(r'transactions', views.TransactionViewSet, basename='transaction')
 router.register(r'alerts', views.AlertViewSet, basename='alert')
@@ -2,40 +2,84 @@
 API Views for AML System
 """
 import logging
+import mimetypes
+import os
+import time
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q
-from django.http import FileResponse
+from django.db.models import Prefetch
+from django.http import FileResponse, HttpResponse
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import condition
 
+from .filters import TransactionFilter
 from .models import Customer, Transaction, Alert, RiskScore, Rule, Report, AuditLog
 from .serializers import (
     CustomerSerializer, TransactionSerializer, AlertSerializer,
     RiskScoreSerializer, RuleSerializer, ReportSerializer, AuditLogSerializer,
-    MonitorTransactionSerializer, ReviewAlertSerializer, GenerateReportSerializer
+    MonitorTransactionSerializer, ReviewAlertSerializer, GenerateReportSerializer,
+    CustomerSummarySerializer, RuleSummarySerializer, DETAIL_SUMMARY
 )
 from .services.transaction_monitor import get_transaction_monitor
 from .services.alert_generator import get_alert_generator
-from .services.report_generator import get_report_generator
+from .services.report_generator import get_report_generator, new_report_id
+from .tasks import generate_report_task
+from .utils import estimate_counts
 
 logger = logging.getLogger('aml')
 
+# Dashboard table sizes may lag by up to this many seconds
+DASHBOARD_COUNTS_CACHE_KEY = 'aml:dashboard:counts'
+DASHBOARD_COUNTS_CACHE_TIMEOUT = 30
+
+
+def _summary_deferred_customer_fields(prefix):
+    """Customer columns CustomerSummarySerializer does not render, as defer() paths"""
+    keep = set(CustomerSummarySerializer.Meta.fields)
+    return [f'{prefix}{field.name}' for field in Customer._meta.concrete_fields if field.name not in keep]
+
+
+class DetailLevelMixin:
+    """
+    ?detail=summary renders nested customer/rule details in compact form and
+    leaves out large free-text fields; get_queryset() narrows the selected
+    columns to match via is_summary().
+    """
+    
+    def is_summary(self):
+        return self.request.query_params.get('detail') == DETAIL_SUMMARY
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.is_summary():
+            context['detail_level'] = DETAIL_SUMMARY
+        return context
+
+
+def _dashboard_counts():
+    """Table sizes shown on the dashboard, in one query (planner estimates for the large tables)"""
+    customers, transactions, rules = estimate_counts(Customer, Transaction, Rule)
+    return {'customers': customers, 'transactions': transactions, 'rules': rules}
+
 
 def dashboard_view(request):
     """Root UI: Regalion AML dashboard (counts + links)."""
     context = {
-        'customers': Customer.objects.count(),
-        'transactions': Transaction.objects.count(),
-        'alerts_open': Alert.objects.filter(status='OPEN').count(),
-        'rules': Rule.objects.count(),
+        **cache.get_or_set(DASHBOARD_COUNTS_CACHE_KEY, _dashboard_counts, DASHBOARD_COUNTS_CACHE_TIMEOUT),
+        # Shares the alert API's cached counts, which alert writes invalidate
+        'alerts_open': get_alert_generator().get_open_alerts_count()['TOTAL'],
     }
     return render(request, 'aml/dashboard.html', context)
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(DetailLevelMixin, viewsets.ModelViewSet):
     """ViewSet for Customer model"""
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
@@ -46,8 +90,15 @@ class CustomerViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'registration_date', 'risk_score', 'current_risk_level']
     ordering = ['-created_at']
 
+    def get_serializer_class(self):
+        if self.action == 'list' and self.is_summary():
+            return CustomerSummarySerializer
+        return super().get_serializer_class()
+    
     def get_queryset(self):
         queryset = Customer.objects.all()
+        if self.action == 'list' and self.is_summary():
+            queryset = queryset.only(*CustomerSummarySerializer.Meta.fields)
         
         # Filter by risk level
         risk_level = self.request.query_params.get('risk_level', None)
@@ -59,75 +110,69 @@ class CustomerViewSet(viewsets.ModelViewSet):
         if customer_type:
             queryset = queryset.filter(customer_type=customer_type)
         
-        # Search by name or email
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search) |
-                Q(last_name__icontains=search) |
-                Q(email__icontains=search) |
-                Q(customer_id__icontains=search)
-            )
-        
+        # ?search= is handled by SearchFilter over search_fields (trigram-indexed on PostgreSQL)
         return queryset
     
+    def _paginated_response(self, queryset, serializer_class):
+        """One page of a customer's related rows (the nested actions can be unbounded)"""
+        page = self.paginate_queryset(queryset)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+    
     @action(detail=True, methods=['get'])
     def risk_scores(self, request, customer_id=None):
         """Get risk scores for a customer"""
         customer = self.get_object()
-        risk_scores = RiskScore.objects.filter(customer=customer).order_by('-calculated_at')
-        serializer = RiskScoreSerializer(risk_scores, many=True)
-        return Response(serializer.data)
+        risk_scores = (
+            RiskScore.objects.filter(customer=customer)
+            .select_related('customer')
+            .order_by('-calculated_at')
+        )
+        return self._paginated_response(risk_scores, RiskScoreSerializer)
     
     @action(detail=True, methods=['get'])
     def alerts(self, request, customer_id=None):
         """Get alerts for a customer"""
         customer = self.get_object()
-        alerts = Alert.objects.filter(customer=customer).order_by('-created_at')
-        serializer = AlertSerializer(alerts, many=True)
-        return Response(serializer.data)
+        alerts = (
+            Alert.objects.filter(customer=customer)
+            .select_related('customer', 'transaction__customer')
+            .prefetch_related('triggered_rules')
+            .order_by('-created_at')
+        )
+        return self._paginated_response(alerts, AlertSerializer)
     
     @action(detail=True, methods=['get'])
     def transactions(self, request, customer_id=None):
         """Get transactions for a customer"""
         customer = self.get_object()
-        transactions = Transaction.objects.filter(customer=customer).order_by('-transaction_date')
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        transactions = (
+            Transaction.objects.filter(customer=customer)
+            .select_related('customer')
+            .order_by('-transaction_date')
+        )
+        return self._paginated_response(transactions, TransactionSerializer)
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(DetailLevelMixin, viewsets.ModelViewSet):
     """ViewSet for Transaction model"""
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'transaction_id'
-    filterset_fields = ['transaction_type', 'status', 'is_suspicious', 'currency']
+    filterset_class = TransactionFilter
     search_fields = ['transaction_id', 'sender_account', 'receiver_account', 'receiver_name']
     ordering_fields = ['transaction_date', 'amount', 'created_at']
     ordering = ['-transaction_date']
 
     def get_queryset(self):
-        queryset = Transaction.objects.all()
-        
-        # Filter by suspicious
-        is_suspicious = self.request.query_params.get('is_suspicious', None)
-        if is_suspicious is not None:
-            queryset = queryset.filter(is_suspicious=is_suspicious.lower() == 'true')
-        
-        # Filter by transaction type
-        transaction_type = self.request.query_params.get('transaction_type', None)
-        if transaction_type:
-            queryset = queryset.filter(transaction_type=transaction_type)
-        
-        # Filter by date range
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
-        if date_from:
-            queryset = queryset.filter(transaction_date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(transaction_date__lte=date_to)
-        
+        # customer_detail is nested in every row
+        queryset = Transaction.objects.select_related('customer')
+        if self.is_summary():
+            queryset = queryset.defer(
+                *_summary_deferred_customer_fields('customer__'),
+                *TransactionSerializer.SUMMARY_OMITTED_FIELDS,
+            )
         return queryset
     
     @action(detail=False, methods=['post'], url_path='monitor')
@@ -139,7 +184,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
         transaction_id = serializer.validated_data['transaction_id']
         
         try:
-            transaction = Transaction.objects.get(transaction_id=transaction_id)
+            transaction = Transaction.objects.select_related('customer').get(transaction_id=transaction_id)
         except Transaction.DoesNotExist:
             return Response(
                 {'error': f'Transaction {transaction_id} not found'},
@@ -150,22 +195,13 @@ class TransactionViewSet(viewsets.ModelViewSet):
         monitor = get_transaction_monitor()
         result = monitor.monitor_transaction(transaction)
         
-        # Generate alert if needed
+        # The monitor already created the alert (if any); load it with its nested details
         alert = None
-        if result['should_alert']:
-            alert_generator = get_alert_generator()
-            
-            # Get triggered rules
-            from .rules.aml_rules import get_rule_engine
-            rule_engine = get_rule_engine()
-            triggered_rules, reasons, _ = rule_engine.evaluate_transaction(transaction)
-            
-            alert = alert_generator.generate_alert(
-                transaction=transaction,
-                triggered_rules=triggered_rules,
-                risk_score=result['risk_score'],
-                severity=result['alert_severity'],
-                reasons=reasons
+        if result['alert_id']:
+            alert = (
+                Alert.objects.select_related('customer', 'transaction__customer')
+                .prefetch_related('triggered_rules')
+                .get(alert_id=result['alert_id'])
             )
         
         response_data = {
@@ -176,7 +212,7 @@ class TransactionViewSet(viewsets.ModelViewSet):
         return Response(response_data, status=status.HTTP_200_OK)
 
 
-class AlertViewSet(viewsets.ModelViewSet):
+class AlertViewSet(DetailLevelMixin, viewsets.ModelViewSet):
     """ViewSet for Alert model"""
     queryset = Alert.objects.all()
     serializer_class = AlertSerializer
@@ -188,7 +224,19 @@ class AlertViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = Alert.objects.all()
+        # Nested transaction/customer details and triggered rules for every row
+        queryset = Alert.objects.select_related('customer', 'transaction__customer')
+        if self.is_summary():
+            queryset = queryset.defer(
+                *AlertSerializer.SUMMARY_OMITTED_FIELDS,
+                *(f'transaction__{name}' for name in TransactionSerializer.SUMMARY_OMITTED_FIELDS),
+                *_summary_deferred_customer_fields('customer__'),
+                *_summary_deferred_customer_fields('transaction__customer__'),
+            ).prefetch_related(
+                Prefetch('triggered_rules', queryset=Rule.objects.only(*RuleSummarySerializer.Meta.fields))
+            )
+        else:
+            queryset = queryset.prefetch_related('triggered_rules')
         
         # Filter by status
         alert_status = self.request.query_params.get('status', None)
@@ -240,7 +288,7 @@ class AlertViewSet(viewsets.ModelViewSet):
         return Response(counts)
 
 
-class RiskScoreViewSet(viewsets.ReadOnlyModelViewSet):
+class RiskScoreViewSet(DetailLevelMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for RiskScore model (read-only)"""
     queryset = RiskScore.objects.all()
     serializer_class = RiskScoreSerializer
@@ -250,7 +298,9 @@ class RiskScoreViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['-calculated_at']
 
     def get_queryset(self):
-        queryset = RiskScore.objects.all()
+        queryset = RiskScore.objects.select_related('customer')
+        if self.is_summary():
+            queryset = queryset.defer(*_summary_deferred_customer_fields('customer__'))
         
         # Filter by customer
         customer_id = self.request.query_params.get('customer_id', None)
@@ -294,6 +344,17 @@ class RuleViewSet(viewsets.ModelViewSet):
         serializer.save(created_by=self.request.user.username if hasattr(self.request.user, 'username') else 'system')
 
 
+class ReportFileResponse(FileResponse):
+    """
+    FileResponse reading report files in 1 MiB blocks (Django's default is 4 KiB).
+
+    Without a wsgi.file_wrapper (ASGI, runserver) every block is one iteration
+    (one thread hop under ASGI), so large exports stream in far fewer steps;
+    memory stays bounded by one block per download.
+    """
+    block_size = 1 << 20
+
+
 class ReportViewSet(viewsets.ModelViewSet):
     """ViewSet for Report model"""
     queryset = Report.objects.all()
@@ -306,7 +367,12 @@ class ReportViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_queryset(self):
-        queryset = Report.objects.all()
+        # Related objects are serialized as primary keys only
+        queryset = Report.objects.prefetch_related(
+            Prefetch('related_alerts', queryset=Alert.objects.only('id')),
+            Prefetch('related_transactions', queryset=Transaction.objects.only('id')),
+            Prefetch('related_customers', queryset=Customer.objects.only('id')),
+        )
         
         # Filter by report type
         report_type = self.request.query_params.get('report_type', None)
@@ -322,91 +388,66 @@ class ReportViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'], url_path='generate')
     def generate_report(self, request):
-        """Generate a new report"""
+        """
+        Queue a new report: a worker builds and exports it (202 with the PENDING report).
+        
+        Poll the report until its status leaves PENDING: DRAFT once generated
+        (download/ then serves the file), or FAILED with the reason as description.
+        """
         serializer = GenerateReportSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         report_type = serializer.validated_data['report_type']
-        period_start = serializer.validated_data['period_start']
-        period_end = serializer.validated_data['period_end']
-        file_format = serializer.validated_data.get('format', 'JSON')
+        threshold = serializer.validated_data.get('threshold', None)
         submitted_by = request.user.username if hasattr(request.user, 'username') else 'system'
         
-        report_generator = get_report_generator()
+        if report_type not in ('SAR', 'CTR'):
+            return Response(
+                {'error': f'Report type {report_type} not implemented'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if report_type == 'CTR' and not threshold:
+            return Response(
+                {'error': 'Threshold is required for CTR reports'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        report = Report.objects.create(
+            report_id=new_report_id(report_type),
+            report_type=report_type,
+            status='PENDING',
+            title=f"{report_type} report (pending)",
+            period_start=serializer.validated_data['period_start'],
+            period_end=serializer.validated_data['period_end'],
+            file_format=serializer.validated_data.get('format', 'JSON'),
+            submitted_by=submitted_by
+        )
         
         try:
-            if report_type == 'SAR':
-                # Get alerts in the period
-                alerts = Alert.objects.filter(
-                    created_at__gte=period_start,
-                    created_at__lte=period_end
-                )
-                
-                if not alerts.exists():
-                    return Response(
-                        {'error': 'No alerts found in the specified period'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                report = report_generator.generate_sar(
-                    alerts=list(alerts),
-                    period_start=period_start,
-                    period_end=period_end,
-                    submitted_by=submitted_by
-                )
-            
-            elif report_type == 'CTR':
-                threshold = serializer.validated_data.get('threshold', None)
-                if not threshold:
-                    return Response(
-                        {'error': 'Threshold is required for CTR reports'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Get transactions exceeding threshold
-                transactions = Transaction.objects.filter(
-                    transaction_date__gte=period_start,
-                    transaction_date__lte=period_end,
-                    amount__gte=threshold,
-                    status='COMPLETED'
-                )
-                
-                if not transactions.exists():
-                    return Response(
-                        {'error': 'No transactions found exceeding the threshold'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                report = report_generator.generate_ctr(
-                    transactions=list(transactions),
-                    period_start=period_start,
-                    period_end=period_end,
-                    threshold=threshold,
-                    submitted_by=submitted_by
-                )
-            
-            else:
-                return Response(
-                    {'error': f'Report type {report_type} not implemented'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Export to requested format
-            if file_format == 'JSON':
-                report_generator.export_report_json(report)
-            elif file_format == 'CSV':
-                report_generator.export_report_csv(report)
-            elif file_format == 'PDF':
-                report_generator.export_report_pdf(report)
-            
-            return Response(ReportSerializer(report).data, status=status.HTTP_201_CREATED)
-            
+            result = generate_report_task.delay(str(report.pk), str(threshold) if threshold else None)
         except Exception as e:
             logger.error(f"Error generating report: {str(e)}")
+            report.delete()
             return Response(
                 {'error': f'Error generating report: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+        
+        if not result.ready():
+            return Response(
+                {**ReportSerializer(report).data, 'task_id': result.id},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        # Built inline (eager Celery): answer as the synchronous API did
+        report.refresh_from_db()
+        if report.status == 'FAILED':
+            report.delete()
+            return Response(
+                {'error': report.description},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR if result.failed() else status.HTTP_400_BAD_REQUEST
+            )
+        return Response(ReportSerializer(report).data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['get'])
     def download(self, request, report_id=None):
@@ -419,12 +460,16 @@ class ReportViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        filename = f"{report.report_id}.{report.file_format.lower()}"
+        if settings.REPORTS_ACCEL_REDIRECT_PREFIX:
+            # nginx sends the file (sendfile); the worker returns immediately
+            response = HttpResponse(content_type=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response['X-Accel-Redirect'] = settings.REPORTS_ACCEL_REDIRECT_PREFIX + os.path.basename(report.file_path)
+            response['Content-Disposition'] = content_disposition_header(True, filename)
+            return response
+        
         try:
-            return FileResponse(
-                open(report.file_path, 'rb'),
-                as_attachment=True,
-                filename=f"{report.report_id}.{report.file_format.lower()}"
-            )
+            return ReportFileResponse(open(report.file_path, 'rb'), as_attachment=True, filename=filename)
         except FileNotFoundError:
             return Response(
                 {'error': 'Report file not found'},
@@ -446,6 +491,28 @@ class ReportViewSet(viewsets.ModelViewSet):
 # --- Audit log (read-only, paginated, for compliance) ---
 
 
+# Reads of the audit log are audited like any other API request
+AUDIT_LOG_API_PATH = '/api/audit-log/'
+
+
+def _audit_log_etag(request, *args, **kwargs):
+    """
+    ETag of the audit log as seen by the requesting user.
+    
+    Rows are only appended (auto-increment ids) or purged oldest-first, so the id
+    bounds change whenever a listing could. The user's own audit log reads are
+    left out of the newest id: otherwise every poll's audit entry (flushed by the
+    writer shortly after) would invalidate the ETag and no poll would get a 304.
+    A 304 can therefore only be missing the poller's own read entries.
+    """
+    newest = (
+        AuditLog.objects.exclude(path__startswith=AUDIT_LOG_API_PATH, user=request.user.username)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    oldest = AuditLog.objects.order_by('id').values_list('id', flat=True).first()
+    return f"{oldest}-{newest}"
+
+
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """Read-only list of audit log entries (compliance API)."""
     queryset = AuditLog.objects.all()
@@ -455,12 +522,22 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     ordering_fields = ['timestamp', 'path', 'status_code']
     ordering = ['-timestamp']
 
+    @method_decorator(condition(etag_func=_audit_log_etag))
+    def list(self, request, *args, **kwargs):
+        """Pollers re-sending If-None-Match get a 304 until new entries arrive"""
+        return super().list(request, *args, **kwargs)
+
 
 # --- Health & readiness (no auth for load balancers) ---
 
 from rest_framework.views import APIView
 from django.db import connection
 
+# A successful readiness probe is reused for this long (per process, so each
+# pod still checks its own DB connectivity); failures are never cached
+READY_CACHE_SECONDS = 1.0
+_db_ready_until = 0.0
+
 
 class HealthView(APIView):
     """GET /api/health/ — liveness (app is up)."""
@@ -477,9 +554,13 @@ class ReadyView(APIView):
     throttle_classes = []  # No rate limit for load balancers
 
     def get(self, request):
+        global _db_ready_until
+        if time.monotonic() < _db_ready_until:
+            return Response({'status': 'ready', 'database': 'ok'})
         try:
             with connection.cursor() as cursor:
                 cursor.execute('SELECT 1')
+            _db_ready_until = time.monotonic() + READY_CACHE_SECONDS
             return Response({'status': 'ready', 'database': 'ok'})
         except Exception as e:
             return Response(
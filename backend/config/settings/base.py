@@ -73,6 +73,8 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    # Covering-index INCLUDE columns are PostgreSQL-only; SQLite builds plain indexes
+    SILENCED_SYSTEM_CHECKS = ['models.W040']
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -125,15 +127,61 @@ CORS_ALLOWED_ORIGINS = config(
     cast=lambda v: [s.strip() for s in v.split(',')]
 )
 
-# Cache for throttling (and optional general use)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Cache for throttling, the rule-set version/table and alert counters.
+# LocMem is per process: set CACHE_REDIS_URL whenever several processes run
+# (web workers, Celery) so a rule change bumps the version they all read.
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# AuditLog persistence: 'db' = batched INSERTs from a background thread;
+# 'jsonl' = append to AUDIT_LOG_JSONL_PATH, load with `manage.py load_audit_logs` (cron)
+AUDIT_LOG_SINK = config('AUDIT_LOG_SINK', default='db')
+AUDIT_LOG_JSONL_PATH = BASE_DIR / 'logs' / 'audit_log.jsonl'
+
+# Report downloads: when set (e.g. '/protected-reports/'), the download endpoint only
+# sets X-Accel-Redirect to this prefix + file name and nginx sends the file, e.g.
+#   location /protected-reports/ { internal; alias /path/to/backend/reports/; }
+# Empty (default): Django streams the file itself (runserver / no nginx).
+REPORTS_ACCEL_REDIRECT_PREFIX = config('REPORTS_ACCEL_REDIRECT_PREFIX', default='')
+
+# ISO country codes the risk scorer treats as high-risk (e.g. the FATF lists)
+AML_HIGH_RISK_COUNTRIES = config(
+    'AML_HIGH_RISK_COUNTRIES',
+    default='XX,YY',
+    cast=lambda v: [s.strip() for s in v.split(',') if s.strip()]
+)
 
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = config('CELERY_RESULT_BACKEND', default='redis://localhost:6379/0')
+# Run tasks inline instead of on a worker (development default; no broker needed)
+CELERY_TASK_ALWAYS_EAGER = config('CELERY_TASK_ALWAYS_EAGER', default=False, cast=bool)
+# Deferred bookkeeping writes go to their own queue, behind interactive work
+# (worker: celery -A config worker -Q celery,aml_background)
+CELERY_TASK_ROUTES = {
+    'aml.tasks.persist_risk_artifacts': {'queue': 'aml_background'},
+}
+# Periodic tasks (run with: celery -A config beat)
+# On PostgreSQL, risk scoring reads the hourly stats view only up to its last
+# refresh, as recorded in the cache. Without beat and a shared cache
+# (CACHE_REDIS_URL), scoring falls back to aggregating raw transactions.
+CELERY_BEAT_SCHEDULE = {
+    'refresh-customer-tx-stats': {
+        'task': 'aml.tasks.refresh_customer_tx_stats',
+        'schedule': 60.0,
+    },
+}
 
 LOGGING = {
     'version': 1,